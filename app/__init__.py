@@ -5,9 +5,30 @@ from .extensions import db, migrate, login_manager, csrf
 def create_app(config_class=Config) -> Flask:
     app = Flask(__name__)
     app.config.from_object(config_class)
+    # Services log to 'app.services.*' - handled by the app logger (stderr unless configured otherwise)
+    app.logger.setLevel(app.config.get('LOG_LEVEL') or 'INFO')
 
     db.init_app(app)
     migrate.init_app(app, db)
+
+    # WAL, busy timeout, synchronous mode, foreign keys - before the first connection is opened
+    from .services.db_writer import configure_sqlite, db_writer
+    with app.app_context():
+        configure_sqlite(
+            db.engine,
+            journal_mode=app.config.get('SQLITE_JOURNAL_MODE'),
+            synchronous=app.config.get('SQLITE_SYNCHRONOUS'),
+            busy_timeout=app.config.get('SQLITE_BUSY_TIMEOUT', 5000),
+            foreign_keys=app.config.get('SQLITE_FOREIGN_KEYS', True)
+        )
+    db_writer.init_app(app)
+
+    # Prometheus metrics (/metrics) and opt-in request profiling
+    from .services.metrics import metrics
+    from .services.profiler import request_profiler
+    metrics.init_app(app)
+    request_profiler.init_app(app)
+
     csrf.init_app(app)
     login_manager.init_app(app)
 
@@ -23,10 +44,12 @@ def create_app(config_class=Config) -> Flask:
     from .blueprints.ui import ui_bp
     from .blueprints.api.hosts import api_bp
     from .blueprints.auth import auth_bp
+    from .blueprints.metrics import metrics_bp
 
     app.register_blueprint(ui_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(auth_bp)
+    app.register_blueprint(metrics_bp)
 
     # Disable CSRF for API routes
     #csrf.exempt(api_bp)
@@ -36,4 +59,66 @@ def create_app(config_class=Config) -> Flask:
     with app.app_context():
         db.create_all()
 
+    from .services.ssh_pool import ssh_pool
+    ssh_pool.configure(
+        max_size=app.config.get('SSH_POOL_MAX_SIZE'),
+        idle_timeout=app.config.get('SSH_POOL_IDLE_TIMEOUT'),
+        keepalive=app.config.get('SSH_KEEPALIVE'),
+        connect_timeout=app.config.get('SSH_CONNECT_TIMEOUT'),
+        compress=app.config.get('SSH_COMPRESSION')
+    )
+
+    from .services.data_manager import DataManager
+    DataManager.configure(
+        compression=app.config.get('LOG_COMPRESSION'),
+        compression_level=app.config.get('LOG_COMPRESSION_LEVEL'),
+        row_group_size=app.config.get('LOG_ROW_GROUP_SIZE'),
+        dedup_raw_log=app.config.get('LOG_DEDUP_RAW')
+    )
+
+    from .services.ingest_pipeline import ingest_pipeline
+    ingest_pipeline.configure(
+        queue_size=app.config.get('PIPELINE_QUEUE_SIZE'),
+        analyze_batch_size=app.config.get('PIPELINE_ANALYZE_BATCH')
+    )
+
+    import shlex
+    from .services.win_client import ps_session
+    ps_session.configure(
+        command=shlex.split(app.config.get('WIN_PS_COMMAND') or ''),
+        timeout=app.config.get('WIN_PS_TIMEOUT')
+    )
+
+    from .services.reputation import reputation
+    reputation.configure(ttl=app.config.get('REPUTATION_TTL'))
+
+    from .services.rule_engine import ruleset
+    ruleset.load(app.config['RULES_FILE'])
+
+    from .services.correlation import correlation
+    correlation.configure(
+        window_seconds=app.config.get('CORRELATION_WINDOW'),
+        bucket_seconds=app.config.get('CORRELATION_BUCKET'),
+        max_keys=app.config.get('CORRELATION_MAX_KEYS'),
+        cross_host_hosts=app.config.get('CROSS_HOST_MIN_HOSTS'),
+        cross_host_failures=app.config.get('CROSS_HOST_MIN_FAILURES'),
+        spray_users=app.config.get('SPRAY_MIN_USERS'),
+        brute_force_failures=app.config.get('BRUTE_FORCE_MIN_FAILURES')
+    )
+    if app.config.get('CORRELATION_CHECKPOINT'):
+        correlation.load(app.config['CORRELATION_CHECKPOINT'])
+
+    from .services.alert_feed import broker
+    broker.init_app(app)
+
+    from .services.host_probe import host_status
+    host_status.init_app(app)
+
+    # Background log collection (periodic loop only when SCHEDULER_ENABLED)
+    from .services.scheduler import scheduler
+    scheduler.init_app(app)
+
+    from .commands import register_commands
+    register_commands(app)
+
     return app
\ No newline at end of file
@@ -1,15 +1,26 @@
 #import time
-from flask import Blueprint, jsonify, request, current_app
-from datetime import timezone, datetime
+import json
+import queue
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
+from datetime import timezone, datetime, timedelta
 #import os
 from flask_login import login_required
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
-from app.models import Host, LogSource, LogArchive, Alert, IPRegistry
-from app.services.remote_client import RemoteClient
-from app.services.win_client import WinClient
-from app.services.log_collector import LogCollector
-from app.services.data_manager import DataManager
-from app.services.log_analyzer import LogAnalyzer
+from app.models import Host, Alert, IPRegistry
+from app.services.scheduler import scheduler
+from app.services.log_search import LogSearch
+from app.services.reputation import reputation
+from app.services.rule_engine import ruleset
+from app.services.alert_feed import broker, AlertBroker
+from app.services.alert_stats import AlertStats
+from app.services.ssh_pool import ssh_pool
+from app.services.host_probe import HostProbe, host_status
+from app.services.ingest_pipeline import ingest_pipeline
+from app.services.threat_feed import ThreatFeed
+from app.services.db_writer import db_writer
+from app.services.retention import RetentionService
 from app.extensions import db
 
 
@@ -38,7 +49,10 @@ def add_host() -> tuple:
     if Host.query.filter_by(ip_address=data.get("ip_address")).first():
         return jsonify({"error": "IP musi być unikalne"}), 409
     
-    new_host = Host(hostname=data.get("hostname"), ip_address=data.get("ip_address"), os_type=data.get("os_type"))
+    new_host = Host(
+        hostname=data.get("hostname"), ip_address=data.get("ip_address"), os_type=data.get("os_type"),
+        alert_retention=data.get("alert_retention"), log_retention=data.get("log_retention")
+    )
     db.session.add(new_host)
     db.session.commit()
     
@@ -46,9 +60,10 @@ def add_host() -> tuple:
 
 @api_bp.route("/hosts/<int:host_id>", methods=["DELETE"])
 def delete_host(host_id) -> tuple:
-    host = Host.query.get_or_404(host_id)
-    db.session.delete(host)
-    db.session.commit()
+    Host.query.get_or_404(host_id)
+    # Alerts in batches, sources and archive index by ON DELETE CASCADE, then the Parquet files
+    RetentionService.purge_host(host_id)
+    host_status.invalidate(host_id)
     
     return jsonify({"message": "Usunięto hosta"}), 200
 
@@ -59,10 +74,25 @@ def update_host(host_id) -> tuple:
     if "hostname" in data: host.hostname = data["hostname"]
     if "ip_address" in data: host.ip_address = data["ip_address"]
     if "os_type" in data: host.os_type = data["os_type"]
+    # Retention overrides in seconds (null - the global setting, 0 - keep forever)
+    if "alert_retention" in data: host.alert_retention = data["alert_retention"]
+    if "log_retention" in data: host.log_retention = data["log_retention"]
     db.session.commit()
+    host_status.invalidate(host_id)
     
     return jsonify(host.to_dict()), 200
 
+@api_bp.route("/hosts/status", methods=["GET"])
+def get_hosts_status():
+    """
+    Status of all hosts in one request: probes run concurrently, results are
+    cached for HOST_STATUS_TTL seconds (?refresh=1 probes again). Hosts that
+    do not answer within HOST_STATUS_DEADLINE come back as 'pending'.
+    """
+    hosts = [(h.id, h.ip_address, h.os_type) for h in Host.query.order_by(Host.id)]
+    db.session.remove() # the connection is not needed while waiting for probes
+    return jsonify(host_status.status(hosts, refresh=request.args.get("refresh") == "1"))
+
 @api_bp.route("/hosts/<int:host_id>/ssh-info", methods=["GET"])
 def get_ssh_info(host_id) -> tuple:
     host = Host.query.get_or_404(host_id)
@@ -71,117 +101,136 @@ def get_ssh_info(host_id) -> tuple:
     ssh_key = current_app.config.get("SSH_KEY_FILE")
     
     try:
-        with RemoteClient(host=host.ip_address, user=ssh_user, port=ssh_port, key_file=ssh_key) as remote:
-            ram_info, _ = remote.run("free -m | grep Mem | awk '{print $7}'")
-            disk_percentage, _ = remote.run("df -h | grep '/$' | awk '{print $5}'")
-            if not disk_percentage: disk_percentage, _ = remote.run("df -h | grep '/dev/sda1' | awk '{print $5}'")
-            disk_total, _ = remote.run("df -h | grep '/$' | awk '{print $2}'")
-            if not disk_total: disk_total, _ = remote.run("df -h | grep '/dev/sda1' | awk '{print $2}'")
-            cpu_load, _ = remote.run("uptime | awk -F'load average:' '{print $2}' | cut -d',' -f1")
-            uptime_str, _ = remote.run("cat /proc/uptime | awk '{print $1}'")
-            uptime_formatted = "N/A"
-            try:
-                uptime_seconds = float(uptime_str)
-                hrs = int(uptime_seconds // 3600)
-                mis = int((uptime_seconds % 3600) // 60)
-                uptime_formatted = f"{hrs}h {mis}m"
-            except:
-                pass
-            return jsonify({
-                "free_ram_mb": ram_info.strip(),
-                "disk_info": disk_percentage.strip(),
-                "disk_total": disk_total.strip(),
-                "cpu_load": cpu_load.strip(),
-                "uptime_hours": uptime_formatted
-            }), 200
+        # One exec: /proc/meminfo, /proc/loadavg, /proc/uptime and statvfs of '/'
+        info = HostProbe.probe_linux(host.ip_address, ssh_user, ssh_port, ssh_key, host_id=host.id)
+        return jsonify(HostProbe.format(info)), 200
     except Exception as e:
         return jsonify({"error": f"Błąd połączenia SSH: {str(e)}"}), 500
     
 @api_bp.route("/hosts/<int:host_id>/windows-info", methods=["GET"])
 def get_windows_info(host_id):
-    import psutil
     host = Host.query.get_or_404(host_id)
     if "windows" not in str(host.os_type).lower(): return jsonify({"error": "Wrong OS"}), 400
     
     try:
-        mem = psutil.virtual_memory()
-        free_ram_mb = str(round(mem.available / (1024 * 1024)))
-        cpu_load = f"{psutil.cpu_percent(interval=0.1)}%"
-        try:
-            usage = psutil.disk_usage("C:\\")
-            disk_percentage = f"{usage.percent}%"
-            disk_total = f"{round(usage.total / (1024**3), 1)}GB"
-        except:
-            disk_percentage, disk_total = "N/A", "?"
-        boot_time = datetime.fromtimestamp(psutil.boot_time())
-        uptime_seconds = (datetime.now() - boot_time).total_seconds()
-        hours = int(uptime_seconds // 3600)
-        minutes = int((uptime_seconds % 3600) // 60)
-        return jsonify({
-            "free_ram_mb": free_ram_mb, "disk_info": disk_percentage,
-            "disk_total": disk_total, "cpu_load": cpu_load, "uptime_hours": f"{hours}h {minutes}m"
-        }), 200
+        return jsonify(HostProbe.format_windows(HostProbe.probe_windows())), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 @api_bp.route("/hosts/<int:host_id>/logs", methods=["POST"])
 def fetch_logs(host_id):
     host = Host.query.get_or_404(host_id)
-    
-    log_source = LogSource.query.filter_by(host_id=host.id).first()
-    if not log_source:
-        log_source = LogSource(host_id=host.id, log_type='security', last_fetch=None)
-        db.session.add(log_source)
-        db.session.commit()
-    
-    # ZADANIE 2 - INTEGRACJA POBIERANIA LOGÓW
-    # 1. Sprawdź host.os_type (LINUX vs WINDOWS).
-    os_type = host.os_type.lower()
-    logs_data = []
-    # 2. Użyj odpowiedniego klienta (RemoteClient lub WinClient).
-    # 3. Wywołaj LogCollector.get_linux_logs (lub windows) aby pobrać listę zdarzeń.
-    # 4. Zapisz pobrane logi do pliku Parquet używając DataManager.save_logs_to_parquet().
+
+    os_type = (host.os_type or "").lower()
+    if "windows" not in os_type and "linux" not in os_type:
+        return jsonify({"error": "Unsupported OS type"}), 400
+
+    # Collection runs in the scheduler's worker pool - the client polls /jobs/<id>
+    job = scheduler.submit(host.id)
+    return jsonify({
+        "message": "Zlecono pobieranie logów",
+        "job_id": job["id"],
+        "status": job["status"]
+    }), 202
+
+@api_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = scheduler.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Nie znaleziono zadania"}), 404
+    return jsonify(job), 200
+
+@api_bp.route("/scheduler/status", methods=["GET"])
+def get_scheduler_status():
+    return jsonify(scheduler.status()), 200
+
+@api_bp.route("/pipeline/stats", methods=["GET"])
+def get_pipeline_stats():
+    """Throughput and queue depth of every ingestion stage (collect / normalize / persist / analyze)."""
+    return jsonify(ingest_pipeline.stats()), 200
+
+@api_bp.route("/db/writer", methods=["GET"])
+def get_db_writer_stats():
+    """Jobs, commits (batches) and write time of the single database writer."""
+    return jsonify(db_writer.stats()), 200
+
+@api_bp.route("/ssh/pool", methods=["GET"])
+def get_ssh_pool_stats():
+    return jsonify(ssh_pool.stats()), 200
+
+@api_bp.route("/rules/stats", methods=["GET"])
+def get_rule_stats():
+    """Loaded detection rules with hit counts and evaluation time."""
+    return jsonify(ruleset.stats()), 200
+
+@api_bp.route("/logs/search", methods=["GET"])
+def search_logs():
+    """
+    Searches the Parquet archive, e.g.
+    /api/logs/search?start=2026-01-01&end=2026-01-02T12:00&host_id=1&source_ip=1.2.3.4&limit=100&offset=0
+    Optional: user, alert_type, fields=timestamp,source_ip,...
+    Rows are streamed as NDJSON (one JSON object per line).
+    """
+    args = request.args
     try:
-        if "windows" in os_type.lower():
-            win_client = WinClient()
-            logs_data = LogCollector.get_windows_logs(win_client, log_source.last_fetch)
-
-        elif "linux" in os_type.lower():
-            ssh_user = current_app.config.get("SSH_DEFAULT_USER", "vagrant")
-            ssh_port = current_app.config.get("SSH_DEFAULT_PORT", 2222)
-            ssh_key = current_app.config.get("SSH_KEY_FILE")
-            
-            with RemoteClient(host=host.ip_address, user=ssh_user, port=ssh_port, key_file=ssh_key) as remote:
-                logs_data = LogCollector.get_linux_logs(remote, log_source.last_fetch)
-        else:
-            return jsonify({"error": "Unsupported OS type"}), 400
-        
-        if not logs_data:
-            return jsonify({"message": "No logs fetched", "alerts": 0}), 200
-        filename, count = DataManager.save_logs_to_parquet(logs_data, host.id)
-        # 5. Zaktualizuj log_source.last_fetch na bieżący czas.
-        log_source.last_fetch = datetime.now(timezone.utc)
-        # 6. Dodaj wpis do LogArchive (historia pobrań).
-        log_archive = LogArchive(host_id=host.id, timestamp=datetime.now(timezone.utc), filename=filename, record_count=count)
-        db.session.add(log_archive)
-        # 7. Wywołaj LogAnalyzer.analyze_parquet(filename, host.id) aby wykryć zagrożenia.
-        alerts_count = LogAnalyzer.analyze_parquet(filename, host.id)
-        db.session.commit()
+        start = LogSearch.parse_time(args.get("start"))
+        end = LogSearch.parse_time(args.get("end"))
+        host_ids = [int(h) for h in args.get("host_id", "").split(",") if h]
+        limit = min(args.get("limit", 100, type=int), current_app.config.get("LOG_SEARCH_MAX_LIMIT", 10000))
+        offset = max(args.get("offset", 0, type=int), 0)
+    except ValueError:
+        return jsonify({"error": "Niepoprawne parametry wyszukiwania"}), 400
 
-        return jsonify({
-            "message": "Logs fetched successfully",
-            "count": len(logs_data),
-            "alerts": alerts_count,
-            "filename": filename
-        }), 200
-    
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": f"Błąd pobierania logów: {str(e)}"}), 500
+    columns = [f for f in args.get("fields", "").split(",") if f] or None
+    if columns and any(f not in LogSearch.FIELDS for f in columns):
+        return jsonify({"error": f"Dostępne pola: {', '.join(LogSearch.FIELDS)}"}), 400
+
+    rows = LogSearch.search(
+        start=start, end=end, host_ids=host_ids, columns=columns, limit=limit, offset=offset,
+        source_ip=args.get("source_ip"), user=args.get("user"), alert_type=args.get("alert_type")
+    )
+
+    def generate():
+        for row in rows:
+            yield json.dumps(row, default=lambda v: v.isoformat()) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 @api_bp.route("/ips", methods=["GET"])
 def get_ips():
-    ips = IPRegistry.query.order_by(IPRegistry.last_seen.desc()).all()
+    """
+    Registry entries, most recently seen first, 'limit' per page (default 100).
+    Next page: before=<last_seen of the last entry>&before_id=<its id> (keyset,
+    served by the (last_seen, id) index). status=BANNED or status=BANNED,UNKNOWN
+    returns only those statuses.
+    """
+    limit = min(max(request.args.get("limit", 100, type=int), 1), current_app.config.get("IPS_PAGE_MAX", 1000))
+    # Plain rows, no ORM objects
+    query = db.select(IPRegistry.id, IPRegistry.ip_address, IPRegistry.status, IPRegistry.last_seen)
+
+    statuses = [s.strip().upper() for s in request.args.get("status", "").split(",") if s.strip()]
+    if statuses:
+        query = query.where(IPRegistry.status.in_(statuses))
+
+    before = request.args.get("before")
+    if before:
+        try:
+            before = datetime.fromisoformat(before)
+        except ValueError:
+            return jsonify({"error": "Nieprawidłowy parametr before"}), 400
+        if before.tzinfo is not None:
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+        before_id = request.args.get("before_id", type=int)
+        if before_id is None:
+            query = query.where(IPRegistry.last_seen < before)
+        else:
+            # (last_seen, id) < (before, before_id), written so the index is range-scanned
+            query = query.where(
+                IPRegistry.last_seen <= before,
+                db.or_(IPRegistry.last_seen < before, IPRegistry.id < before_id)
+            )
+
+    ips = db.session.execute(query.order_by(IPRegistry.last_seen.desc(), IPRegistry.id.desc()).limit(limit)).all()
     results = [{
         "id": ip.id,
         "ip_address": ip.ip_address,
@@ -198,31 +247,66 @@ def add_ip():
     if not data or "ip_address" not in data:
         return jsonify({"error": "Brak adresu IP"}), 400
     
-    # Check if IP already exists
-    if IPRegistry.query.filter_by(ip_address=data["ip_address"]).first():
-        return jsonify({"error": "IP już istnieje w rejestrze"}), 409
-
+    # Canonical form of the address or range, same rules as the bulk import
+    address = ThreatFeed.normalize(str(data["ip_address"]))
+    if address is None:
+        return jsonify({"error": "Nieprawidłowy adres IP lub zakres"}), 400
+    status = str(data.get("status") or "UNKNOWN").upper()
+    if status not in ThreatFeed.STATUSES:
+        return jsonify({"error": f"Dostępne statusy: {', '.join(ThreatFeed.STATUSES)}"}), 400
     new_ip = IPRegistry(
-        ip_address=data["ip_address"],
-        status=data.get("status", "unknown"),
+        ip_address=address,
+        status=status,
         last_seen=datetime.now(timezone.utc)
     )
     db.session.add(new_ip)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError: # unique ip_address - no separate existence query
+        db.session.rollback()
+        return jsonify({"error": "IP już istnieje w rejestrze"}), 409
+    reputation.upsert(new_ip.ip_address, new_ip.status)
     
     return jsonify({"message": "Dodano IP", "id": new_ip.id}), 201
 
+@api_bp.route("/ips/import", methods=["POST"])
+def import_ips():
+    """
+    Bulk import of a blocklist feed, streamed line by line: a multipart 'file'
+    field or the raw request body (text/plain, text/csv). Query parameters:
+    status (default BANNED), format (auto / text / csv), column (CSV column
+    name or index), overwrite_trusted=1. Returns counts and rows per second.
+    """
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    lines = (line.decode("utf-8", errors="replace") for line in stream)
+    try:
+        result = ThreatFeed.import_feed(
+            lines,
+            status=request.args.get("status", "BANNED"),
+            fmt=request.args.get("format", "auto"),
+            column=request.args.get("column"),
+            keep_trusted=request.args.get("overwrite_trusted") != "1"
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Nieprawidłowy import: {e}"}), 400
+    return jsonify(result), 200
+
 @api_bp.route("/ips/<int:ip_id>", methods=["PUT"])
 def update_ip(ip_id):
     ip_reg = IPRegistry.query.get_or_404(ip_id)
-    data = request.get_json()
+    data = request.get_json() or {}
     
     if "status" in data:
-        ip_reg.status = data["status"]
+        status = str(data["status"]).upper()
+        if status not in ThreatFeed.STATUSES:
+            return jsonify({"error": f"Dostępne statusy: {', '.join(ThreatFeed.STATUSES)}"}), 400
+        ip_reg.status = status
     
     ip_reg.last_seen = datetime.now(timezone.utc)
     
     db.session.commit()
+    reputation.upsert(ip_reg.ip_address, ip_reg.status)
     
     return jsonify({"message": "Zaktualizowano status IP"}), 200
 
@@ -231,23 +315,121 @@ def delete_ip(ip_id):
     ip_reg = IPRegistry.query.get_or_404(ip_id)
     db.session.delete(ip_reg)
     db.session.commit()
+    reputation.remove(ip_reg.ip_address)
 
     return jsonify({"message": "Usunięto wpis IP"}), 200
 
 @api_bp.route("/alerts", methods=["GET"])
 def get_recent_alerts():
-    # Return 20 most recent alerts
-    alerts = Alert.query.order_by(Alert.timestamp.desc()).limit(20).all()
+    """
+    Without since_id: the 'limit' most recent alerts (default 20).
+    With since_id: alerts with id > since_id, oldest first - an incremental cursor.
+    """
+    limit = min(max(request.args.get("limit", 20, type=int), 1), current_app.config.get("ALERTS_PAGE_MAX", 500))
+    since_id = request.args.get("since_id", type=int)
+
+    if since_id is not None:
+        return jsonify(AlertBroker.fetch_since(since_id, limit))
+
+    alerts = Alert.query.options(joinedload(Alert.host)).order_by(Alert.timestamp.desc()).limit(limit).all()
     return jsonify([a.to_dict() for a in alerts])
 
+@api_bp.route("/alerts/stream", methods=["GET"])
+def stream_alerts():
+    """
+    Server-sent events with new alerts. Resumes after Last-Event-ID (sent by
+    EventSource on reconnect) or ?since_id=, otherwise starts with new alerts.
+    """
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("since_id", type=int)
+    heartbeat = current_app.config.get("ALERT_FEED_HEARTBEAT", 15)
+
+    # Subscribe before reading the backlog (or the newest id) so nothing falls between the two
+    subscriber = broker.subscribe()
+    if last_id is None:
+        backlog, last_id = [], AlertBroker.latest_id() # only alerts committed from now on
+    else:
+        backlog = AlertBroker.fetch_since(last_id, AlertBroker.FETCH_LIMIT)
+    db.session.remove() # the connection is not needed while streaming
+
+    def generate():
+        sent = last_id
+        try:
+            yield "retry: 3000\n\n"
+            for alert in backlog:
+                sent = alert["id"]
+                yield AlertBroker.format_event(alert)
+            while True:
+                try:
+                    alert = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if alert["id"] <= sent:
+                    continue
+                sent = alert["id"]
+                yield AlertBroker.format_event(alert)
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @api_bp.route("/stats/top-ips", methods=["GET"])
 def get_top_ips():
-    #import to count IP addresses
-    from sqlalchemy import func
+    """Most frequent alert source IPs from the Space-Saving summary (count is an upper bound)."""
+    limit = min(max(request.args.get("limit", 5, type=int), 1), 100)
+    return jsonify([
+        {"ip": row["value"], "count": row["count"], "error": row["error"]}
+        for row in AlertStats.top("ip", limit)
+    ])
+
+@api_bp.route("/stats/top-users", methods=["GET"])
+def get_top_users():
+    limit = min(max(request.args.get("limit", 5, type=int), 1), 100)
+    return jsonify([
+        {"user": row["value"], "count": row["count"], "error": row["error"]}
+        for row in AlertStats.top("user", limit)
+    ])
+
+# Default histogram range per granularity
+_HISTOGRAM_RANGE = {"minute": timedelta(minutes=60), "hour": timedelta(hours=24), "day": timedelta(days=30)}
+
+@api_bp.route("/stats/histogram", methods=["GET"])
+def get_alert_histogram():
+    """
+    Alert counts per bucket from the rollups, e.g.
+    /api/stats/histogram?granularity=hour&start=2026-01-01&end=2026-01-02&host_id=1&severity=CRITICAL
+    Default range: the last 60 minutes / 24 hours / 30 days.
+    """
+    args = request.args
+    granularity = args.get("granularity", "hour")
+    if granularity not in AlertStats.GRANULARITIES:
+        return jsonify({"error": f"Dostępne granulacje: {', '.join(AlertStats.GRANULARITIES)}"}), 400
+    try:
+        end = LogSearch.parse_time(args.get("end")) or datetime.now()
+        start = LogSearch.parse_time(args.get("start")) or end - _HISTOGRAM_RANGE[granularity]
+        host_id = args.get("host_id", type=int)
+    except ValueError:
+        return jsonify({"error": "Niepoprawne parametry zapytania"}), 400
+
+    return jsonify(AlertStats.histogram(
+        granularity, AlertStats.bucket_start(start, granularity), end,
+        host_id=host_id, severity=args.get("severity"), alert_type=args.get("alert_type")
+    ))
 
-    stats = db.session.query(
-        Alert.source_ip,
-        func.count(Alert.id).label('total')
-    ).group_by(Alert.source_ip).order_by(func.count(Alert.id).desc()).limit(5).all()
+@api_bp.route("/stats/summary", methods=["GET"])
+def get_alert_summary():
+    """Alert totals per host, severity and type over the last ?days= days (default 30)."""
+    days = min(max(request.args.get("days", 30, type=int), 1), 3650)
+    end = datetime.now() + timedelta(days=1)
+    start = AlertStats.bucket_start(end - timedelta(days=days), "day")
+    summary = AlertStats.breakdown(start, end)
 
-    return jsonify([{"ip": s[0], "count": s[1]} for s in stats])
\ No newline at end of file
+    hostnames = dict(db.session.execute(db.select(Host.id, Host.hostname)).all())
+    summary["by_host"] = [
+        {"host_id": host_id or None, "host_name": hostnames.get(host_id, "Unknown Host"), "count": count}
+        for host_id, count in sorted(summary["by_host"].items(), key=lambda item: -item[1])
+    ]
+    return jsonify(summary)
@@ -0,0 +1,23 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+from flask_login import login_required
+
+from app.services.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+def _render():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@metrics_bp.route('/metrics')
+def prometheus():
+    """Prometheus scrape endpoint: Bearer METRICS_TOKEN when set, otherwise a logged-in session."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        return login_required(_render)()
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        abort(401)
+    return _render()
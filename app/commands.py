@@ -0,0 +1,66 @@
+import click
+from datetime import timedelta
+
+
+def register_commands(app) -> None:
+    """CLI commands available as 'flask <command>'."""
+
+    @app.cli.command("compact-storage")
+    @click.option("--min-age", type=int, default=None, help="Only merge files fetched at least this many seconds ago.")
+    def compact_storage(min_age):
+        """Moves legacy Parquet files into partitions and merges small files."""
+        from app.services.compactor import StorageCompactor
+
+        result = StorageCompactor.run(timedelta(seconds=min_age) if min_age is not None else None)
+        click.echo(
+            f"Legacy files migrated: {result['legacy_migrated']}, "
+            f"partitions compacted: {result['partitions_compacted']}, "
+            f"files merged: {result['files_merged']}"
+        )
+
+
+    @app.cli.command("import-ips")
+    @click.argument("feed", type=click.File("r", encoding="utf-8", errors="replace"))
+    @click.option("--status", default="BANNED", type=click.Choice(["BANNED", "UNKNOWN", "TRUSTED"], case_sensitive=False))
+    @click.option("--format", "fmt", default="auto", type=click.Choice(["auto", "text", "csv"]))
+    @click.option("--column", default=None, help="CSV column with the address (name or 0-based index).")
+    @click.option("--chunk-size", type=int, default=None, help="Addresses per upsert statement and commit.")
+    @click.option("--overwrite-trusted", is_flag=True, help="Also change entries marked TRUSTED.")
+    def import_ips(feed, status, fmt, column, chunk_size, overwrite_trusted):
+        """Imports a blocklist (text or CSV file, '-' for stdin) into the IP registry."""
+        from app.services.threat_feed import ThreatFeed
+
+        try:
+            result = ThreatFeed.import_feed(
+                feed, status=status, fmt=fmt, column=column, chunk_size=chunk_size, keep_trusted=not overwrite_trusted
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(
+            f"Read: {result['read']}, upserted: {result['upserted']}, invalid: {result['invalid']}, "
+            f"duplicates: {result['duplicates']}, chunks: {result['chunks']}, "
+            f"{result['seconds']} s ({result['rows_per_second']} rows/s)"
+        )
+
+
+    @app.cli.command("rebuild-stats")
+    @click.option("--batch-size", type=int, default=None, help="Alerts read per committed batch.")
+    def rebuild_stats(batch_size):
+        """Rebuilds the alert rollups and the top IPs summary from the alerts table."""
+        from app.services.alert_stats import AlertStats
+
+        total = AlertStats.rebuild(batch_size)
+        click.echo(f"Alerts aggregated: {total}")
+
+
+    @app.cli.command("apply-retention")
+    def apply_retention():
+        """Archives and deletes alerts, log files and alert archives past their retention."""
+        from app.services.retention import RetentionService
+
+        result = RetentionService.run()
+        click.echo(
+            f"Alerts deleted: {result['alerts_deleted']} (archive files: {result['alert_files']}), "
+            f"log files deleted: {result['log_files_deleted']} ({result['log_records_deleted']} records), "
+            f"alert archive days deleted: {result['alert_days_deleted']}, {result['seconds']} s"
+        )
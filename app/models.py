@@ -1,3 +1,4 @@
+import hashlib
 from datetime import datetime, timezone
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -23,49 +24,91 @@ class Host(db.Model):
     hostname = db.Column(db.String(100), nullable=False)
     ip_address = db.Column(db.String(15), unique=True, nullable=False)
     os_type = db.Column(db.String(20))
+    alert_retention = db.Column(db.Integer) # seconds, None -> ALERT_RETENTION[_BY_SEVERITY], 0 = keep
+    log_retention = db.Column(db.Integer) # seconds, None -> LOG_RETENTION, 0 = keep
     
-    logs_sources = db.relationship('LogSource', backref='host', lazy='dynamic', cascade="all, delete-orphan")
-    alerts = db.relationship('Alert', backref='host', lazy='dynamic', cascade="all, delete-orphan")
+    # Children are removed by the database (ON DELETE CASCADE), not loaded one by one
+    logs_sources = db.relationship('LogSource', backref='host', lazy='dynamic', cascade="all, delete-orphan", passive_deletes=True)
+    alerts = db.relationship('Alert', backref='host', lazy='dynamic', cascade="all, delete-orphan", passive_deletes=True)
 
     def to_dict(self) -> dict:
         return {
             'id': self.id,
             'hostname': self.hostname,
             'ip_address': self.ip_address,
-            'os_type': self.os_type
+            'os_type': self.os_type,
+            'alert_retention': self.alert_retention,
+            'log_retention': self.log_retention
         }
 
 class LogSource(db.Model):
     __tablename__ = 'log_sources'
     id = db.Column(db.Integer, primary_key=True)
-    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id'), nullable=False)
+    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id', ondelete='CASCADE'), nullable=False)
     log_type = db.Column(db.String(50), default='auth') 
     last_fetch = db.Column(db.DateTime)
+    fetch_interval = db.Column(db.Integer) # seconds, None -> COLLECTION_INTERVAL
+    last_cursor = db.Column(db.String(255)) # journald __CURSOR of the last entry read
+    last_record_id = db.Column(db.BigInteger) # Windows Security EventRecordID
+    last_ssh_record_id = db.Column(db.BigInteger) # Windows OpenSSH/Operational EventRecordID
+
+    def get_checkpoint(self) -> dict:
+        return {
+            'cursor': self.last_cursor,
+            'record_id': self.last_record_id,
+            'ssh_record_id': self.last_ssh_record_id
+        }
+
+    def set_checkpoint(self, checkpoint) -> None:
+        self.last_cursor = checkpoint.get('cursor')
+        self.last_record_id = checkpoint.get('record_id')
+        self.last_ssh_record_id = checkpoint.get('ssh_record_id')
 
 class LogArchive(db.Model):
     __tablename__ = 'log_archives'
+    __table_args__ = (
+        db.Index('ix_log_archives_host_id_timestamp', 'host_id', 'timestamp'), # expired files of a host
+    )
     id = db.Column(db.Integer, primary_key=True)
-    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id'), nullable=False)
+    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id', ondelete='CASCADE'), nullable=False)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))   
     filename = db.Column(db.String(200), nullable=False)
     record_count = db.Column(db.Integer, default=0)
 
 class IPRegistry(db.Model):
     __tablename__ = 'ip_registry'
+    __table_args__ = (
+        db.Index('ix_ip_registry_last_seen_id', 'last_seen', 'id'), # registry list, keyset pages
+        db.Index('ix_ip_registry_status_last_seen_id', 'status', 'last_seen', 'id'), # pages of one status
+    )
     id = db.Column(db.Integer, primary_key=True)
     ip_address = db.Column(db.String(50), unique=True, nullable=False)
-    status = db.Column(db.String(20), default='unknown') # trusted, banned, unknown
+    status = db.Column(db.String(20), default='UNKNOWN') # TRUSTED, BANNED, UNKNOWN
     last_seen = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
 class Alert(db.Model):
     __tablename__ = 'alerts'
+    __table_args__ = (
+        db.Index('ix_alerts_host_id_timestamp', 'host_id', 'timestamp'), # alerts of one host
+        db.Index('ix_alerts_source_ip_timestamp', 'source_ip', 'timestamp', 'host_id'), # cross-host correlation, top IPs
+        db.Index('ix_alerts_timestamp', 'timestamp'), # latest alerts
+    )
     id = db.Column(db.Integer, primary_key=True)
-    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id'), nullable=True)
+    host_id = db.Column(db.Integer, db.ForeignKey('hosts.id', ondelete='CASCADE'), nullable=True)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     alert_type = db.Column(db.String(50))
     message = db.Column(db.Text)
     severity = db.Column(db.String(20), default='WARNING')
     source_ip = db.Column(db.String(50))
+    fingerprint = db.Column(db.String(40), unique=True, index=True) # dedup key, see make_fingerprint
+
+    @staticmethod
+    def make_fingerprint(host_id, source_ip, alert_type, timestamp) -> str:
+        """sha1 of host|source_ip|alert_type|event time - one alert per event."""
+        if timestamp is not None and timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        ts = timestamp.isoformat(sep=' ') if timestamp is not None else ''
+        return hashlib.sha1(f"{host_id}|{source_ip}|{alert_type}|{ts}".encode()).hexdigest()
     
     def to_dict(self) -> dict:
         return {
@@ -77,4 +120,31 @@ class Alert(db.Model):
             'message': self.message,
             'severity': self.severity,
             'source_ip': self.source_ip
-        }
\ No newline at end of file
+        }
+
+class AlertRollup(db.Model):
+    """Alert counts per time bucket, maintained by AlertStats as alerts are inserted."""
+    __tablename__ = 'alert_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket', 'host_id', 'severity', 'alert_type', name='uq_alert_rollups_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False) # minute, hour, day
+    bucket = db.Column(db.DateTime, nullable=False) # start of the bucket (event time)
+    host_id = db.Column(db.Integer, nullable=False, default=0) # 0 - alert without a host
+    severity = db.Column(db.String(20), nullable=False, default='')
+    alert_type = db.Column(db.String(50), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class TopTalker(db.Model):
+    """Space-Saving summary of the most frequent alert sources (kind: ip, user)."""
+    __tablename__ = 'top_talkers'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'value', name='uq_top_talkers_kind_value'),
+        db.Index('ix_top_talkers_kind_count', 'kind', 'count'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)
+    value = db.Column(db.String(255), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0) # upper bound of the true count
+    error = db.Column(db.Integer, nullable=False, default=0) # overestimation, true count >= count - error
@@ -0,0 +1,147 @@
+import json
+import logging
+import queue
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+
+from app.extensions import db
+from app.models import Alert
+
+logger = logging.getLogger(__name__)
+
+
+class AlertBroker:
+    """
+    Fans newly stored alerts out to live subscribers (SSE connections).
+
+    One tail thread per process reads alerts with id > last seen id (primary
+    key range scan) and puts them on every subscriber's queue - the number of
+    queries does not grow with the number of open dashboards. The thread
+    wakes up right after a commit that inserted alerts (see notify()) and
+    otherwise every ALERT_FEED_POLL seconds, which also picks up alerts
+    written by other processes. It runs only while someone is subscribed.
+    A subscriber that falls behind loses its oldest queued alerts; the
+    browser catches up on reconnect with Last-Event-ID.
+    """
+
+    QUEUE_SIZE = 1000
+    FETCH_LIMIT = 500
+
+    def __init__(self, app=None) -> None:
+        self.app = None
+        self.poll_interval = 2
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.last_id = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.poll_interval = app.config.get("ALERT_FEED_POLL", 2)
+        app.extensions["alert_broker"] = self
+
+    # ------------------------------------------------------------------ subscribers
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                # Tail from the newest alert: nothing committed while nobody was listening is replayed
+                with self.app.app_context():
+                    self.last_id = self.latest_id()
+                    db.session.remove()
+                self._thread = threading.Thread(target=self._run, name="alert-feed", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def notify(self) -> None:
+        """Called after a commit that stored alerts - the tail thread reads them immediately."""
+        self._wakeup.set()
+
+    # ------------------------------------------------------------------ tail thread
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                with self.app.app_context():
+                    alerts = self.fetch_since(self.last_id, self.FETCH_LIMIT)
+                    db.session.remove()
+            except Exception as e:
+                logger.error("Alert feed error: %s", e)
+                continue
+            for alert in alerts:
+                self._publish(alert)
+                self.last_id = alert["id"]
+            if len(alerts) == self.FETCH_LIMIT:
+                self._wakeup.set() # more waiting - read the next page right away
+
+    def _publish(self, alert) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(alert)
+            except queue.Full:
+                try:
+                    subscriber.get_nowait() # drop the oldest one
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(alert)
+
+    # ------------------------------------------------------------------ queries
+
+    @staticmethod
+    def latest_id() -> int:
+        """Id of the newest stored alert (0 when there are none)."""
+        return db.session.query(db.func.max(Alert.id)).scalar() or 0
+
+    @staticmethod
+    def fetch_since(since_id, limit) -> list:
+        """Alerts with id > since_id, oldest first, hosts loaded in the same query."""
+        alerts = (
+            Alert.query.options(joinedload(Alert.host))
+            .filter(Alert.id > since_id)
+            .order_by(Alert.id)
+            .limit(limit)
+            .all()
+        )
+        return [a.to_dict() for a in alerts]
+
+    @staticmethod
+    def format_event(alert) -> str:
+        """One SSE message; the id lets EventSource resume with Last-Event-ID."""
+        return f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(alert)}\n\n"
+
+
+broker = AlertBroker()
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_broker(session) -> None:
+    if session.in_nested_transaction():
+        return # a SAVEPOINT (db_writer job) - the rows are visible after the outer commit
+    if session.info.pop("alerts_inserted", False):
+        broker.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_notification(session) -> None:
+    if session.in_nested_transaction():
+        return # a SAVEPOINT - other jobs of the batch may have inserted alerts
+    session.info.pop("alerts_inserted", None)
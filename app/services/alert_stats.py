@@ -0,0 +1,239 @@
+import heapq
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import Alert, AlertRollup, TopTalker
+from app.services.db_writer import dialect_insert, upsert
+
+
+class AlertStats:
+    """
+    Incrementally maintained dashboard statistics.
+
+    - AlertRollup: alert counts per minute / hour / day bucket (event time)
+      and host, severity and alert type, incremented with upserts,
+    - TopTalker: Space-Saving summary of the most frequent source IPs and
+      users - at most TOPK_CAPACITY rows per kind, a reported count is an
+      upper bound of the true one, off by no more than 'error'.
+
+    record() runs in the transaction that inserts the alerts, so statistics
+    commit or roll back together with them. Reads touch only the rollups of
+    the requested range or the TOPK_CAPACITY summary rows, independent of the
+    size of the alerts table. Must run inside an app context; the class
+    defaults are overridden by ROLLUP_* / TOPK_CAPACITY config keys.
+    """
+
+    GRANULARITIES = ("minute", "hour", "day")
+    KEY_COLUMNS = ("granularity", "bucket", "host_id", "severity", "alert_type")
+    TOPK_KINDS = ("ip", "user")
+    TOPK_CAPACITY = 200
+    # How long finer buckets are kept (day buckets are kept forever)
+    RETENTION = {"minute": timedelta(days=2), "hour": timedelta(days=90)}
+    REBUILD_BATCH_SIZE = 10000
+
+    @staticmethod
+    def bucket_start(timestamp, granularity) -> datetime:
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        if granularity == "minute":
+            return timestamp.replace(second=0, microsecond=0)
+        if granularity == "hour":
+            return timestamp.replace(minute=0, second=0, microsecond=0)
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # ------------------------------------------------------------------ updates
+
+    @staticmethod
+    def record(alerts, users=None) -> None:
+        """
+        Adds inserted alerts (dicts with host_id, severity, alert_type,
+        source_ip, timestamp) to the rollups and the IP summary; 'users' is
+        a Counter of user names of the same events.
+        """
+        rollups = Counter()
+        ips = Counter()
+        for alert in alerts:
+            timestamp = alert.get("timestamp")
+            if timestamp is None:
+                continue
+            for granularity in AlertStats.GRANULARITIES:
+                rollups[(
+                    granularity,
+                    AlertStats.bucket_start(timestamp, granularity),
+                    alert.get("host_id") or 0,
+                    alert.get("severity") or "",
+                    alert.get("alert_type") or "",
+                )] += 1
+            if alert.get("source_ip"):
+                ips[alert["source_ip"]] += 1
+
+        AlertStats._increment_rollups(rollups)
+        AlertStats._update_top("ip", ips)
+        if users:
+            AlertStats._update_top("user", users)
+
+    @staticmethod
+    def _increment_rollups(rollups) -> None:
+        """INSERT ... ON CONFLICT (key) DO UPDATE SET count = count + excluded.count"""
+        if not rollups:
+            return
+        table = AlertRollup.__table__
+        rows = [dict(zip(AlertStats.KEY_COLUMNS, key), count=count) for key, count in rollups.items()]
+        stmt, new = dialect_insert(table)
+        stmt = upsert(stmt, list(AlertStats.KEY_COLUMNS), {"count": table.c["count"] + new["count"]})
+        db.session.execute(stmt, rows)
+
+    @staticmethod
+    def _update_top(kind, counts) -> None:
+        """
+        Weighted Space-Saving: a tracked value gets its count increased; a new
+        one takes a free slot or replaces the value with the smallest count,
+        inheriting that count as its error. Only changed rows are written.
+        """
+        if not counts:
+            return
+        capacity = current_app.config.get("TOPK_CAPACITY", AlertStats.TOPK_CAPACITY)
+        rows = db.session.execute(
+            db.select(TopTalker.value, TopTalker.count, TopTalker.error)
+            .where(TopTalker.kind == kind)
+            .with_for_update()
+        ).all()
+        before = {row.value: (row.count, row.error) for row in rows}
+        state = {value: list(entry) for value, entry in before.items()}
+        heap = [(entry[0], value) for value, entry in state.items()]
+        heapq.heapify(heap)
+
+        for value, count in counts.most_common():
+            if value in state:
+                state[value][0] += count
+                heapq.heappush(heap, (state[value][0], value))
+            elif len(state) < capacity:
+                state[value] = [count, 0]
+                heapq.heappush(heap, (count, value))
+            else:
+                # Stale heap entries (count changed or value evicted) are skipped
+                while heap[0][1] not in state or state[heap[0][1]][0] != heap[0][0]:
+                    heapq.heappop(heap)
+                minimum, evicted = heapq.heappop(heap)
+                del state[evicted]
+                state[value] = [minimum + count, minimum]
+                heapq.heappush(heap, (minimum + count, value))
+
+        evicted = [value for value in before if value not in state]
+        inserted = [
+            {"kind": kind, "value": value, "count": entry[0], "error": entry[1]}
+            for value, entry in state.items() if value not in before
+        ]
+        updated = [
+            {"_value": value, "_count": entry[0], "_error": entry[1]}
+            for value, entry in state.items() if value in before and tuple(entry) != before[value]
+        ]
+
+        table = TopTalker.__table__
+        for i in range(0, len(evicted), 500):
+            db.session.execute(
+                db.delete(table).where(table.c.kind == kind, table.c.value.in_(evicted[i:i + 500]))
+            )
+        if updated:
+            db.session.execute(
+                db.update(table)
+                .where(table.c.kind == kind, table.c.value == db.bindparam("_value"))
+                .values(count=db.bindparam("_count"), error=db.bindparam("_error")),
+                updated
+            )
+        if inserted:
+            db.session.execute(db.insert(table), inserted)
+
+    # ------------------------------------------------------------------ reads
+
+    @staticmethod
+    def top(kind, limit=5) -> list:
+        rows = db.session.execute(
+            db.select(TopTalker.value, TopTalker.count, TopTalker.error)
+            .where(TopTalker.kind == kind)
+            .order_by(TopTalker.count.desc(), TopTalker.value)
+            .limit(limit)
+        ).all()
+        return [{"value": row.value, "count": row.count, "error": row.error} for row in rows]
+
+    @staticmethod
+    def histogram(granularity, start, end, host_id=None, severity=None, alert_type=None) -> list:
+        """Alert counts per bucket in [start, end), filtered by host / severity / type."""
+        query = (
+            db.select(AlertRollup.bucket, db.func.sum(AlertRollup.count))
+            .where(AlertRollup.granularity == granularity, AlertRollup.bucket >= start, AlertRollup.bucket < end)
+            .group_by(AlertRollup.bucket)
+            .order_by(AlertRollup.bucket)
+        )
+        if host_id is not None:
+            query = query.where(AlertRollup.host_id == host_id)
+        if severity:
+            query = query.where(AlertRollup.severity == severity)
+        if alert_type:
+            query = query.where(AlertRollup.alert_type == alert_type)
+        return [{"bucket": bucket.isoformat(), "count": int(count)} for bucket, count in db.session.execute(query)]
+
+    @staticmethod
+    def breakdown(start, end) -> dict:
+        """Totals per host, severity and alert type from the day rollups in [start, end)."""
+        result = {"total": 0, "by_host": {}, "by_severity": {}, "by_type": {}}
+        rows = db.session.execute(
+            db.select(AlertRollup.host_id, AlertRollup.severity, AlertRollup.alert_type, db.func.sum(AlertRollup.count))
+            .where(AlertRollup.granularity == "day", AlertRollup.bucket >= start, AlertRollup.bucket < end)
+            .group_by(AlertRollup.host_id, AlertRollup.severity, AlertRollup.alert_type)
+        )
+        for host_id, severity, alert_type, count in rows:
+            count = int(count)
+            result["total"] += count
+            for field, key in (("by_host", host_id), ("by_severity", severity), ("by_type", alert_type)):
+                result[field][key] = result[field].get(key, 0) + count
+        return result
+
+    # ------------------------------------------------------------------ maintenance
+
+    @staticmethod
+    def prune(now=None) -> int:
+        """Deletes minute / hour buckets older than their retention; returns the number of rows."""
+        config = current_app.config
+        now = (now or datetime.now(timezone.utc)).replace(tzinfo=None)
+        deleted = 0
+        for granularity, default in AlertStats.RETENTION.items():
+            keep = timedelta(seconds=config.get(f"ROLLUP_{granularity.upper()}_RETENTION", default.total_seconds()))
+            deleted += db.session.execute(
+                db.delete(AlertRollup).where(AlertRollup.granularity == granularity, AlertRollup.bucket < now - keep)
+            ).rowcount
+        db.session.commit()
+        return deleted
+
+    @staticmethod
+    def rebuild(batch_size=None) -> int:
+        """
+        Recomputes the rollups and the IP summary from the alerts table, in id
+        order, one committed batch at a time. User names are not stored with
+        alerts, so the user summary is left as it is. Returns the number of
+        alerts read.
+        """
+        batch_size = batch_size or AlertStats.REBUILD_BATCH_SIZE
+        db.session.execute(db.delete(AlertRollup))
+        db.session.execute(db.delete(TopTalker).where(TopTalker.kind == "ip"))
+        db.session.commit()
+
+        total = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(Alert.id, Alert.host_id, Alert.severity, Alert.alert_type, Alert.source_ip, Alert.timestamp)
+                .where(Alert.id > last_id)
+                .order_by(Alert.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            AlertStats.record([row._asdict() for row in rows])
+            db.session.commit()
+            total += len(rows)
+            last_id = rows[-1].id
+        return total
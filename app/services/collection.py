@@ -0,0 +1,117 @@
+import time
+from datetime import datetime, timezone
+from flask import current_app
+from app.extensions import db
+from app.models import Host, LogSource, LogArchive
+from app.services.remote_client import RemoteClient
+from app.services.win_client import WinClient
+from app.services.log_collector import LogCollector
+from app.services.data_manager import DataManager
+from app.services.ingest_pipeline import ingest_pipeline
+from app.services.log_analyzer import LogAnalyzer
+from app.services.db_writer import db_writer
+
+
+class UnsupportedOSError(ValueError):
+    pass
+
+
+class CollectionService:
+    """
+    Collect -> save to Parquet + analyze (IngestPipeline) -> write (db_writer)
+    for a single host. Must be called inside an application context.
+    """
+
+    @staticmethod
+    def get_log_source(host) -> LogSource:
+        log_source = LogSource.query.filter_by(host_id=host.id).first()
+        if not log_source:
+            log_source = LogSource(host_id=host.id, log_type='security', last_fetch=None)
+            db.session.add(log_source)
+            db.session.commit()
+        return log_source
+
+    @staticmethod
+    def collect_host(host_id) -> dict:
+        host = db.session.get(Host, host_id)
+        if host is None:
+            raise LookupError(f"Host {host_id} does not exist")
+
+        log_source = CollectionService.get_log_source(host)
+        host_os, ip_address, last_fetch = host.os_type, host.ip_address, log_source.last_fetch
+        os_type = (host_os or "").lower()
+        # Position in the remote journal / event log, advanced by the collector
+        checkpoint = log_source.get_checkpoint()
+        # Reads are done - do not hold a transaction open while collecting; results go through db_writer
+        db.session.rollback()
+        # Transfer volume and latency of this collection, reported with the result
+        stats = {"bytes_received": None, "lines_received": None, "collect_seconds": None,
+                 "write_seconds": None, "total_seconds": None}
+        started = time.perf_counter()
+
+        if "windows" in os_type:
+            # Events stream from PowerShell (one JSON object per line) into the pipeline
+            win_client = WinClient(host_label=host_id)
+            events = LogCollector.iter_windows_logs(win_client, last_fetch, checkpoint)
+            files, detections = ingest_pipeline.run(events, host_id)
+
+        elif "linux" in os_type:
+            ssh_user = current_app.config.get("SSH_DEFAULT_USER", "vagrant")
+            ssh_port = current_app.config.get("SSH_DEFAULT_PORT", 2222)
+            ssh_key = current_app.config.get("SSH_KEY_FILE")
+
+            # Stream journalctl output into the pipeline
+            with RemoteClient(host=ip_address, user=ssh_user, port=ssh_port, key_file=ssh_key,
+                              host_label=host_id) as remote:
+                events = LogCollector.iter_linux_logs(
+                    remote, last_fetch, checkpoint,
+                    output_fields=current_app.config.get("JOURNAL_OUTPUT_FIELDS", False),
+                    remote_filter=current_app.config.get("JOURNAL_REMOTE_FILTER", True)
+                )
+                files, detections = ingest_pipeline.run(events, host_id)
+                stats["bytes_received"] = remote.bytes_received
+                stats["lines_received"] = remote.lines_received
+        else:
+            raise UnsupportedOSError(f"Unsupported OS type: {host_os}")
+
+        stats["collect_seconds"] = round(time.perf_counter() - started, 3)
+        count = sum(file_count for _, file_count in files)
+
+        # Alerts, registry, archive entries and the checkpoint are committed together
+        try:
+            alerts_count = db_writer.run(CollectionService.store, host_id, files, detections, checkpoint)
+        except Exception:
+            # No archive entry refers to the files and the checkpoint did not move -
+            # the next fetch writes the same rows again
+            for filename, _ in files:
+                (DataManager.STORAGE_DIR / filename).unlink(missing_ok=True)
+            raise
+        stats["write_seconds"] = round(time.perf_counter() - started - stats["collect_seconds"], 3)
+        stats["total_seconds"] = round(time.perf_counter() - started, 3)
+
+        if not count:
+            return {"message": "No logs fetched", "count": 0, "alerts": 0, "files": [], "stats": stats}
+
+        return {
+            "message": "Logs fetched successfully",
+            "count": count,
+            "alerts": alerts_count,
+            "files": [filename for filename, _ in files],
+            "stats": stats
+        }
+
+    @staticmethod
+    def store(host_id, files, detections, checkpoint) -> int:
+        """
+        Write job of one collection (runs in the db_writer transaction):
+        detections, one archive entry per day partition file and the new
+        checkpoint. Returns the number of new alerts.
+        """
+        log_source = LogSource.query.filter_by(host_id=host_id).first()
+        # The cursor moves even when no entry matched, so it is saved in both cases
+        log_source.set_checkpoint(checkpoint)
+        log_source.last_fetch = datetime.now(timezone.utc)
+
+        for filename, file_count in files:
+            db.session.add(LogArchive(host_id=host_id, timestamp=datetime.now(timezone.utc), filename=filename, record_count=file_count))
+        return sum(LogAnalyzer.apply(plan) for plan in detections)
@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from flask import current_app
+
+from app.extensions import db
+from app.models import LogArchive
+from app.services.data_manager import DataManager
+
+logger = logging.getLogger(__name__)
+
+
+class StorageCompactor:
+    """
+    Background maintenance of the Parquet storage.
+
+    - moves legacy flat files (storage/logs_<host>_<ts>.parquet) into the
+      host_id=/date= partitions,
+    - merges small files of a partition into one file with large row groups.
+
+    New files are written under a '_' name and renamed when complete, the
+    LogArchive index is switched in one transaction, and the merged files
+    are deleted only after that commit. Must run inside an app context;
+    the class defaults are overridden by COMPACTION_* config keys.
+    """
+
+    SMALL_FILE_BYTES = 64 * 1024 * 1024 # files above this size are left alone
+    ROW_GROUP_SIZE = 128 * 1024 # rows per row group in compacted files
+    MIN_AGE = timedelta(hours=1) # do not touch files fetched more recently
+
+    LEGACY_NAME = re.compile(r"^logs_(\d+)_\d{8}_\d{6}\.parquet$")
+
+    @staticmethod
+    def run(min_age=None) -> dict:
+        migrated = StorageCompactor.migrate_legacy_files()
+        partitions, merged = StorageCompactor.compact_partitions(min_age)
+        return {"legacy_migrated": migrated, "partitions_compacted": partitions, "files_merged": merged}
+
+    # ------------------------------------------------------------------ compaction
+
+    @staticmethod
+    def compact_partitions(min_age=None) -> tuple:
+        config = current_app.config
+        if min_age is None:
+            min_age = timedelta(seconds=config.get("COMPACTION_MIN_AGE", StorageCompactor.MIN_AGE.total_seconds()))
+        small_file = config.get("COMPACTION_SMALL_FILE_BYTES", StorageCompactor.SMALL_FILE_BYTES)
+        row_group = config.get("COMPACTION_ROW_GROUP_SIZE", StorageCompactor.ROW_GROUP_SIZE)
+        cutoff = datetime.now(timezone.utc) - min_age
+
+        by_partition = defaultdict(list)
+        for archive in LogArchive.query.filter(LogArchive.timestamp <= cutoff).order_by(LogArchive.timestamp):
+            if "/" not in archive.filename:
+                continue # legacy flat file - handled by migrate_legacy_files
+            path = DataManager.STORAGE_DIR / archive.filename
+            if path.exists() and path.stat().st_size < small_file:
+                by_partition[archive.filename.rsplit("/", 1)[0]].append(archive)
+
+        partitions, merged = 0, 0
+        for partition, archives in by_partition.items():
+            if len(archives) < 2:
+                continue
+            try:
+                StorageCompactor._merge(partition, archives, row_group)
+                partitions += 1
+                merged += len(archives)
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Compaction error in %s: %s", partition, e)
+        return partitions, merged
+
+    @staticmethod
+    def _merge(partition, archives, row_group) -> None:
+        name = DataManager.new_part_name("compacted")
+        tmp_path = DataManager.STORAGE_DIR / partition / f"_{name}"
+
+        # Stream row groups from the small files and re-chunk them into large ones
+        total = 0
+        writer = DataManager.parquet_writer(tmp_path)
+        try:
+            pending = []
+            pending_rows = 0
+            for archive in archives:
+                source = pq.ParquetFile(DataManager.STORAGE_DIR / archive.filename)
+                for i in range(source.num_row_groups):
+                    table = DataManager.conform_table(source.read_row_group(i))
+                    pending.append(table)
+                    pending_rows += table.num_rows
+                    if pending_rows >= row_group:
+                        combined = pa.concat_tables(pending).combine_chunks() # one dictionary per column
+                        full = (pending_rows // row_group) * row_group
+                        writer.write_table(combined.slice(0, full), row_group_size=row_group)
+                        pending = [combined.slice(full)]
+                        pending_rows -= full
+                        total += full
+            if pending_rows:
+                writer.write_table(pa.concat_tables(pending).combine_chunks(), row_group_size=row_group)
+                total += pending_rows
+            writer.close()
+        except Exception:
+            writer.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        filename = f"{partition}/{name}"
+        os.replace(tmp_path, DataManager.STORAGE_DIR / filename)
+
+        # Swap the index entries in one transaction, then drop the merged files
+        try:
+            db.session.add(LogArchive(
+                host_id=archives[0].host_id,
+                timestamp=max(a.timestamp for a in archives),
+                filename=filename,
+                record_count=total
+            ))
+            for archive in archives:
+                db.session.delete(archive)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            (DataManager.STORAGE_DIR / filename).unlink(missing_ok=True)
+            raise
+
+        for archive in archives:
+            (DataManager.STORAGE_DIR / archive.filename).unlink(missing_ok=True)
+
+    # ------------------------------------------------------------------ legacy layout
+
+    @staticmethod
+    def migrate_legacy_files() -> int:
+        """Splits flat logs_<host>_<ts>.parquet files into day partitions."""
+        DataManager.ensure_storage()
+        migrated = 0
+        for path in sorted(DataManager.STORAGE_DIR.glob("logs_*.parquet")):
+            match = StorageCompactor.LEGACY_NAME.match(path.name)
+            if not match:
+                continue
+            try:
+                StorageCompactor._migrate_file(path, int(match.group(1)))
+                migrated += 1
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Legacy migration error for %s: %s", path.name, e)
+        return migrated
+
+    @staticmethod
+    def _migrate_file(path, host_id) -> None:
+        table = DataManager.conform_table(pq.read_table(path))
+        # Partitions are local days
+        days = pc.strftime(DataManager.utc_to_local(table["timestamp"]), format="%Y-%m-%d")
+        old_entry = LogArchive.query.filter_by(filename=path.name).first()
+        fetched_at = old_entry.timestamp if old_entry else datetime.now(timezone.utc)
+
+        written = []
+        try:
+            for day in days.unique().to_pylist():
+                mask = pc.is_null(days) if day is None else pc.equal(days, day)
+                part = table.filter(mask)
+                day = datetime.strptime(day, "%Y-%m-%d").date() if day else datetime.now().date()
+                partition = DataManager.partition_dir(host_id, day)
+                (DataManager.STORAGE_DIR / partition).mkdir(parents=True, exist_ok=True)
+                name = DataManager.new_part_name()
+                tmp_path = DataManager.STORAGE_DIR / partition / f"_{name}"
+                writer = DataManager.parquet_writer(tmp_path)
+                writer.write_table(part, row_group_size=DataManager.ROW_GROUP_SIZE)
+                writer.close()
+                os.replace(tmp_path, DataManager.STORAGE_DIR / partition / name)
+                written.append((f"{partition}/{name}", part.num_rows))
+
+            for filename, count in written:
+                db.session.add(LogArchive(host_id=host_id, timestamp=fetched_at, filename=filename, record_count=count))
+            if old_entry:
+                db.session.delete(old_entry)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for filename, _ in written:
+                (DataManager.STORAGE_DIR / filename).unlink(missing_ok=True)
+            raise
+
+        path.unlink()
@@ -0,0 +1,293 @@
+import heapq
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class _Window:
+    """
+    Event counter over time buckets. Buckets are expired in bucket order (a
+    min-heap of the stored buckets), so a late event that lands in an older
+    bucket than the newest one still expires on time.
+    """
+
+    __slots__ = ("buckets", "total", "_heap")
+
+    def __init__(self) -> None:
+        self.buckets = {} # bucket -> count
+        self.total = 0
+        self._heap = []   # buckets in self.buckets, oldest on top
+
+    def add(self, bucket, count=1) -> None:
+        if bucket not in self.buckets:
+            self.buckets[bucket] = 0
+            heapq.heappush(self._heap, bucket)
+        self.buckets[bucket] += count
+        self.total += count
+
+    def expire(self, cutoff) -> None:
+        while self._heap and self._heap[0] < cutoff:
+            self.total -= self.buckets.pop(heapq.heappop(self._heap))
+
+
+class _Distinct:
+    """
+    Distinct values seen in the window: value -> last bucket. A min-heap of
+    (bucket, value) gives the expiry order; entries left behind when a value
+    was seen again later are skipped.
+    """
+
+    __slots__ = ("seen", "_heap")
+
+    def __init__(self) -> None:
+        self.seen = {}
+        self._heap = []
+
+    def add(self, value, bucket) -> None:
+        last = self.seen.get(value)
+        if last is None or bucket > last:
+            self.seen[value] = bucket
+            heapq.heappush(self._heap, (bucket, value))
+
+    def expire(self, cutoff) -> None:
+        while self._heap and self._heap[0][0] < cutoff:
+            bucket, value = heapq.heappop(self._heap)
+            if self.seen.get(value) == bucket:
+                del self.seen[value]
+
+    def __len__(self) -> int:
+        return len(self.seen)
+
+
+class _Seen:
+    """
+    Events already counted in the window - (host_id, event time in
+    microseconds) per bucket - so an event observed again (a re-analysed
+    file, a batch retried after a failed write) is not counted twice.
+    """
+
+    __slots__ = ("buckets", "_heap")
+
+    def __init__(self) -> None:
+        self.buckets = {} # bucket -> {(host_id, microseconds)}
+        self._heap = []
+
+    def add(self, key, bucket) -> bool:
+        """False if the event was already seen."""
+        keys = self.buckets.get(bucket)
+        if keys is None:
+            keys = self.buckets[bucket] = set()
+            heapq.heappush(self._heap, bucket)
+        elif key in keys:
+            return False
+        keys.add(key)
+        return True
+
+    def expire(self, cutoff) -> None:
+        while self._heap and self._heap[0] < cutoff:
+            del self.buckets[heapq.heappop(self._heap)]
+
+
+class _IPState:
+    __slots__ = ("failures", "hosts", "users", "events", "fired", "last_bucket")
+
+    def __init__(self) -> None:
+        self.failures = _Window()
+        self.events = _Seen()
+        self.hosts = _Distinct()
+        self.users = _Distinct()
+        self.fired = {}        # rule -> bucket in which it last fired
+        self.last_bucket = 0
+
+
+class CorrelationEngine:
+    """
+    Sliding-window correlation of failed logins on event time.
+
+    Counters are kept per source IP (failures, distinct hosts, distinct
+    users) and per (IP, user) pair, in buckets of bucket_seconds; anything
+    older than window_seconds before the newest event of the key is
+    expired (also buckets filled later by late events). observe() costs
+    O(log n) amortized in the buckets of a key - every bucket and value is
+    added once and expired once. At most max_keys IPs and max_keys pairs
+    are tracked; the least recently active ones are evicted first.
+    Events are identified by (IP, host, event time): one observed again
+    while still in the window is ignored, so counters do not depend on how
+    many times a batch was analysed.
+
+    Rules (a rule fires once per window for an IP):
+    - cross_host:     >= cross_host_failures failures on >= cross_host_hosts hosts
+    - password_spray: >= spray_users distinct users
+    - brute_force:    >= brute_force_failures failures for one (IP, user)
+
+    The state can be saved to / loaded from a JSON checkpoint.
+    """
+
+    RULES = ('cross_host', 'password_spray', 'brute_force')
+
+    def __init__(self, window_seconds=600, bucket_seconds=60, max_keys=100_000,
+                 cross_host_hosts=2, cross_host_failures=2, spray_users=5, brute_force_failures=20) -> None:
+        self._lock = threading.Lock()
+        self.configure(window_seconds, bucket_seconds, max_keys,
+                       cross_host_hosts, cross_host_failures, spray_users, brute_force_failures)
+        self.reset()
+
+    def configure(self, window_seconds=None, bucket_seconds=None, max_keys=None, cross_host_hosts=None,
+                  cross_host_failures=None, spray_users=None, brute_force_failures=None) -> None:
+        settings = {
+            "window_seconds": window_seconds, "bucket_seconds": bucket_seconds, "max_keys": max_keys,
+            "cross_host_hosts": cross_host_hosts, "cross_host_failures": cross_host_failures,
+            "spray_users": spray_users, "brute_force_failures": brute_force_failures,
+        }
+        for name, value in settings.items():
+            if value is not None:
+                setattr(self, name, value)
+        self._span = max(1, self.window_seconds // self.bucket_seconds) # window length in buckets
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ips = OrderedDict()   # ip -> _IPState, least recently active first
+            self._pairs = OrderedDict() # (ip, user) -> _Window
+
+    # ------------------------------------------------------------------ events
+
+    def observe(self, ip, host_id, user, timestamp) -> list:
+        """Records one failure and returns the names of the rules it triggered."""
+        bucket = int(timestamp.timestamp()) // self.bucket_seconds
+
+        with self._lock:
+            state = self._ips.get(ip)
+            if state is None:
+                state = self._ips[ip] = _IPState()
+                self._evict(self._ips)
+            else:
+                self._ips.move_to_end(ip)
+
+            newest = max(state.last_bucket, bucket)
+            cutoff = newest - self._span + 1
+            if bucket < cutoff:
+                return [] # older than the window of this IP - nothing to correlate with
+            state.last_bucket = newest
+
+            state.events.expire(cutoff)
+            if not state.events.add((host_id, round(timestamp.timestamp() * 1_000_000)), bucket):
+                return [] # already counted
+
+            state.failures.add(bucket)
+            state.hosts.add(host_id, bucket)
+            state.failures.expire(cutoff)
+            state.hosts.expire(cutoff)
+
+            pair_failures = 0
+            if user:
+                state.users.add(user, bucket)
+                state.users.expire(cutoff)
+                window = self._pairs.get((ip, user))
+                if window is None:
+                    window = self._pairs[(ip, user)] = _Window()
+                    self._evict(self._pairs)
+                else:
+                    self._pairs.move_to_end((ip, user))
+                window.add(bucket)
+                window.expire(cutoff)
+                pair_failures = window.total
+
+            triggered = []
+            if len(state.hosts) >= self.cross_host_hosts and state.failures.total >= self.cross_host_failures:
+                triggered.append('cross_host')
+            if len(state.users) >= self.spray_users:
+                triggered.append('password_spray')
+            if pair_failures >= self.brute_force_failures:
+                triggered.append('brute_force')
+
+            fired = []
+            for rule in triggered:
+                last = state.fired.get(rule)
+                if last is None or last < cutoff:
+                    state.fired[rule] = bucket
+                    fired.append(rule)
+            return fired
+
+    def counters(self, ip) -> dict:
+        """Current window counters of an IP (for alert messages)."""
+        with self._lock:
+            state = self._ips.get(ip)
+            if state is None:
+                return {"failures": 0, "hosts": 0, "users": 0}
+            return {"failures": state.failures.total, "hosts": len(state.hosts), "users": len(state.users)}
+
+    def _evict(self, keys) -> None:
+        while len(keys) > self.max_keys:
+            keys.popitem(last=False)
+
+    # ------------------------------------------------------------------ checkpoint
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "version": 2,
+                "bucket_seconds": self.bucket_seconds,
+                "saved_at": datetime.now().isoformat(),
+                "ips": [
+                    [ip, state.last_bucket, list(state.failures.buckets.items()),
+                     list(state.hosts.seen.items()), list(state.users.seen.items()), state.fired,
+                     [[bucket, [list(key) for key in keys]] for bucket, keys in state.events.buckets.items()]]
+                    for ip, state in self._ips.items()
+                ],
+                "pairs": [[ip, user, list(window.buckets.items())] for (ip, user), window in self._pairs.items()],
+            }
+
+    def from_dict(self, data) -> None:
+        if data.get("version") not in (1, 2) or data.get("bucket_seconds") != self.bucket_seconds:
+            return # incompatible layout - start with empty windows
+        ips, pairs = OrderedDict(), OrderedDict()
+        for ip, last_bucket, failures, hosts, users, fired, *events in data.get("ips", []):
+            state = _IPState()
+            for bucket, keys in (events[0] if events else []): # version 1 has no event keys
+                for host_id, microseconds in keys:
+                    state.events.add((host_id, microseconds), bucket)
+            state.last_bucket = last_bucket
+            for bucket, count in failures:
+                state.failures.add(bucket, count)
+            for host_id, bucket in hosts:
+                state.hosts.add(host_id, bucket)
+            for user, bucket in users:
+                state.users.add(user, bucket)
+            state.fired = dict(fired)
+            ips[ip] = state
+        for ip, user, buckets in data.get("pairs", []):
+            window = _Window()
+            for bucket, count in buckets:
+                window.add(bucket, count)
+            pairs[(ip, user)] = window
+        with self._lock:
+            self._ips, self._pairs = ips, pairs
+            self._evict(self._ips)
+            self._evict(self._pairs)
+
+    def save(self, path) -> None:
+        """Writes the checkpoint atomically (temp file + rename)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def load(self, path) -> bool:
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.from_dict(json.load(f))
+            return True
+        except FileNotFoundError:
+            return False
+        except (ValueError, TypeError) as e:
+            logger.warning("Correlation checkpoint %s ignored: %s", path, e)
+            return False
+
+
+correlation = CorrelationEngine()
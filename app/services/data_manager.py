@@ -1,9 +1,65 @@
+import logging
+import os
+import time
+import uuid
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
+from app.services.metrics import PARQUET_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
 
 class DataManager:
     STORAGE_DIR = Path.cwd() / "storage" # Path to storage directory (Path object)
+    BATCH_SIZE = 10_000 # Records read from a collector stream at a time
+    ROW_GROUP_SIZE = 65_536 # Rows per Parquet row group
+    COMPRESSION = "zstd"
+    COMPRESSION_LEVEL = 3
+    DEDUP_RAW_LOG = True # raw_log equal to message is stored as null
+
+    # A log record as produced by the collectors and returned by load_logs / LogSearch
+    # (naive local time, plain strings)
+    RECORD_SCHEMA = pa.schema([
+        ('timestamp', pa.timestamp('us')),
+        ('source_ip', pa.string()),
+        ('alert_type', pa.string()),
+        ('user', pa.string()),
+        ('message', pa.string()),
+        ('raw_log', pa.string()),
+    ])
+
+    # Columns of every stored log file: UTC instants, low-cardinality columns dictionary-encoded
+    LOG_SCHEMA = pa.schema([
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('source_ip', pa.dictionary(pa.int32(), pa.string())),
+        ('alert_type', pa.dictionary(pa.int32(), pa.string())),
+        ('user', pa.dictionary(pa.int32(), pa.string())),
+        ('message', pa.string()),
+        ('raw_log', pa.string()),
+    ])
+
+    @staticmethod
+    def configure(compression=None, compression_level=None, row_group_size=None, dedup_raw_log=None) -> None:
+        if compression:
+            DataManager.COMPRESSION = compression
+        if compression_level is not None:
+            DataManager.COMPRESSION_LEVEL = compression_level
+        if row_group_size:
+            DataManager.ROW_GROUP_SIZE = row_group_size
+        if dedup_raw_log is not None:
+            DataManager.DEDUP_RAW_LOG = dedup_raw_log
+
+    @staticmethod
+    def parquet_writer(path) -> pq.ParquetWriter:
+        """Writer for LOG_SCHEMA files with the configured codec."""
+        level = DataManager.COMPRESSION_LEVEL if DataManager.COMPRESSION in ("zstd", "gzip", "brotli") else None
+        return pq.ParquetWriter(path, DataManager.LOG_SCHEMA, compression=DataManager.COMPRESSION, compression_level=level)
 
     @staticmethod
     def ensure_storage() -> None:
@@ -13,55 +69,249 @@ class DataManager:
         DataManager.STORAGE_DIR.mkdir(exist_ok=True) # exist_ok=True ensures no error if folder exists
 
     @staticmethod
-    def save_logs_to_parquet(log_list, host_id) -> tuple:
+    def partition_dir(host_id, day) -> str:
+        """Hive-style partition of a host's logs for one day (relative to STORAGE_DIR)."""
+        return f"host_id={host_id}/date={day.isoformat()}"
+
+    @staticmethod
+    def new_part_name(prefix="part") -> str:
+        timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return f"{prefix}-{timestamp_str}-{uuid.uuid4().hex[:8]}.parquet"
+
+    @staticmethod
+    def save_logs_to_parquet(log_list, host_id) -> list:
         """
-        Saves list of logs to a '.parquet' file
+        Saves list of logs to '.parquet' files (one per day partition)
         """
-        DataManager.ensure_storage()
-        
         if not log_list:
-            return None, 0
-            
-        # 1. Make DataFrame
-        df = pd.DataFrame(log_list)
-        
-        # 2. Fill missing columns
-        expected_cols = ['timestamp', 'source_ip', 'alert_type', 'user', 'message', 'raw_log']
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = None
-
-        # 3. Generate filename
-        timestamp_str = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"logs_{host_id}_{timestamp_str}.parquet"
-        
-        file_path = DataManager.STORAGE_DIR / filename
-        
-        # 4. Write to Parquet
+            return []
+
+        return DataManager.save_log_stream(log_list, host_id)
+
+    @staticmethod
+    def save_log_stream(records, host_id, batch_size=None) -> list:
+        """
+        Writes an iterable of log dicts into the host's day partitions
+        (storage/host_id=<id>/date=<YYYY-MM-DD>/part-*.parquet). Records are
+        turned into Arrow batches BATCH_SIZE at a time and buffered per day
+        until a full row group (ROW_GROUP_SIZE rows) can be written, so at
+        most one row group per day is held in memory.
+        Returns [(filename, record_count), ...] with filenames relative to
+        STORAGE_DIR - one file per day present in the stream.
+        """
+        writer = PartitionWriter(host_id)
         try:
-            df.to_parquet(file_path, engine='pyarrow', index=False)
-            return filename, len(df)
+            for batch in DataManager.iter_batches(records, batch_size):
+                for day, table in DataManager.split_by_day(batch).items():
+                    writer.write(day, table)
+            return writer.close()
         except Exception as e:
-            print(f"Parquet write error: {e}")
+            logger.error("Parquet write error for host %s: %s", host_id, e)
+            writer.abort()
             raise e
 
+    @staticmethod
+    def iter_batches(records, batch_size=None):
+        """Lists of up to BATCH_SIZE records from an iterable."""
+        batch_size = batch_size or DataManager.BATCH_SIZE
+        records = iter(records)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def split_by_day(batch) -> dict:
+        """Records -> {day: RECORD_SCHEMA table}, days in order of first appearance."""
+        by_day = defaultdict(list)
+        for record in batch:
+            by_day[DataManager._record_day(record)].append(record)
+        # Missing columns are filled with nulls by the schema
+        return {day: pa.Table.from_pylist(rows, schema=DataManager.RECORD_SCHEMA) for day, rows in by_day.items()}
+
+    @staticmethod
+    def conform_table(table) -> pa.Table:
+        """
+        Converts a table of records or one read from any stored file (also
+        legacy pandas-written ones) to LOG_SCHEMA. Naive timestamps are local
+        time; raw_log equal to message is dropped when DEDUP_RAW_LOG is set.
+        """
+        columns = []
+        for field in DataManager.LOG_SCHEMA:
+            if field.name not in table.column_names:
+                columns.append(pa.nulls(table.num_rows, field.type))
+                continue
+            column = table[field.name]
+            if field.name == 'timestamp' and pa.types.is_timestamp(column.type) and column.type.tz is None:
+                column = DataManager.local_to_utc(column)
+            if field.name == 'raw_log' and DataManager.DEDUP_RAW_LOG and 'message' in table.column_names:
+                message = table['message'].cast(pa.string())
+                column = column.cast(pa.string())
+                column = pc.if_else(pc.fill_null(pc.equal(column, message), False), pa.scalar(None, pa.string()), column)
+            columns.append(column if column.type == field.type else column.cast(field.type))
+        return pa.Table.from_arrays(columns, schema=DataManager.LOG_SCHEMA)
+
+    @staticmethod
+    def decode_table(table) -> pa.Table:
+        """
+        Stored table (any layout) -> RECORD_SCHEMA columns present in it:
+        naive local time, plain strings and raw_log restored from message.
+        """
+        columns = {}
+        for name in table.column_names:
+            column = table[name]
+            if name == 'timestamp' and pa.types.is_timestamp(column.type) and column.type.tz is not None:
+                column = DataManager.utc_to_local(column)
+            elif pa.types.is_dictionary(column.type):
+                column = column.cast(column.type.value_type)
+            columns[name] = column
+        if 'raw_log' in columns and 'message' in columns:
+            columns['raw_log'] = pc.coalesce(columns['raw_log'].cast(pa.string()), columns['message'].cast(pa.string()))
+        return pa.table(columns)
+
+    @staticmethod
+    def _offsets(values) -> pa.Array:
+        """
+        Local UTC offset (microseconds) for each value, computed once per
+        distinct hour (DST-aware). Naive values are local time, others UTC.
+        """
+        hours = pc.floor_temporal(values, unit='hour')
+        distinct = pc.unique(hours)
+        offsets = [
+            int(hour.astimezone().utcoffset().total_seconds() * 1_000_000) if hour is not None else 0
+            for hour in distinct.to_pylist()
+        ]
+        return pc.take(pa.array(offsets, pa.int64()), pc.index_in(hours, value_set=distinct))
+
+    @staticmethod
+    def local_to_utc(values):
+        """timestamp[us] in local time -> timestamp[us, UTC]."""
+        values = values.combine_chunks() if isinstance(values, pa.ChunkedArray) else values
+        values = values.cast(pa.timestamp('us'))
+        if len(values) == 0:
+            return values.cast(pa.timestamp('us', tz='UTC'))
+        shifted = pc.subtract(values.cast(pa.int64()), DataManager._offsets(values))
+        return shifted.cast(pa.timestamp('us', tz='UTC'))
+
+    @staticmethod
+    def utc_to_local(values):
+        """timestamp[us, UTC] -> naive timestamp[us] in local time."""
+        values = values.combine_chunks() if isinstance(values, pa.ChunkedArray) else values
+        values = values.cast(pa.timestamp('us', tz='UTC'))
+        if len(values) == 0:
+            return values.cast(pa.timestamp('us'))
+        shifted = pc.add(values.cast(pa.int64()), DataManager._offsets(values))
+        return shifted.cast(pa.timestamp('us'))
+
+    @staticmethod
+    def _record_day(record):
+        timestamp = record.get('timestamp')
+        if isinstance(timestamp, datetime):
+            return timestamp.date()
+        return datetime.now().date()
+
     @staticmethod
     def load_logs(filename) -> pd.DataFrame:
         """
         Loads Parquet file to DataFrame.
         """
         DataManager.ensure_storage()
-        
+
         file_path = DataManager.STORAGE_DIR / filename
-        
+
         if not file_path.exists():
-            print(f"Warning: File {filename} does not exist.")
+            logger.warning("File %s does not exist.", filename)
             return pd.DataFrame()
-        
+
         try:
-            df = pd.read_parquet(file_path, engine='pyarrow')
-            return df
-        
+            table = DataManager.decode_table(pq.read_table(file_path))
+            return table.to_pandas()
+
         except Exception as e:
-            print(f"Parquet file {filename} read error: {e}")
-            return pd.DataFrame()
\ No newline at end of file
+            logger.error("Parquet file %s read error: %s", filename, e)
+            return pd.DataFrame()
+
+
+@dataclass
+class _DayFile:
+    """Open file of one day partition (see PartitionWriter)."""
+    writer: pq.ParquetWriter
+    tmp_path: Path
+    filename: str # final name, relative to STORAGE_DIR
+    count: int = 0 # rows written or pending
+    pending: list = field(default_factory=list) # tables waiting for a full row group
+    pending_rows: int = 0
+
+
+class PartitionWriter:
+    """
+    One open file per day partition of a host, fed with RECORD_SCHEMA
+    tables. Rows are buffered per day until a full row group
+    (ROW_GROUP_SIZE rows) can be written. Files are written under a '_'
+    name (ignored by dataset readers) and renamed by close(), which reports
+    the time spent converting and writing to metrics. abort() removes the
+    unfinished files and also the ones close() has renamed - for a
+    collection that fails after its files were written.
+    """
+
+    def __init__(self, host_id) -> None:
+        self.host_id = host_id
+        self.row_group = DataManager.ROW_GROUP_SIZE
+        self.seconds = 0.0 # in write() and close()
+        self._days = {} # day -> _DayFile
+        self._finished = [] # paths renamed by close()
+        DataManager.ensure_storage()
+
+    def write(self, day, table) -> None:
+        started = time.perf_counter()
+        if day not in self._days:
+            partition = DataManager.partition_dir(self.host_id, day)
+            part_dir = DataManager.STORAGE_DIR / partition
+            part_dir.mkdir(parents=True, exist_ok=True)
+            name = DataManager.new_part_name()
+            tmp_path = part_dir / f"_{name}"
+            self._days[day] = _DayFile(DataManager.parquet_writer(tmp_path), tmp_path, f"{partition}/{name}")
+        day_file = self._days[day]
+        day_file.pending.append(DataManager.conform_table(table))
+        day_file.pending_rows += table.num_rows
+        day_file.count += table.num_rows
+        self._flush(day_file)
+        self.seconds += time.perf_counter() - started
+
+    def _flush(self, day_file, final=False) -> None:
+        if not day_file.pending_rows or (day_file.pending_rows < self.row_group and not final):
+            return
+        table = pa.concat_tables(day_file.pending).combine_chunks()
+        full = day_file.pending_rows if final else (day_file.pending_rows // self.row_group) * self.row_group
+        day_file.writer.write_table(table.slice(0, full), row_group_size=self.row_group)
+        day_file.pending = [table.slice(full)] if full < day_file.pending_rows else []
+        day_file.pending_rows -= full
+
+    def close(self) -> list:
+        """Writes the remaining rows; returns [(filename, record_count), ...] sorted by day."""
+        started = time.perf_counter()
+        for day_file in self._days.values():
+            self._flush(day_file, final=True)
+        files = []
+        for day in sorted(self._days):
+            day_file = self._days[day]
+            day_file.writer.close()
+            os.replace(day_file.tmp_path, DataManager.STORAGE_DIR / day_file.filename)
+            self._finished.append(DataManager.STORAGE_DIR / day_file.filename)
+            files.append((day_file.filename, day_file.count))
+        self._days = {}
+        self.seconds += time.perf_counter() - started
+        if files:
+            PARQUET_WRITE_SECONDS.observe(self.seconds, host=self.host_id)
+        return files
+
+    def abort(self) -> None:
+        """Closes and removes the unfinished files and the files already renamed by close()."""
+        for day_file in self._days.values():
+            day_file.writer.close()
+            day_file.tmp_path.unlink(missing_ok=True)
+        for path in self._finished:
+            path.unlink(missing_ok=True)
+        self._days = {}
+        self._finished = []
@@ -0,0 +1,260 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from app.extensions import db
+from app.services.metrics import MetricsRegistry
+from app.services.reputation import ReputationIndex
+
+# session.info entries applied after commit (see the after_commit listeners) - kept per job
+STAGED_KEYS = (ReputationIndex.SESSION_KEY, MetricsRegistry.SESSION_KEY)
+# Execution option of a connection whose transactions start with an explicit BEGIN <mode> (SQLite)
+BEGIN_OPTION = "sqlite_begin"
+
+
+def configure_sqlite(engine, journal_mode="WAL", synchronous="NORMAL", busy_timeout=5000, foreign_keys=True) -> None:
+    """
+    Connection settings for a SQLite engine (other databases are left alone):
+    - journal_mode WAL: readers and the writer do not block each other,
+    - synchronous NORMAL: with WAL, fsync at checkpoints instead of on
+      every commit (a power cut may lose the last commits, never corrupts),
+    - busy_timeout (ms): writers outside db_writer wait for the lock
+      instead of failing with "database is locked",
+    - foreign_keys: enforce foreign keys, so ON DELETE CASCADE works,
+    - a connection with the BEGIN_OPTION execution option (the db_writer
+      session) starts its transaction with BEGIN IMMEDIATE: the write lock
+      is taken up front, so its SAVEPOINTs nest inside a real transaction
+      and a job that reads before writing cannot fail with
+      SQLITE_BUSY_SNAPSHOT. Other sessions keep pysqlite's handling (no
+      transaction for plain reads, BEGIN right before the first write),
+      so read-then-write code outside the writer - e.g. the compactor
+      merging files between its reads and its commit - starts the write
+      on a fresh snapshot and waits busy_timeout for the lock. Not for an
+      in-memory database, whose one connection is shared by all sessions.
+    Must be called before the engine opens its first connection.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    in_memory = engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        if synchronous:
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        cursor.execute(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+        cursor.close()
+
+    if not in_memory:
+        @event.listens_for(engine, "begin")
+        def _on_begin(connection):
+            mode = connection.get_execution_options().get(BEGIN_OPTION)
+            if mode:
+                connection.exec_driver_sql(f"BEGIN {mode}")
+
+
+def dialect_insert(table) -> tuple:
+    """
+    INSERT into 'table' for the session's database, with conflict handling.
+    Returns (stmt, new): 'new' refers to the values of the row that was
+    proposed for insertion - excluded on SQLite / PostgreSQL, inserted
+    (VALUES()) on MySQL / MariaDB - for use in upsert() values.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite_insert(table)
+        return stmt, stmt.excluded
+    if dialect == "postgresql":
+        stmt = postgresql_insert(table)
+        return stmt, stmt.excluded
+    stmt = mysql_insert(table) # MySQL / MariaDB
+    return stmt, stmt.inserted
+
+
+def upsert(stmt, index_elements, values=None):
+    """
+    ON CONFLICT (index_elements) DO UPDATE SET values for a dialect_insert()
+    statement; DO NOTHING when values is None. MySQL has no conflict target:
+    ON DUPLICATE KEY UPDATE values, and id = id instead of DO NOTHING (not
+    INSERT IGNORE, which turns every error into a warning).
+    """
+    if hasattr(stmt, "on_conflict_do_update"): # SQLite, PostgreSQL
+        if values is None:
+            return stmt.on_conflict_do_nothing(index_elements=index_elements)
+        return stmt.on_conflict_do_update(index_elements=index_elements, set_=values)
+    if values is None:
+        values = {"id": stmt.table.c.id}
+    return stmt.on_duplicate_key_update(**values)
+
+
+class DatabaseWriter:
+    """
+    Single thread through which ingestion writes (alerts, registry, log
+    archive, checkpoints, feed imports) reach the database.
+
+    run(fn, ...) queues a job and waits until it is committed. The writer
+    takes every job queued at that moment (up to WRITER_BATCH_MAX, waiting
+    WRITER_BATCH_WAIT seconds for more), runs each in its own SAVEPOINT in
+    one session and commits them together - one commit / fsync per batch,
+    and no two collections competing for the SQLite write lock. A failing
+    job is rolled back to its savepoint and gets the exception; the others
+    are still committed. Jobs must not use ORM objects of the caller's
+    session - pass ids and plain values.
+
+    With WRITER_ENABLED off (or before init_app) jobs run in the caller's
+    session and are committed right away.
+    """
+
+    def __init__(self, app=None) -> None:
+        self.app = None
+        self.enabled = False
+        self.batch_max = 64
+        self.batch_wait = 0.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"jobs": 0, "failed_jobs": 0, "batches": 0, "failed_batches": 0,
+                       "largest_batch": 0, "write_seconds": 0.0, "commit_seconds": 0.0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.enabled = app.config.get("WRITER_ENABLED", True)
+        self.batch_max = app.config.get("WRITER_BATCH_MAX", 64)
+        self.batch_wait = app.config.get("WRITER_BATCH_WAIT", 0.0)
+        app.extensions["db_writer"] = self
+
+    # ------------------------------------------------------------------ jobs
+
+    def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) in the writer's transaction; returns its result once committed."""
+        if not self.enabled or self.app is None:
+            try:
+                result = fn(*args, **kwargs)
+                db.session.commit()
+                return result
+            except Exception:
+                db.session.rollback()
+                raise
+
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future.result()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Writes the jobs already queued and stops the thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def _loop(self) -> None:
+        with self.app.app_context():
+            while not (self._stop.is_set() and self._queue.empty()):
+                try:
+                    jobs = [self._queue.get(timeout=0.5)]
+                except queue.Empty:
+                    continue
+                deadline = time.monotonic() + self.batch_wait
+                while len(jobs) < self.batch_max:
+                    try:
+                        jobs.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)) if self.batch_wait
+                                    else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    self._write(jobs)
+                except Exception as e: # e.g. the database is unreachable - callers must not wait forever
+                    db.session.remove()
+                    for *_, future in jobs:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def _write(self, jobs) -> None:
+        started = time.perf_counter()
+        results = []
+        # BEGIN IMMEDIATE on SQLite (see configure_sqlite)
+        db.session.connection(execution_options={BEGIN_OPTION: "IMMEDIATE"})
+        for fn, args, kwargs, future in jobs:
+            # Registry entries staged for the index (see ReputationIndex.stage) and alert counts staged
+            # for metrics are applied when the batch commits (the listeners skip SAVEPOINTs) and
+            # must leave with a failed job
+            staged = {key: db.session.info[key].copy() for key in STAGED_KEYS if key in db.session.info}
+            savepoint = db.session.begin_nested()
+            try:
+                result = fn(*args, **kwargs)
+                savepoint.commit()
+                results.append((future, result, None))
+            except Exception as e:
+                savepoint.rollback()
+                for key in STAGED_KEYS:
+                    db.session.info.pop(key, None)
+                db.session.info.update(staged)
+                results.append((future, None, e))
+
+        committed = time.perf_counter()
+        batch_error = None
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            batch_error = e
+        finally:
+            db.session.remove()
+        finished = time.perf_counter()
+
+        with self._lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["jobs"] += len(jobs)
+            stats["largest_batch"] = max(stats["largest_batch"], len(jobs))
+            stats["write_seconds"] += committed - started
+            stats["commit_seconds"] += finished - committed
+            if batch_error is not None:
+                stats["failed_batches"] += 1
+            stats["failed_jobs"] += sum(1 for _, _, error in results if error is not None or batch_error is not None)
+
+        for future, result, error in results:
+            error = error or batch_error
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    # ------------------------------------------------------------------ status
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["write_seconds"] = round(stats["write_seconds"], 3)
+        stats["commit_seconds"] = round(stats["commit_seconds"], 3)
+        stats["jobs_per_batch"] = round(stats["jobs"] / batches, 2) if batches else None
+        stats["queue_depth"] = self._queue.qsize()
+        stats["running"] = bool(self._thread and self._thread.is_alive())
+        stats["enabled"] = self.enabled
+        return stats
+
+
+db_writer = DatabaseWriter()
@@ -0,0 +1,229 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from app.services.remote_client import RemoteClient
+
+
+class HostProbe:
+    """
+    Host health in one round trip: a single exec reads /proc/meminfo,
+    /proc/loadavg, /proc/uptime and statvfs of '/' (stat -f) and prints them
+    as '@section' blocks, parsed into one structured dict.
+    """
+
+    PROBE_COMMAND = (
+        "echo @meminfo; cat /proc/meminfo; "
+        "echo @loadavg; cat /proc/loadavg; "
+        "echo @uptime; cat /proc/uptime; "
+        "echo @statvfs; stat -f -c '%S %b %f %a' /"
+    )
+
+    @staticmethod
+    def sections(output) -> dict:
+        sections = {}
+        current = None
+        for line in output.splitlines():
+            line = line.strip()
+            if line.startswith("@"):
+                current = sections.setdefault(line[1:], [])
+            elif current is not None and line:
+                current.append(line)
+        return sections
+
+    @staticmethod
+    def parse(output) -> dict:
+        """Probe output -> memory (kB), load averages, uptime (s) and disk (bytes) of '/'; missing parts are None."""
+        sections = HostProbe.sections(output)
+        info = {
+            "mem_total_kb": None, "mem_available_kb": None,
+            "load_1": None, "load_5": None, "load_15": None,
+            "uptime_seconds": None,
+            "disk_total_bytes": None, "disk_available_bytes": None, "disk_used_percent": None,
+        }
+
+        meminfo = {}
+        for line in sections.get("meminfo", []):
+            key, _, value = line.partition(":")
+            parts = value.split()
+            if parts and parts[0].isdigit():
+                meminfo[key] = int(parts[0])
+        info["mem_total_kb"] = meminfo.get("MemTotal")
+        # MemAvailable since Linux 3.14, older kernels: free + page cache
+        if "MemAvailable" in meminfo:
+            info["mem_available_kb"] = meminfo["MemAvailable"]
+        elif "MemFree" in meminfo:
+            info["mem_available_kb"] = meminfo["MemFree"] + meminfo.get("Buffers", 0) + meminfo.get("Cached", 0)
+
+        try:
+            loads = sections["loadavg"][0].split()
+            info["load_1"], info["load_5"], info["load_15"] = (float(v) for v in loads[:3])
+        except (KeyError, IndexError, ValueError):
+            pass
+
+        try:
+            info["uptime_seconds"] = float(sections["uptime"][0].split()[0])
+        except (KeyError, IndexError, ValueError):
+            pass
+
+        try:
+            block_size, blocks, free, available = (int(v) for v in sections["statvfs"][0].split()[:4])
+            used = (blocks - free) * block_size
+            info["disk_total_bytes"] = blocks * block_size
+            info["disk_available_bytes"] = available * block_size
+            # Same as df: used / (used + available to unprivileged users), rounded up
+            if used + available * block_size:
+                info["disk_used_percent"] = math.ceil(used * 100 / (used + available * block_size))
+        except (KeyError, IndexError, ValueError):
+            pass
+
+        return info
+
+    @staticmethod
+    def format(info) -> dict:
+        """Structured probe -> the strings shown on the dashboard badges."""
+        uptime = "N/A"
+        if info.get("uptime_seconds") is not None:
+            seconds = info["uptime_seconds"]
+            uptime = f"{int(seconds // 3600)}h {int((seconds % 3600) // 60)}m"
+        available = info.get("mem_available_kb")
+        total = info.get("disk_total_bytes")
+        percent = info.get("disk_used_percent")
+        load = info.get("load_1")
+        return {
+            "free_ram_mb": str(available // 1024) if available is not None else "",
+            "disk_info": f"{percent}%" if percent is not None else "",
+            "disk_total": f"{total / 1024 ** 3:.1f}G" if total is not None else "",
+            "cpu_load": f"{load:.2f}" if load is not None else "",
+            "uptime_hours": uptime,
+        }
+
+    @staticmethod
+    def probe_linux(ip_address, user, port, key_file, host_id=None) -> dict:
+        with RemoteClient(host=ip_address, user=user, port=port, key_file=key_file, host_label=host_id) as remote:
+            output, _ = remote.run(HostProbe.PROBE_COMMAND)
+        return HostProbe.parse(output)
+
+    @staticmethod
+    def probe_windows() -> dict:
+        """The Windows host is the machine running the app (WinClient runs PowerShell locally)."""
+        import psutil
+
+        mem = psutil.virtual_memory()
+        info = {
+            "mem_total_kb": mem.total // 1024, "mem_available_kb": mem.available // 1024,
+            "load_1": None, "load_5": None, "load_15": None,
+            "uptime_seconds": time.time() - psutil.boot_time(),
+            "disk_total_bytes": None, "disk_available_bytes": None, "disk_used_percent": None,
+            "cpu_percent": psutil.cpu_percent(interval=0.1),
+        }
+        try:
+            usage = psutil.disk_usage("C:\\")
+            info.update(disk_total_bytes=usage.total, disk_available_bytes=usage.free, disk_used_percent=usage.percent)
+        except OSError:
+            pass
+        return info
+
+    @staticmethod
+    def format_windows(info) -> dict:
+        formatted = HostProbe.format(info)
+        formatted["cpu_load"] = f"{info['cpu_percent']}%"
+        if info.get("disk_used_percent") is None:
+            formatted["disk_info"], formatted["disk_total"] = "N/A", "?"
+        return formatted
+
+
+class HostStatusCache:
+    """
+    Fleet-wide status for the dashboard. Hosts are probed concurrently on a
+    shared thread pool; a request waits at most HOST_STATUS_DEADLINE seconds
+    and reports slower hosts as 'pending'. Results are cached for
+    HOST_STATUS_TTL seconds - a probe that finishes after the deadline still
+    fills the cache, and a host already being probed is not probed twice.
+    """
+
+    def __init__(self, app=None) -> None:
+        self.app = None
+        self.ttl = 30
+        self.deadline = 5
+        self.max_workers = 16
+        self._lock = threading.RLock() # done callbacks may run in the submitting thread
+        self._results = {} # host_id -> (monotonic time, result)
+        self._pending = {} # host_id -> Future
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.ttl = app.config.get("HOST_STATUS_TTL", 30)
+        self.deadline = app.config.get("HOST_STATUS_DEADLINE", 5)
+        self.max_workers = app.config.get("HOST_STATUS_MAX_WORKERS", 16)
+        app.extensions["host_status"] = self
+
+    def status(self, hosts, refresh=False) -> list:
+        """hosts: [(id, ip_address, os_type), ...] -> one result dict per host, in the same order."""
+        now = time.monotonic()
+        futures = {}
+        results = {}
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="host-probe")
+            for host in hosts:
+                host_id = host[0]
+                cached = self._results.get(host_id)
+                if cached and not refresh and now - cached[0] < self.ttl:
+                    results[host_id] = cached[1]
+                    continue
+                future = self._pending.get(host_id)
+                if future is None:
+                    future = self._executor.submit(self._probe, *host)
+                    self._pending[host_id] = future
+                    future.add_done_callback(lambda f, host_id=host_id: self._store(host_id, f))
+                futures[host_id] = future
+
+        if futures:
+            wait(futures.values(), timeout=self.deadline)
+        for host_id, future in futures.items():
+            if future.done():
+                results[host_id] = future.result()
+            else:
+                cached = self._results.get(host_id)
+                results[host_id] = dict(cached[1], stale=True) if cached else {"host_id": host_id, "status": "pending"}
+        return [results[host[0]] for host in hosts]
+
+    def invalidate(self, host_id=None) -> None:
+        with self._lock:
+            if host_id is None:
+                self._results.clear()
+            else:
+                self._results.pop(host_id, None)
+
+    def _store(self, host_id, future) -> None:
+        with self._lock:
+            self._pending.pop(host_id, None)
+            if not future.cancelled():
+                self._results[host_id] = (time.monotonic(), future.result())
+
+    def _probe(self, host_id, ip_address, os_type) -> dict:
+        result = {"host_id": host_id, "checked_at": datetime.now(timezone.utc).isoformat()}
+        try:
+            if "windows" in (os_type or "").lower():
+                info = HostProbe.probe_windows()
+                formatted = HostProbe.format_windows(info)
+            else:
+                config = self.app.config
+                info = HostProbe.probe_linux(
+                    ip_address, config.get("SSH_DEFAULT_USER", "vagrant"),
+                    config.get("SSH_DEFAULT_PORT", 2222), config.get("SSH_KEY_FILE"), host_id=host_id
+                )
+                formatted = HostProbe.format(info)
+            result.update(status="online", info=info, **formatted)
+        except Exception as e:
+            result.update(status="error", error=str(e))
+        return result
+
+
+host_status = HostStatusCache()
@@ -0,0 +1,276 @@
+import queue
+import threading
+import time
+
+import pyarrow as pa
+
+from app.services.data_manager import DataManager, PartitionWriter
+from app.services.log_analyzer import LogAnalyzer
+
+
+class PipelineAborted(Exception):
+    """Another stage failed - this one stops without a result."""
+
+
+class IngestPipeline:
+    """
+    Collection of one host as stages connected by bounded queues:
+
+        collect -> normalize -> persist   (thread, Parquet day partitions)
+                             -> analyze   (calling thread, LogAnalyzer.detect)
+
+    - collect: reads the collector's record iterator in BATCH_SIZE lists,
+    - normalize: splits a batch by day into RECORD_SCHEMA tables and hands
+      every table to both persist and analyze,
+    - persist: PartitionWriter - the files are written while analysis runs,
+    - analyze: LogAnalyzer.detect on the in-memory tables; a day is
+      analysed as one batch of up to ANALYZE_BATCH_SIZE rows, so a
+      collection that fits is analysed exactly as the stored day file would
+      be (threshold rules see the whole day).
+    Analysis stays in the calling thread, which owns the app context; it
+    only reads - the detections are returned for the caller to write
+    (LogAnalyzer.apply, see db_writer). A full queue blocks
+    its producer (backpressure), so at most QUEUE_SIZE batches wait before
+    each stage. The first error in any stage stops the others, removes the
+    files written so far (also when persist has already finished) and is
+    raised to the caller.
+
+    Counters per stage (batches, records, busy and blocked time, queue
+    depth) accumulate over all runs - see stats().
+    """
+
+    STAGES = ("collect", "normalize", "persist", "analyze")
+    QUEUE_SIZE = 4 # batches waiting before each stage
+    ANALYZE_BATCH_SIZE = 100_000 # rows of one day analysed at once
+    POLL = 0.2 # seconds between checks for a failed stage while blocked on a queue
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._runs = set() # queues of the runs in progress, for the depth gauges
+        self._stats = {name: self._new_stage() for name in self.STAGES}
+        self.runs = 0
+        self.failures = 0
+
+    def configure(self, queue_size=None, analyze_batch_size=None) -> None:
+        if queue_size:
+            self.QUEUE_SIZE = queue_size
+        if analyze_batch_size:
+            self.ANALYZE_BATCH_SIZE = analyze_batch_size
+
+    @staticmethod
+    def _new_stage() -> dict:
+        return {"batches": 0, "records": 0, "busy_seconds": 0.0, "blocked_seconds": 0.0, "errors": 0, "max_depth": 0}
+
+    # ------------------------------------------------------------------ run
+
+    def run(self, records, host_id) -> tuple:
+        """
+        Collects, stores and analyses 'records' (an iterable of log dicts).
+        Returns ([(filename, record_count), ...], [detections, ...]).
+        """
+        run = _Run(self, host_id)
+        with self._lock:
+            self.runs += 1
+            self._runs.add(run)
+
+        threads = [
+            threading.Thread(target=run.stage, args=("collect", run.collect, records),
+                             name=f"ingest-collect-{host_id}", daemon=True),
+            threading.Thread(target=run.stage, args=("normalize", run.normalize),
+                             name=f"ingest-normalize-{host_id}", daemon=True),
+            threading.Thread(target=run.stage, args=("persist", run.persist),
+                             name=f"ingest-persist-{host_id}", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            run.stage("analyze", run.analyze)
+        finally:
+            for thread in threads:
+                thread.join()
+            with self._lock:
+                self._runs.discard(run)
+                if run.error is not None:
+                    self.failures += 1
+
+        if run.error is not None:
+            run.writer.abort()
+            raise run.error
+        return run.files, run.plans
+
+    # ------------------------------------------------------------------ stats
+
+    def _record(self, name, batches=0, records=0, busy=0.0, blocked=0.0, errors=0) -> None:
+        with self._lock:
+            stage = self._stats[name]
+            stage["batches"] += batches
+            stage["records"] += records
+            stage["busy_seconds"] += busy
+            stage["blocked_seconds"] += blocked
+            stage["errors"] += errors
+
+    def _observe_depth(self, name, depth) -> None:
+        with self._lock:
+            stage = self._stats[name]
+            stage["max_depth"] = max(stage["max_depth"], depth)
+
+    def stats(self) -> dict:
+        """
+        Per stage: batches and records processed, busy time (working) and
+        blocked time (waiting for room in the next queue), throughput in
+        records per busy second and the depth of its input queue (now,
+        summed over running collections, and the maximum seen). The
+        bottleneck is the stage with a full input queue and little blocked
+        time; its producers show the blocked time.
+        """
+        with self._lock:
+            depth = {name: 0 for name in self.STAGES}
+            for run in self._runs:
+                for name, stage_queue in run.queues.items():
+                    depth[name] += stage_queue.qsize()
+            stages = {}
+            for name in self.STAGES:
+                stage = dict(self._stats[name])
+                busy = stage["busy_seconds"]
+                stage["busy_seconds"] = round(busy, 3)
+                stage["blocked_seconds"] = round(stage["blocked_seconds"], 3)
+                stage["records_per_second"] = round(stage["records"] / busy, 1) if busy else None
+                if name == "collect": # reads the collector directly, no input queue
+                    stage["queue_depth"] = stage["queue_capacity"] = stage["max_depth"] = None
+                else:
+                    stage["queue_depth"] = depth[name]
+                    stage["queue_capacity"] = self.QUEUE_SIZE
+                stages[name] = stage
+            return {
+                "runs": self.runs,
+                "running": len(self._runs),
+                "failures": self.failures,
+                "analyze_batch_size": self.ANALYZE_BATCH_SIZE,
+                "stages": stages,
+            }
+
+
+class _Run:
+    """Queues and results of one IngestPipeline.run."""
+
+    def __init__(self, pipeline, host_id) -> None:
+        self.pipeline = pipeline
+        self.host_id = host_id
+        # Input queue of every stage after collect; None marks the end of the stream
+        self.queues = {name: queue.Queue(maxsize=pipeline.QUEUE_SIZE) for name in ("normalize", "persist", "analyze")}
+        self.failed = threading.Event()
+        self.error = None
+        self.writer = PartitionWriter(host_id)
+        self.files = []
+        self.plans = []
+
+    def stage(self, name, target, *args) -> None:
+        try:
+            target(*args)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            self.pipeline._record(name, errors=1)
+            if self.error is None:
+                self.error = e
+            self.failed.set()
+
+    # ------------------------------------------------------------------ queues
+
+    def put(self, name, item, producer) -> None:
+        """Blocks while the queue is full (counted as the producer's blocked time)."""
+        stage_queue = self.queues[name]
+        started = time.perf_counter()
+        while True:
+            if self.failed.is_set():
+                raise PipelineAborted()
+            try:
+                stage_queue.put(item, timeout=self.pipeline.POLL)
+                break
+            except queue.Full:
+                continue
+        self.pipeline._record(producer, blocked=time.perf_counter() - started)
+        self.pipeline._observe_depth(name, stage_queue.qsize())
+
+    def get(self, name):
+        stage_queue = self.queues[name]
+        while True:
+            if self.failed.is_set():
+                raise PipelineAborted()
+            try:
+                return stage_queue.get(timeout=self.pipeline.POLL)
+            except queue.Empty:
+                continue
+
+    # ------------------------------------------------------------------ stages
+
+    def collect(self, records) -> None:
+        batches = DataManager.iter_batches(records)
+        try:
+            while True:
+                started = time.perf_counter()
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                self.pipeline._record("collect", batches=1, records=len(batch), busy=time.perf_counter() - started)
+                self.put("normalize", batch, "collect")
+        finally:
+            # Stops the collector early (e.g. kills a streaming PowerShell command) when a stage failed
+            close = getattr(records, "close", None)
+            if close is not None:
+                close()
+        self.put("normalize", None, "collect")
+
+    def normalize(self) -> None:
+        while True:
+            batch = self.get("normalize")
+            if batch is None:
+                break
+            started = time.perf_counter()
+            tables = list(DataManager.split_by_day(batch).items())
+            self.pipeline._record("normalize", batches=1, records=len(batch), busy=time.perf_counter() - started)
+            for item in tables:
+                self.put("persist", item, "normalize")
+                self.put("analyze", item, "normalize")
+        self.put("persist", None, "normalize")
+        self.put("analyze", None, "normalize")
+
+    def persist(self) -> None:
+        while True:
+            item = self.get("persist")
+            if item is None:
+                break
+            day, table = item
+            started = time.perf_counter()
+            self.writer.write(day, table)
+            self.pipeline._record("persist", batches=1, records=table.num_rows, busy=time.perf_counter() - started)
+        started = time.perf_counter()
+        self.files = self.writer.close()
+        self.pipeline._record("persist", busy=time.perf_counter() - started)
+
+    def analyze(self) -> None:
+        pending = {} # day -> [tables, rows]
+        while True:
+            item = self.get("analyze")
+            if item is None:
+                break
+            day, table = item
+            tables = pending.setdefault(day, [[], 0])
+            tables[0].append(table)
+            tables[1] += table.num_rows
+            if tables[1] >= self.pipeline.ANALYZE_BATCH_SIZE:
+                self._analyze(pending.pop(day)[0])
+        for day in sorted(pending):
+            self._analyze(pending[day][0])
+
+    def _analyze(self, tables) -> None:
+        started = time.perf_counter()
+        # Same frame as DataManager.load_logs would give for the stored file
+        df = DataManager.decode_table(pa.concat_tables(tables)).to_pandas()
+        plan = LogAnalyzer.detect(df, self.host_id)
+        if plan is not None:
+            self.plans.append(plan)
+        self.pipeline._record("analyze", batches=1, records=len(df), busy=time.perf_counter() - started)
+
+
+ingest_pipeline = IngestPipeline()
@@ -1,102 +1,302 @@
 import pandas as pd
-from datetime import datetime, timezone, timedelta
+from collections import Counter
+from datetime import datetime, timezone
 from app.extensions import db
 from app.models import Alert, IPRegistry, Host
 from app.services.data_manager import DataManager
+from app.services.reputation import reputation
+from app.services.correlation import correlation
+from app.services.rule_engine import ruleset
+from app.services.alert_stats import AlertStats
+from app.services.metrics import metrics, ANALYZER_SECONDS
+from app.services.db_writer import dialect_insert, upsert
 
 class LogAnalyzer:
 
+    # Typy zdarzeń traktowane jako ataki i pomijane źródła lokalne - w rules/detection_rules.yaml
+    # Maksymalna liczba parametrów w jednym zapytaniu IN (...) - limit SQLite
+    QUERY_CHUNK_SIZE = 500
+
     @staticmethod
     def analyze_parquet(filename, host_id):
         # 1. Wczytanie danych
         df = DataManager.load_logs(filename)
-        
+        return LogAnalyzer.analyze_dataframe(df, host_id)
+
+    @staticmethod
+    def analyze_dataframe(df, host_id):
+        """
+        Set-based analysis of a batch of logs: detect() then apply() in the
+        current session. Returns the number of new alerts.
+        """
+        return LogAnalyzer.apply(LogAnalyzer.detect(df, host_id))
+
+    @staticmethod
+    def detect(df, host_id):
+        """
+        Detection part of the analysis, without database writes (safe to run
+        next to other collections; the result is written by apply(), e.g. in
+        the db_writer thread). Candidate events and threshold detections come
+        from the declarative RuleSet, IP reputation from the in-memory
+        ReputationIndex and cross-host / rate-based detections from the
+        CorrelationEngine (event time, no queries). Returns the registry
+        changes and alert rows, or None when there is nothing to write.
+        """
+        with ANALYZER_SECONDS.time(host=host_id, phase='detect'):
+            return LogAnalyzer._detect(df, host_id)
+
+    @staticmethod
+    def _detect(df, host_id):
         if df.empty:
-            return 0 
-            
+            return None
+
         if 'alert_type' not in df.columns or 'source_ip' not in df.columns:
-            return 0
+            return None
 
-        # 2. Filtrowanie: Interesują nas tylko ataki
-        attack_pattern = ['FAILED_LOGIN', 'INVALID_USER', 'WIN_FAILED_LOGIN', 'SSH_WINDOWS_LOGIN']
-        threats = df[df['alert_type'].isin(attack_pattern)]
-        
-        if threats.empty:
-            return 0
+        # 2. Reguły detekcji (RULES_FILE) - wszystkie reguły w jednym przebiegu po paczce
+        detections = ruleset.evaluate(df)
+        threats = detections['events']
+        aggregates = detections['aggregates']
 
-        alerts_created = 0
-        
-        # 3. Iteracja po zagrożeniach
-        for index, row in threats.iterrows():
-            ip = row['source_ip']
-            user = row.get('user', 'unknown')
-            
-            # Ignorujemy lokalne
-            if ip in ['LOCAL_CONSOLE', '-']:
-                continue
-            
-            # 0. sprawdzenie czy taki sam alert już istnieje
-            log_timestamp = row['timestamp']
-            existing_alert = Alert.query.filter_by(
-                host_id=host_id,
-                source_ip=ip,
-                alert_type=row['alert_type'],
-                timestamp=log_timestamp
-            ).first()
-            if existing_alert:
-                continue
+        if threats.empty and not aggregates:
+            return None
+
+        if 'message' in threats.columns:
+            messages = threats['message'].astype(str)
+        else:
+            messages = pd.Series('Suspicious activity', index=threats.index)
+
+        threats = pd.DataFrame({
+            'source_ip': threats['source_ip'].astype(str),
+            'alert_type': threats['alert_type'].astype(str),
+            'timestamp': pd.to_datetime(threats['timestamp']),
+            'message': messages,
+            'user': threats['user'] if 'user' in threats.columns else None,
+            'rule_severity': threats['severity'],
+        })
+
+        # 0. Deduplikacja w obrębie paczki; alerty już zapisane odrzuca baza (unikalny fingerprint)
+        threats = threats.drop_duplicates(subset=['source_ip', 'alert_type', 'timestamp'])
+        threats = threats.sort_values('timestamp', kind='stable')
+
+        # 1. Reputacja IP - z indeksu w pamięci (adresy i zakresy CIDR), bez zapytań per adres
+        ips = threats['source_ip'].unique().tolist()
+        now = datetime.now(timezone.utc)
+        # Batches analysed before the commit see each other's registry rows
+        entries = {ip: reputation.lookup_pending(ip) for ip in ips}
+        statuses = {ip: entry[1] if entry else 'UNKNOWN' for ip, entry in entries.items()}
+
+        # Zadanie dodatkowe 6.1 Cross-Host Correlation - okno przesuwne na czasie zdarzeń
+        cross_host = pd.Series(False, index=threats.index)
+        cross_host_ips = set()
+        rule_alerts = []
+        for index, ip, user, ts, rule, counters in LogAnalyzer._correlate(threats, host_id):
+            if rule == 'cross_host':
+                if statuses[ip] == 'UNKNOWN' and ip not in cross_host_ips:
+                    cross_host[index] = True
+                    cross_host_ips.add(ip)
+            elif statuses[ip] != 'TRUSTED':
+                rule_alerts.append(LogAnalyzer._rule_alert(rule, ip, user, ts, host_id, counters))
+        for ip in cross_host_ips:
+            statuses[ip] = 'BANNED'
 
-            # 1. Sprawdź, czy IP jest w rejestrze
-            ip_record = IPRegistry.query.filter_by(ip_address=ip).first()
-            
-            if not ip_record:
-                # 2. Jeśli nie ma - dodaj jako UNKNOWN
-                ip_record = IPRegistry(ip_address=ip, status='UNKNOWN')
-                db.session.add(ip_record)
+        plan = {'host_id': host_id, 'entries': entries, 'statuses': statuses, 'banned': cross_host_ips, 'now': now,
+                'alerts': [], 'users': {}}
+
+        # Alerty reguł progowych (jeden na grupę)
+        for found in aggregates:
+            ip = found['source_ip']
+            if ip in statuses:
+                status = statuses[ip]
             else:
-                # 3. Jeśli jest - zaktualizuj czas
-                ip_record.last_seen = datetime.now(timezone.utc)
-
-            # Zadanie dodatkowe 6.1 Cross-Host Correlation
-            cross_host_attack = False
-            if ip_record.status == 'UNKNOWN':
-                ten_min_ago = datetime.now(timezone.utc) - timedelta(minutes=10)
-                other_hosts_attacked = Alert.query.filter(
-                    Alert.source_ip == ip,
-                    Alert.host_id != host_id,
-                    Alert.timestamp > ten_min_ago
-                ).count()
-
-                if other_hosts_attacked > 0:
-                    ip_record.status = 'BANNED'
-                    cross_host_attack = True
-                    db.session.commit()
-
-            if ip_record.status == 'BANNED' and cross_host_attack:
-                severity = 'CRITICAL'
-                msg_prefix = "[CROSS-HOST ATTACK DETECTED]"
-            elif ip_record.status == 'BANNED':
-                severity = 'CRITICAL'
-                msg_prefix = "[BANNED IP DETECTED!] "                
-            else:  
-                severity = 'WARNING'
-                msg_prefix = ""
-
-            if ip_record.status == 'TRUSTED':
+                entry = reputation.lookup_pending(ip) if ip is not None else None
+                status = entry[1] if entry else None
+            if status == 'TRUSTED':
                 continue
-            
-            # 5. Stwórz Alert
-            new_alert = Alert(
-                host_id=host_id,
-                alert_type=row['alert_type'],
-                source_ip=ip,
-                severity=severity,
-                message=f"{msg_prefix}{row.get('message', 'Suspicious activity')}",
-                timestamp=log_timestamp
+            ts = pd.Timestamp(found['timestamp']).to_pydatetime()
+            rule_alerts.append({
+                'host_id': host_id,
+                'alert_type': found['alert_type'],
+                'source_ip': ip,
+                'severity': found['severity'],
+                'message': found['message'],
+                'timestamp': ts,
+                'fingerprint': Alert.make_fingerprint(host_id, ip, found['alert_type'], ts),
+            })
+
+        # Zdarzenie, które wyzwoliło regułę, otrzymuje prefiks CROSS-HOST, pozostałe - BANNED
+        status = threats['source_ip'].map(statuses)
+        threats = threats.assign(status=status, cross_host=cross_host)
+        threats = threats[threats['status'] != 'TRUSTED']
+
+        if threats.empty and not rule_alerts:
+            return plan # registry changes only
+
+        banned = threats['status'] == 'BANNED'
+        severity = threats['rule_severity'].where(~banned, 'CRITICAL')
+        prefix = pd.Series('', index=threats.index)
+        prefix[banned] = "[BANNED IP DETECTED!] "
+        prefix[threats['cross_host']] = "[CROSS-HOST ATTACK DETECTED]"
+
+        # 5. Stwórz Alerty - jeden INSERT dla całej paczki
+        new_alerts = [
+            {
+                'host_id': host_id,
+                'alert_type': alert_type,
+                'source_ip': ip,
+                'severity': sev,
+                'message': f"{pre}{msg}",
+                'timestamp': ts.to_pydatetime(),
+                'fingerprint': Alert.make_fingerprint(host_id, ip, alert_type, ts.to_pydatetime()),
+            }
+            for ip, alert_type, ts, msg, sev, pre in zip(
+                threats['source_ip'], threats['alert_type'], threats['timestamp'],
+                threats['message'], severity, prefix
+            )
+        ] + rule_alerts
+        # User of each event alert - for the top users summary
+        users = {
+            row['fingerprint']: user
+            for row, user in zip(new_alerts, threats['user']) if isinstance(user, str)
+        }
+
+        plan.update(alerts=new_alerts, users=users)
+        return plan
+
+    @staticmethod
+    def apply(plan) -> int:
+        """
+        Writes the result of detect() in the current session: registry
+        changes, then the alerts in one insert-or-ignore statement (alerts
+        whose fingerprint is already stored are skipped, so re-analysing the
+        same logs does not duplicate them). Returns the number of new alerts.
+        """
+        if plan is None:
+            return 0
+        with ANALYZER_SECONDS.time(host=plan['host_id'], phase='apply'):
+            LogAnalyzer._update_registry(plan['entries'], plan['statuses'], plan['banned'], plan['now'])
+            db.session.flush()
+            if not plan['alerts']:
+                return 0
+            return LogAnalyzer._insert_alerts(plan['alerts'], plan['users'])
+
+    @staticmethod
+    def _chunks(values):
+        for i in range(0, len(values), LogAnalyzer.QUERY_CHUNK_SIZE):
+            yield values[i:i + LogAnalyzer.QUERY_CHUNK_SIZE]
+
+    @staticmethod
+    def _update_registry(entries, statuses, banned_ips, now) -> None:
+        """
+        Set-based registry writes: new addresses are inserted (UNKNOWN or, for
+        cross-host attackers, BANNED), matched entries get last_seen refreshed.
+        An address covered only by a CIDR entry gets no row of its own unless
+        it is banned. A new address inserted meanwhile by another collection
+        only gets last_seen (and BANNED, unless TRUSTED). The index is updated
+        when the session commits.
+        """
+        new_rows = [
+            {'ip_address': ip, 'status': statuses[ip], 'last_seen': now}
+            for ip, entry in entries.items()
+            if entry is None or (ip in banned_ips and entry[0] != ip)
+        ]
+        matched = sorted({entry[0] for entry in entries.values() if entry})
+        banned_existing = sorted(ip for ip in banned_ips if entries[ip] and entries[ip][0] == ip)
+
+        for chunk in LogAnalyzer._chunks(matched):
+            db.session.execute(
+                db.update(IPRegistry).where(IPRegistry.ip_address.in_(chunk)).values(last_seen=now)
+            )
+        for chunk in LogAnalyzer._chunks(banned_existing):
+            db.session.execute(
+                db.update(IPRegistry).where(IPRegistry.ip_address.in_(chunk)).values(status='BANNED')
+            )
+        if new_rows:
+            db.session.execute(LogAnalyzer._registry_insert(), new_rows)
+
+        for row in new_rows:
+            reputation.stage(row['ip_address'], row['status'])
+        for ip in banned_existing:
+            reputation.stage(ip, 'BANNED')
+
+    @staticmethod
+    def _registry_insert():
+        """INSERT ... ON CONFLICT (ip_address) DO UPDATE - detections are computed before the write."""
+        table = IPRegistry.__table__
+        stmt, new = dialect_insert(table)
+        values = {
+            'last_seen': new.last_seen,
+            'status': db.case(
+                (db.and_(new.status == 'BANNED', table.c.status != 'TRUSTED'), 'BANNED'),
+                else_=table.c.status
+            ),
+        }
+        return upsert(stmt, ['ip_address'], values)
+
+    @staticmethod
+    def _correlate(threats, host_id) -> list:
+        """
+        Feeds the batch (sorted by event time) to the correlation engine;
+        returns the detections. This runs before the batch is written, so
+        the engine ignores events it has already counted - a batch analysed
+        again after a failed write or a re-analysed file does not inflate
+        the window counters.
+        """
+        detections = []
+        for index, ip, user, ts in zip(threats.index, threats['source_ip'], threats['user'], threats['timestamp']):
+            user = user if isinstance(user, str) else None
+            for rule in correlation.observe(ip, host_id, user, ts.to_pydatetime()):
+                detections.append((index, ip, user, ts, rule, correlation.counters(ip)))
+        return detections
+
+    @staticmethod
+    def _rule_alert(rule, ip, user, ts, host_id, counters) -> dict:
+        """Alert for a rate-based detection (password spray / brute force)."""
+        minutes = correlation.window_seconds // 60
+        if rule == 'password_spray':
+            alert_type = 'PASSWORD_SPRAY'
+            message = f"[PASSWORD SPRAY] {counters['users']} users from {ip} in {minutes} min"
+        else:
+            alert_type = 'BRUTE_FORCE'
+            message = f"[BRUTE FORCE] {correlation.brute_force_failures}+ failures for {user} from {ip} in {minutes} min"
+        return {
+            'host_id': host_id,
+            'alert_type': alert_type,
+            'source_ip': ip,
+            'severity': 'CRITICAL',
+            'message': message,
+            'timestamp': ts.to_pydatetime(),
+            'fingerprint': Alert.make_fingerprint(host_id, ip, alert_type, ts.to_pydatetime()),
+        }
+
+    @staticmethod
+    def _insert_alerts(rows, users=None) -> int:
+        """
+        INSERT ... ON CONFLICT (fingerprint) DO NOTHING; returns the number of
+        inserted rows. The rows actually inserted (RETURNING, or a fingerprint
+        lookup where the dialect lacks it) are added to the dashboard
+        statistics in the same transaction.
+        """
+        table = Alert.__table__
+        dialect = db.session.get_bind().dialect
+        stmt = upsert(dialect_insert(table)[0], ['fingerprint'])
+
+        if dialect.insert_executemany_returning:
+            stmt = stmt.returning(
+                table.c.host_id, table.c.severity, table.c.alert_type,
+                table.c.source_ip, table.c.timestamp, table.c.fingerprint
             )
-            
-            db.session.add(new_alert)
-            alerts_created += 1
+            inserted = [row._asdict() for row in db.session.execute(stmt, rows)]
+        else:
+            existing = set()
+            for chunk in LogAnalyzer._chunks([row['fingerprint'] for row in rows]):
+                existing.update(db.session.scalars(db.select(Alert.fingerprint).where(Alert.fingerprint.in_(chunk))))
+            inserted = [row for row in rows if row['fingerprint'] not in existing]
+            db.session.execute(stmt, rows)
 
-        db.session.commit()
-        return alerts_created
+        if inserted:
+            db.session.info['alerts_inserted'] = True # live feed reads them after commit
+            metrics.stage_alerts(db.session, inserted)
+            users = users or {}
+            AlertStats.record(inserted, Counter(users[row['fingerprint']] for row in inserted if row['fingerprint'] in users))
+        return len(inserted)
@@ -1,6 +1,12 @@
-import re
 import json
+import logging
+import shlex
+import time
 from datetime import datetime
+from app.services.log_matcher import LogMatcher, LINUX_PATTERNS
+from app.services.metrics import LOG_PARSE_RATE, LOG_LINES_PARSED, LOG_RECORDS
+
+logger = logging.getLogger(__name__)
 
 class LogCollector:
     """
@@ -9,133 +15,198 @@ class LogCollector:
 
     # --- KONFIGURACJA LINUX (REGEX) ---
     # Linux w journalctl zwraca treść błędu jako tekst w polu MESSAGE.
-    # Musimy użyć Regex, aby wyciągnąć IP i Usera.
-    LINUX_PATTERNS = {
-        'failed_password': re.compile(r"Failed password for (?:invalid user )?([\w.-]+) from ([\d.]+)"),
-        'invalid_user': re.compile(r"Invalid user ([\w.-]+) from ([\d.]+)"),
-        'sudo': re.compile(r"sudo:\s+([a-zA-Z0-9._-]+)\s*:"),
-    }
+    # Musimy użyć Regex, aby wyciągnąć IP i Usera - wszystkie wzorce
+    # sprawdzane są jednym przebiegiem (prefiltr + jeden połączony regex).
+    # Nowe wzorce: LogCollector.LINUX_MATCHER.register(LogPattern(...))
+    LINUX_MATCHER = LogMatcher(LINUX_PATTERNS)
+
+    # Pola journald, których faktycznie używamy (journalctl >= 236)
+    JOURNAL_FIELDS = "MESSAGE,__REALTIME_TIMESTAMP,__CURSOR"
 
     # =========================================================================
     # METODA 1: LINUX (SSH + Journalctl + Regex)
     # =========================================================================
     @staticmethod
-    def get_linux_logs(ssh_client, last_fetch_time=None):
-        logs = []
-        
+    def get_linux_logs(ssh_client, last_fetch_time=None, checkpoint=None, output_fields=False, remote_filter=True):
+        try:
+            return list(LogCollector.iter_linux_logs(ssh_client, last_fetch_time, checkpoint, output_fields, remote_filter))
+        except Exception as e:
+            logger.error("Error collecting Linux logs: %s", e)
+            # Nie rzucamy wyjątku, żeby błąd jednego hosta nie zatrzymał procesu dla innych
+            return []
+
+    @staticmethod
+    def iter_linux_logs(ssh_client, last_fetch_time=None, checkpoint=None, output_fields=False, remote_filter=True):
+        """
+        Streaming variant: reads journalctl output from the channel line by
+        line and yields parsed events, so memory does not grow with the
+        amount of logs on the host.
+
+        checkpoint: optional dict holding the journald '__CURSOR' of the last
+        entry read ('cursor'). When set, the fetch resumes right after it;
+        the dict is updated in place as entries are consumed.
+
+        output_fields: ask journald only for JOURNAL_FIELDS (opt-in: older
+        journalctl rejects --output-fields).
+        remote_filter: drop lines without any matcher keyword on the host,
+        so only candidate lines cross the wire (see _remote_filter_cmd).
+        The pipe runs with pipefail, so a journalctl error (bad cursor, sudo
+        asking for a password, unknown option) fails the fetch with its
+        stderr instead of looking like an empty journal.
+        """
+        checkpoint = checkpoint if checkpoint is not None else {}
+
         # Budowanie komendy: pobierz JSON z journalctl
         cmd = "sudo journalctl -u ssh -o json --no-pager"
-        
-        if last_fetch_time:
+        if output_fields:
+            cmd += f" --output-fields={LogCollector.JOURNAL_FIELDS}"
+
+        if checkpoint.get('cursor'):
+            # Kursor journald - dokładnie od miejsca, w którym skończyliśmy
+            cmd += f" --after-cursor={shlex.quote(checkpoint['cursor'])}"
+        elif last_fetch_time:
             since_str = last_fetch_time.strftime("%Y-%m-%d %H:%M:%S")
             cmd += f' --since "{since_str}"'
         else:
             cmd += ' --since "7 days ago"' # Domyślny zasięg na start
 
-        print(f"DEBUG [Linux]: Executing {cmd}")
-        
+        if remote_filter:
+            # Exit status of the pipe = journalctl's when it fails, not awk's
+            cmd = "set -o pipefail; " + cmd + " | " + LogCollector._remote_filter_cmd(LogCollector.LINUX_MATCHER.keywords)
+
+        logger.debug("[Linux] Executing %s", cmd)
+
+        yield from LogCollector._parse_lines(
+            ssh_client.iter_lines(cmd), lambda line: LogCollector._parse_journal_line(line, checkpoint),
+            getattr(ssh_client, 'host_label', '')
+        )
+
+    @staticmethod
+    def _parse_lines(lines, parse, host):
+        """
+        Yields parse(line) for every line where it is not None. Only the time
+        spent in parse() counts towards the parse rate reported to metrics
+        (waiting for the host and for the consumer does not). Returns the
+        number of records yielded.
+        """
+        count = records = 0
+        seconds = 0.0
         try:
-            stdout, stderr = ssh_client.run(cmd)
-            
-            if not stdout:
-                return []
-
-            for line in stdout.splitlines():
-                if not line.strip(): continue
-                try:
-                    # Parsowanie JSON z journald
-                    entry = json.loads(line)
-                    message = entry.get('MESSAGE', '')
-                    
-                    # Konwersja czasu (mikrosekundy -> datetime)
-                    ts_micro = int(entry.get('__REALTIME_TIMESTAMP', 0))
-                    timestamp = datetime.fromtimestamp(ts_micro / 1_000_000)
-
-                    # Analiza treści (Logika Regex)
-                    parsed = LogCollector._parse_linux_message(message, timestamp)
-                    if parsed:
-                        logs.append(parsed)
-
-                except json.JSONDecodeError:
-                    continue
+            for line in lines:
+                started = time.perf_counter()
+                record = parse(line)
+                seconds += time.perf_counter() - started
+                count += 1
+                if record is not None:
+                    records += 1
+                    yield record
+        finally:
+            if count:
+                LOG_LINES_PARSED.inc(count, host=host)
+                LOG_RECORDS.inc(records, host=host)
+                if seconds:
+                    LOG_PARSE_RATE.observe(count / seconds, host=host)
+        return records
 
-        except Exception as e:
-            print(f"Error collecting Linux logs: {e}")
-            # Nie rzucamy wyjątku, żeby błąd jednego hosta nie zatrzymał procesu dla innych
-            return []
+    @staticmethod
+    def _parse_journal_line(line, checkpoint):
+        """One journalctl JSON line -> log record, or None; advances checkpoint['cursor']."""
+        if not line.strip():
+            return None
+        try:
+            # Parsowanie JSON z journald
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+        # Kursor przesuwamy dla każdego wpisu, także niepasującego do wzorców
+        if entry.get('__CURSOR'):
+            checkpoint['cursor'] = entry['__CURSOR']
+
+        message = entry.get('MESSAGE', '')
+        if not isinstance(message, str):
+            return None # journald zwraca binarne MESSAGE jako listę bajtów
 
-        return logs
+        # Konwersja czasu (mikrosekundy -> datetime)
+        ts_micro = int(entry.get('__REALTIME_TIMESTAMP', 0))
+        timestamp = datetime.fromtimestamp(ts_micro / 1_000_000)
+
+        # Analiza treści (Logika Regex)
+        return LogCollector._parse_linux_message(message, timestamp)
+
+    @staticmethod
+    def _remote_filter_cmd(keywords) -> str:
+        """
+        awk filter run on the host: prints lines containing any keyword and,
+        at the end, the last line read even if it did not match - its
+        __CURSOR lets the next fetch skip the filtered-out tail.
+        """
+        def awk_str(value):
+            return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+        condition = " || ".join(f"index($0, {awk_str(k)})" for k in keywords)
+        program = f"{condition} {{ print; last = \"\"; next }} {{ last = $0 }} END {{ if (last != \"\") print last }}"
+        return f"awk {shlex.quote(program)}"
 
     @staticmethod
     def _parse_linux_message(message, timestamp):
-        # Helper do sprawdzania Regexów
-        
-        # 1. Failed Password
-        match = LogCollector.LINUX_PATTERNS['failed_password'].search(message)
-        if match:
-            return {
-                'timestamp': timestamp,
-                'alert_type': 'FAILED_LOGIN',
-                'source_ip': match.group(2),
-                'user': match.group(1),
-                'message': message,
-                'raw_log': message
-            }
-        
-        # 2. Invalid User
-        match = LogCollector.LINUX_PATTERNS['invalid_user'].search(message)
-        if match:
-            return {
-                'timestamp': timestamp,
-                'alert_type': 'INVALID_USER',
-                'source_ip': match.group(2),
-                'user': match.group(1),
-                'message': message,
-                'raw_log': message
-            }
-
-        # 3. Sudo
-        match = LogCollector.LINUX_PATTERNS['sudo'].search(message)
-        if match:
-             return {
-                'timestamp': timestamp,
-                'alert_type': 'SUDO_USAGE',
-                'source_ip': 'LOCAL',
-                'user': match.group(1),
-                'message': message,
-                'raw_log': message
-            }
-        return None
+        return LogCollector.LINUX_MATCHER.parse(message, timestamp)
 
  # =========================================================================
     # METODA 2: WINDOWS (PowerShell + XML Parsing)
     # =========================================================================
     @staticmethod
-    def get_windows_logs(win_client, last_fetch_time=None):
-        logs = []
-        
+    def get_windows_logs(win_client, last_fetch_time=None, checkpoint=None):
+        """All Windows log records as a list (see iter_windows_logs)."""
+        return list(LogCollector.iter_windows_logs(win_client, last_fetch_time, checkpoint))
+
+    @staticmethod
+    def iter_windows_logs(win_client, last_fetch_time=None, checkpoint=None):
+        """
+        Yields normalized Windows log records while PowerShell produces them:
+        every event is printed as one compressed JSON object per line and
+        parsed on its own, and the received line is kept as raw_log.
+
+        checkpoint: optional dict with the last seen EventRecordID per log
+        ('record_id' for Security, 'ssh_record_id' for OpenSSH/Operational).
+        When present only records with a higher EventRecordID are fetched;
+        the dict is updated in place with the highest IDs received.
+        """
+        checkpoint = checkpoint if checkpoint is not None else {}
+
         # Budujemy filtr dla PowerShell
+        # Jeśli mamy EventRecordID z poprzedniego pobrania - tylko nowsze rekordy (XPath).
         # Jeśli mamy last_fetch_time, pobieramy logi nowsze niż ta data.
         # Jeśli nie (pierwsze uruchomienie), pobieramy 20 ostatnich.
-        
-        if last_fetch_time:
+
+        if checkpoint.get('record_id'):
+            security_source = (f"-LogName 'Security' -FilterXPath "
+                               f"\"*[System[(EventID=4625) and (EventRecordID > {int(checkpoint['record_id'])})]]\"")
+        elif last_fetch_time:
             # Formatowanie daty dla PowerShell: 'yyyy-MM-dd HH:mm:ss'
             ts_str = last_fetch_time.strftime('%Y-%m-%d %H:%M:%S')
             # StartTime musi być rzutowane na [datetime]
-            filter_script = f"@{{LogName='Security'; Id=4625; StartTime=[datetime]'{ts_str}'}}"
-            params = "" # Pobierz wszystko od tej daty
+            security_source = f"-FilterHashtable @{{LogName='Security'; Id=4625; StartTime=[datetime]'{ts_str}'}}"
+        else:
+            security_source = "-FilterHashtable @{LogName='Security'; Id=4625} -MaxEvents 20" # Domyślny limit na start
+
+        if checkpoint.get('ssh_record_id'):
+            ssh_source = (f"-LogName 'OpenSSH/Operational' -FilterXPath "
+                          f"\"*[System[EventRecordID > {int(checkpoint['ssh_record_id'])}]]\"")
+        elif last_fetch_time:
+            ts_str = last_fetch_time.strftime('%Y-%m-%d %H:%M:%S')
+            ssh_source = f"-FilterHashtable @{{LogName='OpenSSH/Operational'; StartTime=[datetime]'{ts_str}'}}"
         else:
-            filter_script = "@{LogName='Security'; Id=4625}"
-            params = "-MaxEvents 20" # Domyślny limit na start
+            ssh_source = "-LogName 'OpenSSH/Operational' -MaxEvents 20"
 
         # Komenda PowerShell:
         # 1. Get-WinEvent z filtrem
         # 2. ToXml() -> pozwala wyciągnąć IpAddress niezależnie od języka OS
-        # 3. Parsowanie XML i budowanie obiektu JSON
-        
+        # 3. Parsowanie XML i budowanie obiektu JSON - osobno dla każdego zdarzenia (jedna linia na zdarzenie)
+
         ps_security = (
             f"try{{"
-            f"Get-WinEvent -FilterHashtable {filter_script} {params} -ErrorAction SilentlyContinue | "
+            f"Get-WinEvent {security_source} -ErrorAction SilentlyContinue | "
             "ForEach-Object { "
             "   $xml = [xml]$_.ToXml(); "
             "   $data = @{}; "
@@ -144,71 +215,80 @@ class LogCollector:
             "       Timestamp = $_.TimeCreated.ToString('yyyy-MM-dd HH:mm:ss'); "
             "       IpAddress = $data['IpAddress']; "
             "       User = $data['TargetUserName']; "
-            "       EventId = $_.Id "
-            "   } "
-            "} | ConvertTo-Json -Compress"
+            "       EventId = $_.Id; "
+            "       RecordId = $_.RecordId "
+            "   } | ConvertTo-Json -Compress "
+            "}"
             f"}} catch {{ }}"
         )
-        
+
         # collecting OpenSSH logs
         ps_ssh = (
             f"try {{"
-            f"Get-WinEvent -FilterHashtable @{{LogName='OpenSSH/Operational'; StartTime=[datetime]'{ts_str}'}} -ErrorAction SilentlyContinue | "
+            f"Get-WinEvent {ssh_source} -ErrorAction SilentlyContinue | "
             "ForEach-Object { "
             "   if ($_.Message -match 'Failed password for (?:invalid user )?(.+) from ([\\d\\.]+)') { "
             "       [PSCustomObject]@{ "
             "           Timestamp = $_.TimeCreated.ToString('yyyy-MM-dd HH:mm:ss'); "
             "           IpAddress = $matches[2]; "
             "           User = $matches[1]; "
-            "           Type = 'SSH_WINDOWS_LOGIN' "
-            "       } "
+            "           Type = 'SSH_WINDOWS_LOGIN'; "
+            "           RecordId = $_.RecordId "
+            "       } | ConvertTo-Json -Compress "
             "   } "
-            "} | ConvertTo-Json -Compress"
+            "}"
             f"}} catch {{ }}"
         )
 
-        for ps_cmd in [ps_security, ps_ssh]:
-            print(f"DEBUG [Windows]: Executing PS commands for Security") if ps_cmd == ps_security else print(f"DEBUG [Windows]: Executing PS commands for OpenSSH") 
+        for ps_cmd, position_key, log_name in [(ps_security, 'record_id', 'Security'),
+                                               (ps_ssh, 'ssh_record_id', 'OpenSSH')]:
+            logger.debug("[Windows] Executing PS commands for %s", log_name)
             try:
-                stdout = win_client.run_ps(ps_cmd)
-                
-                if not stdout:
-                    continue # Brak logów lub błąd PS
-
-                try:
-                    data = json.loads(stdout)
-                except json.JSONDecodeError:
-                    print("WinLog Error: Invalid JSON output from PowerShell")
-                    continue
-
-                # PowerShell zwraca dict (gdy 1 wynik) lub list (gdy wiele). Ujednolicamy.
-                entries = [data] if isinstance(data, dict) else data
-
-                for entry in entries:
-                    # Czyste dane ze struktury XML
-                    ip = entry.get('IpAddress', 'LOCAL_CONSOLE')
-                    if not ip or ip == '-' or ip == '::1': ip = 'LOCAL_CONSOLE'
-                    user = entry.get('User', 'UNKNOWN')
-                    ts_str = entry.get('Timestamp')
-
-                    alert_type = entry.get('Type', 'WIN_FAILED_LOGIN')                
-
-                    # Konwersja daty (String -> Datetime)
-                    try:
-                        timestamp = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
-                    except (ValueError, TypeError):
-                        timestamp = datetime.now()
-
-                    # Dodajemy do listy w formacie ujednoliconym z Linuxem
-                    logs.append({
-                        'timestamp': timestamp,
-                        'alert_type': alert_type,
-                        'source_ip': ip,
-                        'user': user,
-                        'message': f"{alert_type} for user: {user}",
-                        'raw_log': json.dumps(entry)
-                    })
-                print(f"DEBUG [Windows]: Collected {len(logs)} logs.")
+                count = yield from LogCollector._parse_lines(
+                    win_client.iter_ps_lines(ps_cmd),
+                    lambda line: LogCollector._parse_windows_line(line, checkpoint, position_key),
+                    getattr(win_client, 'host_label', '')
+                )
+                logger.debug("[Windows] Collected %d %s logs.", count, log_name)
             except Exception as e:
-                print(f"Error collecting Windows logs: {e}")
-        return logs
\ No newline at end of file
+                logger.error("Error collecting Windows %s logs: %s", log_name, e)
+
+    @staticmethod
+    def _parse_windows_line(line, checkpoint, position_key):
+        """One JSON object printed by PowerShell -> log record, or None; advances checkpoint[position_key]."""
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("WinLog Error: Invalid JSON output from PowerShell")
+            return None
+        if not isinstance(entry, dict):
+            return None
+
+        # Czyste dane ze struktury XML
+        ip = entry.get('IpAddress', 'LOCAL_CONSOLE')
+        if not ip or ip == '-' or ip == '::1': ip = 'LOCAL_CONSOLE'
+        user = entry.get('User', 'UNKNOWN')
+        ts_str = entry.get('Timestamp')
+
+        alert_type = entry.get('Type', 'WIN_FAILED_LOGIN')
+
+        # Zapamiętujemy najwyższy EventRecordID (kolejne pobranie zacznie za nim)
+        record_id = entry.get('RecordId')
+        if record_id and int(record_id) > int(checkpoint.get(position_key) or 0):
+            checkpoint[position_key] = int(record_id)
+
+        # Konwersja daty (String -> Datetime)
+        try:
+            timestamp = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
+        except (ValueError, TypeError):
+            timestamp = datetime.now()
+
+        # Format ujednolicony z Linuxem; raw_log to linia odebrana z PowerShella
+        return {
+            'timestamp': timestamp,
+            'alert_type': alert_type,
+            'source_ip': ip,
+            'user': user,
+            'message': f"{alert_type} for user: {user}",
+            'raw_log': line
+        }
@@ -0,0 +1,119 @@
+import re
+
+
+class LogPattern:
+    """
+    One detection pattern for a log message.
+    regex may use the named groups 'user' and 'ip'; keywords are plain
+    substrings of which at least one must occur in a matching message.
+    """
+    def __init__(self, name, alert_type, regex, keywords, source_ip=None) -> None:
+        self.name = name
+        self.alert_type = alert_type
+        self.regex = regex
+        self.keywords = tuple(keywords)
+        self.source_ip = source_ip
+
+
+class LogMatcher:
+    """
+    Matches a message against all registered patterns in a single pass.
+
+    A cheap substring prefilter rejects messages that contain none of the
+    patterns' keywords (most sshd lines); the rest go through one compiled
+    alternation of all patterns. When several patterns could match, the
+    leftmost match wins and ties go to the pattern registered first.
+    """
+
+    _GROUP = re.compile(r"\(\?P<(\w+)>")
+
+    def __init__(self, patterns=None) -> None:
+        self.patterns = list(patterns or [])
+        self._compile()
+
+    def register(self, pattern) -> None:
+        """Adds a pattern; it joins the same prefilter and combined regex."""
+        if any(p.name == pattern.name for p in self.patterns):
+            raise ValueError(f"Pattern '{pattern.name}' already registered")
+        self.patterns.append(pattern)
+        self._compile()
+
+    def _compile(self) -> None:
+        self._keywords = tuple(dict.fromkeys(k for p in self.patterns for k in p.keywords))
+        alternatives = []
+        for i, pattern in enumerate(self.patterns):
+            # Group names must be unique across the alternation - prefix them per pattern
+            body = self._GROUP.sub(lambda m: f"(?P<p{i}_{m.group(1)}>", pattern.regex)
+            # An empty marker group at the end tells which alternative matched; a group
+            # wrapping the whole alternative would disable re's literal-prefix scan
+            alternatives.append(f"{body}(?P<p{i}>)")
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+
+        # marker group index -> (pattern, index of 'user' group, index of 'ip' group)
+        self._slots = {}
+        if self._regex is not None:
+            groups = self._regex.groupindex
+            for i, pattern in enumerate(self.patterns):
+                self._slots[groups[f"p{i}"]] = (pattern, groups.get(f"p{i}_user"), groups.get(f"p{i}_ip"))
+
+    @property
+    def keywords(self) -> tuple:
+        return self._keywords
+
+    def match(self, message):
+        """Returns (LogPattern, user, ip) or None."""
+        for keyword in self._keywords:
+            if keyword in message:
+                break
+        else:
+            return None
+
+        m = self._regex.search(message)
+        if m is None:
+            return None
+        # The marker of the matching alternative is the last group closed
+        pattern, user_group, ip_group = self._slots[m.lastindex]
+        return (pattern,
+                m.group(user_group) if user_group else None,
+                m.group(ip_group) if ip_group else None)
+
+    def parse(self, message, timestamp):
+        """Builds a normalized log record or returns None."""
+        result = self.match(message)
+        if result is None:
+            return None
+        pattern, user, ip = result
+        return {
+            'timestamp': timestamp,
+            'alert_type': pattern.alert_type,
+            'source_ip': ip or pattern.source_ip,
+            'user': user,
+            'message': message,
+            'raw_log': message
+        }
+
+
+# Wzorce dla komunikatów sshd / sudo z journald
+LINUX_PATTERNS = [
+    LogPattern('failed_password', 'FAILED_LOGIN',
+               r"Failed password for (?:invalid user )?(?P<user>[\w.-]+) from (?P<ip>[\d.]+)",
+               ["Failed password"]),
+    LogPattern('invalid_user', 'INVALID_USER',
+               r"Invalid user (?P<user>[\w.-]+) from (?P<ip>[\d.]+)",
+               ["Invalid user"]),
+    LogPattern('sudo', 'SUDO_USAGE',
+               r"sudo:\s+(?P<user>[a-zA-Z0-9._-]+)\s*:",
+               ["sudo:"], source_ip='LOCAL'),
+    LogPattern('accepted_publickey', 'ACCEPTED_PUBLICKEY',
+               r"Accepted publickey for (?P<user>[\w.-]+) from (?P<ip>[\d.]+)",
+               ["Accepted publickey"]),
+    LogPattern('preauth_disconnect', 'PREAUTH_DISCONNECT',
+               r"Disconnected from (?:(?:invalid|authenticating) user (?P<user>[\w.-]+) )?(?P<ip>[\d.]+) port \d+ \[preauth\]",
+               ["[preauth]"]),
+    LogPattern('preauth_closed', 'PREAUTH_DISCONNECT',
+               r"Connection closed by (?:(?:invalid|authenticating) user (?P<user>[\w.-]+) )?(?P<ip>[\d.]+) port \d+ \[preauth\]",
+               ["[preauth]"]),
+    LogPattern('pam_auth_failure', 'PAM_AUTH_FAILURE',
+               r"pam_unix\(sshd:auth\): authentication failure;.*?rhost=(?P<ip>[\d.]+)(?:\s+user=(?P<user>[\w.-]+))?",
+               ["authentication failure"]),
+]
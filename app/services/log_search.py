@@ -0,0 +1,156 @@
+from datetime import datetime, timezone
+from itertools import groupby
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from app.services.data_manager import DataManager
+
+
+class LogSearch:
+    """
+    Search over the Parquet archive (storage/host_id=<id>/date=<day>/*.parquet).
+
+    - partition pruning: only directories of the requested hosts and days
+      are listed at all,
+    - predicate pushdown: the time range and equality filters are evaluated
+      by the Parquet reader, which skips row groups using their min/max
+      statistics,
+    - projection: only the requested columns are decoded.
+
+    Files in the typed layout (UTC timestamps, dictionary columns) and
+    legacy ones (naive local timestamps, plain strings) are scanned as
+    separate datasets, each filtered in its own types. Rows come back batch
+    by batch, in storage order (host, day, file), as naive local time and
+    plain strings.
+    """
+
+    PARTITIONING = pa.schema([('host_id', pa.int32()), ('date', pa.string())])
+    FIELDS = ['host_id'] + DataManager.LOG_SCHEMA.names
+    FILTER_FIELDS = ['source_ip', 'user', 'alert_type']
+    BATCH_SIZE = 4096
+
+    @staticmethod
+    def list_files(host_ids=None, start=None, end=None) -> list:
+        """Files of the partitions that can contain matches (pruned by directory name)."""
+        files = []
+        storage = DataManager.STORAGE_DIR
+        if not storage.exists():
+            return files
+
+        first_day = start.date().isoformat() if start else None
+        last_day = end.date().isoformat() if end else None
+
+        for host_dir in sorted(storage.glob("host_id=*")):
+            try:
+                host_id = int(host_dir.name.split("=", 1)[1])
+            except ValueError:
+                continue
+            if host_ids and host_id not in host_ids:
+                continue
+            for day_dir in sorted(host_dir.glob("date=*")):
+                day = day_dir.name.split("=", 1)[1]
+                # ISO dates compare correctly as strings
+                if (first_day and day < first_day) or (last_day and day > last_day):
+                    continue
+                # '_'-prefixed files are still being written
+                files.extend(str(p) for p in sorted(day_dir.glob("*.parquet")) if not p.name.startswith("_"))
+        return files
+
+    @staticmethod
+    def build_filter(start=None, end=None, host_ids=None, timestamp_type=None, **equals):
+        """
+        pyarrow expression for the time range [start, end) (naive local time)
+        and equality filters; 'timestamp_type' is the type of the scanned files.
+        """
+        conditions = []
+        timestamp_type = timestamp_type or pa.timestamp('us')
+        if timestamp_type.tz is not None:
+            start = start.astimezone(timezone.utc) if start else None
+            end = end.astimezone(timezone.utc) if end else None
+        if start:
+            conditions.append(ds.field('timestamp') >= pa.scalar(start, timestamp_type))
+        if end:
+            conditions.append(ds.field('timestamp') < pa.scalar(end, timestamp_type))
+        if host_ids:
+            conditions.append(ds.field('host_id').isin(list(host_ids)))
+        for name in LogSearch.FILTER_FIELDS:
+            if equals.get(name):
+                conditions.append(ds.field(name) == equals[name])
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    @staticmethod
+    def search(start=None, end=None, host_ids=None, columns=None, limit=100, offset=0, **equals):
+        """
+        Yields matching rows as dicts, skipping 'offset' matches and stopping
+        after 'limit'. Only one record batch is held in memory at a time.
+        """
+        files = LogSearch.list_files(host_ids, start, end)
+        if not files or limit <= 0:
+            return
+
+        columns = columns or LogSearch.FIELDS
+        # raw_log may be stored only as message (see DataManager.DEDUP_RAW_LOG)
+        scan_columns = columns + ['message'] if 'raw_log' in columns and 'message' not in columns else columns
+
+        # One dataset only to create the fragments: each fragment reads its footer once (for
+        # _is_typed) and keeps it, so the scans below do not read it again
+        fragments = ds.dataset(
+            files,
+            format="parquet",
+            schema=LogSearch._dataset_schema(DataManager.LOG_SCHEMA),
+            partitioning=ds.partitioning(LogSearch.PARTITIONING, flavor="hive"),
+            partition_base_dir=str(DataManager.STORAGE_DIR)
+        ).get_fragments()
+
+        for typed, run in groupby(fragments, key=LogSearch._is_typed):
+            file_schema = DataManager.LOG_SCHEMA if typed else DataManager.RECORD_SCHEMA
+            run = list(run)
+            dataset = ds.FileSystemDataset(
+                run, LogSearch._dataset_schema(file_schema), run[0].format, filesystem=run[0].filesystem
+            )
+            scanner = dataset.scanner(
+                columns=scan_columns,
+                filter=LogSearch.build_filter(
+                    start, end, host_ids, timestamp_type=file_schema.field('timestamp').type, **equals
+                ),
+                batch_size=LogSearch.BATCH_SIZE
+            )
+
+            for batch in scanner.to_batches():
+                if offset >= batch.num_rows:
+                    offset -= batch.num_rows
+                    continue
+                batch = batch.slice(offset, limit)
+                offset = 0
+                table = DataManager.decode_table(pa.Table.from_batches([batch])).select(columns)
+                for row in table.to_pylist():
+                    yield row
+                limit -= batch.num_rows
+                if limit <= 0:
+                    return
+
+    @staticmethod
+    def _dataset_schema(file_schema) -> pa.Schema:
+        return pa.schema(list(file_schema) + list(LogSearch.PARTITIONING))
+
+    @staticmethod
+    def _is_typed(fragment) -> bool:
+        """True for files written with the typed LOG_SCHEMA (UTC timestamps)."""
+        schema = fragment.physical_schema
+        index = schema.get_field_index('timestamp')
+        return index >= 0 and schema.field(index).type.tz is not None
+
+    @staticmethod
+    def parse_time(value):
+        """ISO date/datetime from a query string -> naive local time (as stored), or None."""
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        return parsed
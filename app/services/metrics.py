@@ -0,0 +1,274 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Upper bounds (le) of the default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    TYPE = None
+
+    def __init__(self, name, documentation, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {} # label values -> state
+
+    def _key(self, labels) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple("" if labels[name] is None else str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series = {}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            lines.extend(self._samples(series))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic total per label set."""
+
+    TYPE = "counter"
+
+    def inc(self, amount=1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _samples(self, series):
+        for key, value in series:
+            yield f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """
+    Observations per label set in fixed buckets (counts per bucket, sum and
+    count); rendered cumulatively, as Prometheus expects.
+    """
+
+    TYPE = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value) # value <= le goes to that bucket, above all of them to +Inf
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                state = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds spent in the with block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels) -> dict:
+        """{'count', 'sum'} of one label set (zeros if never observed)."""
+        with self._lock:
+            state = self._series.get(self._key(labels))
+            return {"count": state[2], "sum": state[1]} if state else {"count": 0, "sum": 0.0}
+
+    def _samples(self, series):
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                yield (f"{self.name}_bucket{_label_text(self.labelnames, key, ('le', _format_value(bound)))} "
+                       f"{cumulative}")
+            labels = _label_text(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """
+    In-process metrics in the Prometheus text exposition format (served at
+    /metrics, see blueprints/metrics.py). Counters and histograms are
+    labelled by host (the host id, or the address for connections made
+    outside a collection) and are updated from any thread.
+
+    init_app() adds per-request timing and SQL statement counts: the
+    statements executed in the request thread between before_request and
+    after_request, labelled by endpoint and the host_id view argument.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+    # session.info key: alerts inserted in the transaction, counted when it commits
+    SESSION_KEY = "metrics_alerts"
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._request = threading.local()
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drops every observed series (the metrics stay registered)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    # ------------------------------------------------------------------ requests
+
+    def init_app(self, app) -> None:
+        from app.extensions import db
+
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._count_query)
+
+        @app.before_request
+        def _start_request():
+            g.metrics_started = time.perf_counter()
+            self._request.queries = 0
+
+        @app.after_request
+        def _finish_request(response):
+            started = g.pop("metrics_started", None)
+            queries = getattr(self._request, "queries", None)
+            self._request.queries = None
+            if started is not None:
+                endpoint = request.endpoint or "<unmatched>"
+                host = (request.view_args or {}).get("host_id", "")
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, host=host)
+                REQUEST_SQL_QUERIES.observe(queries or 0, endpoint=endpoint, host=host)
+            return response
+
+    def _count_query(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        queries = getattr(self._request, "queries", None)
+        if queries is not None:
+            self._request.queries = queries + 1
+
+    # ------------------------------------------------------------------ alerts
+
+    @staticmethod
+    def stage_alerts(session, rows) -> None:
+        """Counts inserted alert rows (host_id, severity) once the session commits."""
+        staged = session.info.setdefault(MetricsRegistry.SESSION_KEY, _Tally())
+        staged.update((row["host_id"], row["severity"]) for row in rows)
+
+
+metrics = MetricsRegistry()
+
+SSH_CONNECT_SECONDS = metrics.histogram(
+    "siem_ssh_connect_seconds", "Time to open an SSH connection (TCP, handshake, authentication).", ["host"]
+)
+REMOTE_COMMAND_SECONDS = metrics.histogram(
+    "siem_remote_command_seconds", "Time from starting a remote command to the end of its output.",
+    ["host", "transport"]
+)
+REMOTE_BYTES_RECEIVED = metrics.histogram(
+    "siem_remote_bytes_received", "Bytes of command output received per remote command.", ["host", "transport"],
+    buckets=(1024, 16384, 131072, 1048576, 8388608, 67108864, 268435456, 1073741824)
+)
+LOG_PARSE_RATE = metrics.histogram(
+    "siem_log_parse_lines_per_second", "Collector parse rate per fetch (lines per second spent parsing).", ["host"],
+    buckets=(1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000, 2500000)
+)
+LOG_LINES_PARSED = metrics.counter(
+    "siem_log_lines_parsed_total", "Lines received from hosts and parsed by the collector.", ["host"]
+)
+LOG_RECORDS = metrics.counter(
+    "siem_log_records_total", "Log records produced by the collector (lines matching a pattern).", ["host"]
+)
+PARQUET_WRITE_SECONDS = metrics.histogram(
+    "siem_parquet_write_seconds", "Time spent converting and writing the Parquet files of one collection.", ["host"]
+)
+ANALYZER_SECONDS = metrics.histogram(
+    "siem_analyzer_seconds", "LogAnalyzer time per batch: detect (rules, reputation, correlation) and apply (writes).",
+    ["host", "phase"]
+)
+ALERTS_CREATED = metrics.counter(
+    "siem_alerts_created_total", "Alerts committed to the database.", ["host", "severity"]
+)
+REQUEST_SECONDS = metrics.histogram(
+    "siem_request_seconds", "HTTP request handling time (until the response is returned by the view).",
+    ["endpoint", "host"]
+)
+REQUEST_SQL_QUERIES = metrics.histogram(
+    "siem_request_sql_queries", "SQL statements executed by the request thread per HTTP request.",
+    ["endpoint", "host"], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _count_alerts(session) -> None:
+    if session.in_nested_transaction():
+        return # a SAVEPOINT (db_writer job) - counted with the outer commit
+    for (host_id, severity), count in session.info.pop(MetricsRegistry.SESSION_KEY, {}).items():
+        ALERTS_CREATED.inc(count, host=host_id, severity=severity)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_alerts(session) -> None:
+    if session.in_nested_transaction():
+        return # a SAVEPOINT - db_writer restores the counts staged before the failed job
+    session.info.pop(MetricsRegistry.SESSION_KEY, None)
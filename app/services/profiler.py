@@ -0,0 +1,153 @@
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of one thread: a helper thread reads the thread's
+    current stack (sys._current_frames) every 'interval' seconds and counts
+    identical stacks. The profiled code is not instrumented, so the cost is
+    one stack walk per sample regardless of how many calls it makes.
+
+    folded() returns the samples in the collapsed-stack format read by
+    flamegraph.pl, speedscope and inferno ("outer;inner;leaf count" per line).
+    """
+
+    def __init__(self, thread_id=None, interval=0.005, root=None) -> None:
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.root = str(root or Path(__file__).resolve().parents[2]) # paths in frames are shown relative to it
+        self.samples = Counter()
+        self.started = self.finished = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._names = {} # code object -> frame label
+
+    def start(self) -> "SamplingProfiler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.finished = time.perf_counter()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return # thread ended
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _label(self, code) -> str:
+        label = self._names.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(self.root):
+                filename = filename[len(self.root):].lstrip("/\\")
+            elif "site-packages" in filename: # installed packages: from the package name on
+                filename = filename.split("site-packages", 1)[1].lstrip("/\\")
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._names[code] = f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        return label
+
+    @property
+    def seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class RequestProfiler:
+    """
+    Opt-in sampling of HTTP requests (PROFILING_ENABLED):
+
+    - any request with ?profile=1 from a logged-in user: the response body
+      is replaced by the folded stacks of the view,
+    - every request to an endpoint listed in PROFILE_ENDPOINTS (e.g.
+      "api_hosts.get_recent_alerts"): the response is unchanged and the folded
+      stacks are saved in PROFILE_DIR, named in the X-Profile-File header.
+
+    Only the view is sampled - the body of a streamed response is produced
+    after the request hooks have run.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.interval = 0.005
+        self.endpoints = set()
+        self.directory = Path.cwd() / "storage" / "profiles"
+
+    def init_app(self, app) -> None:
+        self.enabled = bool(app.config.get("PROFILING_ENABLED"))
+        self.interval = app.config.get("PROFILE_INTERVAL") or self.interval
+        self.endpoints = {e.strip() for e in (app.config.get("PROFILE_ENDPOINTS") or "").split(",") if e.strip()}
+        if app.config.get("PROFILE_DIR"):
+            self.directory = Path(app.config["PROFILE_DIR"])
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def _start_profile():
+            mode = self._mode()
+            if mode:
+                g.profile_mode = mode
+                g.profiler = SamplingProfiler(interval=self.interval).start()
+
+        @app.after_request
+        def _finish_profile(response):
+            profiler = g.pop("profiler", None)
+            if profiler is None:
+                return response
+            profiler.stop()
+            if g.pop("profile_mode") == "inline":
+                response = current_app.response_class(profiler.folded(), mimetype="text/plain")
+            else:
+                response.headers["X-Profile-File"] = self.save(profiler, request.endpoint)
+            response.headers["X-Profile-Samples"] = str(sum(profiler.samples.values()))
+            response.headers["X-Profile-Seconds"] = f"{profiler.seconds:.3f}"
+            return response
+
+        @app.teardown_request
+        def _stop_profile(exc):
+            profiler = g.pop("profiler", None)
+            if profiler is not None:
+                profiler.stop()
+
+    def _mode(self):
+        if request.args.get("profile") == "1" and (
+            current_app.config.get("LOGIN_DISABLED") or current_user.is_authenticated
+        ):
+            return "inline"
+        if request.endpoint in self.endpoints:
+            return "file"
+        return None
+
+    def save(self, profiler, endpoint) -> str:
+        """Writes the folded stacks to PROFILE_DIR; returns the file name."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{endpoint or 'unmatched'}-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.folded"
+        (self.directory / name).write_text(profiler.folded())
+        return name
+
+
+request_profiler = RequestProfiler()
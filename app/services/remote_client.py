@@ -1,68 +1,170 @@
+import logging
+import socket
+import time
 import paramiko
+from app.services.metrics import SSH_CONNECT_SECONDS, REMOTE_COMMAND_SECONDS, REMOTE_BYTES_RECEIVED
+from app.services.ssh_pool import ssh_pool
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteCommandError(RuntimeError):
+    pass
+
 
 class RemoteClient:
     """
     Wrapper around paramiko.SSHClient.
     Supports context manager (with ... as ...).
+    Connections are borrowed from a shared SSHConnectionPool (pass pool=None
+    for a dedicated connection); the SFTP channel is opened only on demand.
+    Connect and command times are reported to metrics under host_label
+    (e.g. the host id; the address when not given).
     """
-    def __init__(self, host, user, port=22, password=None, key_file=None) -> None:
+    def __init__(self, host, user, port=22, password=None, key_file=None, pool=ssh_pool, compress=False,
+                 host_label=None) -> None:
         self.host = host
+        self.host_label = str(host_label) if host_label is not None else host
         self.user = user
         self.port = port
         self.password = password
         self.key_file = key_file
+        self.pool = pool
+        self.compress = compress # zlib on the SSH transport (pooled clients use the pool's setting)
         self.client = None
-        self.sftp = None
+        self._sftp = None
+        # Transfer counters for iter_lines (payload bytes after SSH decompression)
+        self.bytes_received = 0
+        self.lines_received = 0
 
     def __enter__(self):
         """Establishing a connection"""
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
         try:
-            print(f"Connecting to {self.user}@{self.host}:{self.port}...")
-            self.client.connect(
-                hostname=self.host,
-                port=self.port,
-                username=self.user,
-                password=self.password,
-                key_filename=self.key_file,
-                timeout=10,
-                look_for_keys=False,
-                allow_agent=False
-            )
-            self.sftp = self.client.open_sftp()
-            print(f"Connected with {self.host}")
+            if self.pool is not None:
+                self.client = self.pool.acquire(
+                    self.host, self.port, self.user, self.password, self.key_file, label=self.host_label
+                )
+            else:
+                logger.debug("Connecting to %s@%s:%s...", self.user, self.host, self.port)
+                self.client = paramiko.SSHClient()
+                self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                with SSH_CONNECT_SECONDS.time(host=self.host_label):
+                    self.client.connect(
+                        hostname=self.host,
+                        port=self.port,
+                        username=self.user,
+                        password=self.password,
+                        key_filename=self.key_file,
+                        timeout=10,
+                        look_for_keys=False,
+                        allow_agent=False,
+                        compress=self.compress
+                    )
+                logger.debug("Connected with %s", self.host)
         except Exception as e:
-            print(f"No connection: {e}")
+            logger.warning("No connection to %s:%s: %s", self.host, self.port, e)
             raise e # raise again to notify a script using this class
-            
+
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        """Closing a connection"""
-        if self.sftp: self.sftp.close()
-        if self.client: self.client.close()
-        print("Disconnected.")
+        """Closing a connection (or returning it to the pool)"""
+        if self._sftp:
+            self._sftp.close()
+            self._sftp = None
+        if self.client:
+            broken = exc_type is not None and issubclass(exc_type, (paramiko.SSHException, socket.error, EOFError))
+            if self.pool is not None:
+                self.pool.release(self.client, broken=broken)
+            else:
+                self.client.close()
+                logger.debug("Disconnected from %s", self.host)
+            self.client = None
+
+    @property
+    def sftp(self):
+        """SFTP channel, opened on first use."""
+        if self._sftp is None and self.client:
+            self._sftp = self.client.open_sftp()
+        return self._sftp
+
+    def _exec(self, command):
+        try:
+            return self.client.exec_command(command)
+        except (paramiko.SSHException, socket.error, EOFError):
+            if self.pool is None:
+                raise
+            # Pooled transport died since the health check - reconnect once
+            self.pool.invalidate(self.client)
+            self.pool.release(self.client, broken=True)
+            self.client = self.pool.acquire(
+                self.host, self.port, self.user, self.password, self.key_file, label=self.host_label
+            )
+            return self.client.exec_command(command)
 
     def run(self, command) -> tuple:
         """Executes a command and returns (stdout, stderr)"""
         if not self.client:
             raise ConnectionError("Brak połączenia SSH")
-        
-        stdin, stdout, stderr = self.client.exec_command(command)
-        out = stdout.read().decode().strip()
-        err = stderr.read().decode().strip()
-        return out, err
+
+        started = time.perf_counter()
+        stdin, stdout, stderr = self._exec(command)
+        out = stdout.read()
+        err = stderr.read()
+        self._observe(started, len(out) + len(err))
+        return out.decode().strip(), err.decode().strip()
+
+    def iter_lines(self, command, chunk_size=65536):
+        """
+        Executes a command and yields stdout line by line as it arrives,
+        without buffering the whole output in memory. Raises
+        RemoteCommandError with the stderr text when the command exits with
+        a non-zero status. The channel is closed also when the consumer
+        stops early.
+        """
+        if not self.client:
+            raise ConnectionError("Brak połączenia SSH")
+
+        started = time.perf_counter()
+        received = self.bytes_received
+        stdin, stdout, stderr = self._exec(command)
+        channel = stdout.channel
+        pending = b""
+        try:
+            while True:
+                chunk = channel.recv(chunk_size)
+                if not chunk:
+                    break
+                self.bytes_received += len(chunk)
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                self.lines_received += len(lines)
+                for line in lines:
+                    yield line.decode(errors="replace")
+            if pending:
+                self.lines_received += 1
+                yield pending.decode(errors="replace")
+            errors = stderr.read().decode(errors="replace").strip()
+            status = channel.recv_exit_status()
+            # includes the time the consumer spent between lines - the channel is read only as fast as it asks
+            self._observe(started, self.bytes_received - received)
+            if status != 0:
+                raise RemoteCommandError(f"SSH Error (exit {status}): {errors or 'no stderr output'}")
+        finally:
+            channel.close()
+
+    def _observe(self, started, size) -> None:
+        REMOTE_COMMAND_SECONDS.observe(time.perf_counter() - started, host=self.host_label, transport="ssh")
+        REMOTE_BYTES_RECEIVED.observe(size, host=self.host_label, transport="ssh")
 
     def get_file(self, remote_path, local_path) -> bool:
         """Saves a file from the remote server to the local machine."""
-        if self.sftp:
+        if self.client:
             try:
                 self.sftp.get(remote_path, local_path)
-                print(f"Downloaded: {remote_path} to {local_path}")
+                logger.debug("Downloaded: %s to %s", remote_path, local_path)
                 return True
             except IOError as e:
-                print(f"Error downloading a file: {e}")
+                logger.error("Error downloading %s from %s: %s", remote_path, self.host, e)
                 return False
-        return False
\ No newline at end of file
+        return False
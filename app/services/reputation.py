@@ -0,0 +1,166 @@
+import ipaddress
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import IPRegistry
+
+
+class ReputationIndex:
+    """
+    In-memory copy of IPRegistry for per-event lookups.
+
+    Entries are exact addresses or CIDR ranges (e.g. '10.0.0.0/8'). Exact
+    addresses live in a dict; ranges in one dict per prefix length, keyed by
+    the network bits, so a lookup is at most one probe per prefix length in
+    use (longest prefix wins, an exact entry beats any range).
+
+    The index is loaded lazily on first use, reloaded after REPUTATION_TTL
+    seconds (picks up changes made by other processes) and updated in place
+    by the /api/ips endpoints and, on commit, by the analyzer (see stage()).
+    Lookups return (registry key, status) or None.
+    """
+
+    SESSION_KEY = "reputation_pending"
+
+    def __init__(self, ttl=300) -> None:
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._exact = {}
+        self._networks = {4: {}, 6: {}} # version -> {prefix length: {network bits: entry}}
+        self._lengths = {4: [], 6: []}  # prefix lengths in use, longest first
+        self._loaded_at = None
+
+    def configure(self, ttl=None) -> None:
+        if ttl is not None:
+            self.ttl = ttl
+
+    # ------------------------------------------------------------------ loading
+
+    def load(self) -> None:
+        """(Re)builds the index from IPRegistry. Needs an app context."""
+        rows = db.session.query(IPRegistry.ip_address, IPRegistry.status).all()
+        exact, networks, lengths = {}, {4: {}, 6: {}}, {4: [], 6: []}
+        for key, status in rows:
+            self._insert(exact, networks, lengths, key, status)
+        with self._lock:
+            self._exact, self._networks, self._lengths = exact, networks, lengths
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Forces a full reload on the next lookup."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded_at is None or (self.ttl and time.monotonic() - self._loaded_at > self.ttl):
+            self.load()
+
+    # ------------------------------------------------------------------ lookups
+
+    def lookup(self, ip):
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._exact.get(ip)
+            if entry is not None:
+                return entry
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                return None
+            entry = self._exact.get(str(address))
+            if entry is not None:
+                return entry
+
+            bits = int(address)
+            for length in self._lengths[address.version]:
+                entry = self._networks[address.version][length].get(bits >> (address.max_prefixlen - length))
+                if entry is not None:
+                    return entry
+            return None
+
+    def lookup_pending(self, ip):
+        """
+        Like lookup(), but an address staged in the current DB session (by an
+        earlier batch of the same, not yet committed, transaction) wins.
+        """
+        staged = db.session.info.get(self.SESSION_KEY, {}).get(ip)
+        if staged is not None:
+            return (ip, staged)
+        return self.lookup(ip)
+
+    # ------------------------------------------------------------------ updates
+
+    def upsert(self, key, status) -> None:
+        with self._lock:
+            if self._loaded_at is None:
+                return # loaded with this entry on first use
+            self._remove(key)
+            self._insert(self._exact, self._networks, self._lengths, key, status)
+
+    def remove(self, key) -> None:
+        with self._lock:
+            if self._loaded_at is not None:
+                self._remove(key)
+
+    def stage(self, key, status) -> None:
+        """Queues an upsert that is applied when the current DB session commits."""
+        db.session.info.setdefault(self.SESSION_KEY, {})[key] = status
+
+    @staticmethod
+    def _parse(key):
+        try:
+            return ipaddress.ip_network(key.strip(), strict=False)
+        except (ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def _insert(exact, networks, lengths, key, status) -> None:
+        entry = (key, status)
+        network = ReputationIndex._parse(key)
+        if network is None:
+            exact[key] = entry # free-form value - exact string match only
+        elif network.prefixlen == network.max_prefixlen:
+            exact[str(network.network_address)] = entry
+        else:
+            by_length = networks[network.version].setdefault(network.prefixlen, {})
+            by_length[int(network.network_address) >> (network.max_prefixlen - network.prefixlen)] = entry
+            if network.prefixlen not in lengths[network.version]:
+                lengths[network.version].append(network.prefixlen)
+                lengths[network.version].sort(reverse=True)
+
+    def _remove(self, key) -> None:
+        network = self._parse(key)
+        if network is None:
+            self._exact.pop(key, None)
+        elif network.prefixlen == network.max_prefixlen:
+            self._exact.pop(str(network.network_address), None)
+        else:
+            by_length = self._networks[network.version].get(network.prefixlen)
+            if by_length is None:
+                return
+            by_length.pop(int(network.network_address) >> (network.max_prefixlen - network.prefixlen), None)
+            if not by_length:
+                del self._networks[network.version][network.prefixlen]
+                self._lengths[network.version].remove(network.prefixlen)
+
+
+reputation = ReputationIndex()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_staged(session) -> None:
+    if session.in_nested_transaction():
+        return # a SAVEPOINT (db_writer job) - applied with the outer commit
+    for key, status in session.info.pop(ReputationIndex.SESSION_KEY, {}).items():
+        reputation.upsert(key, status)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_staged(session) -> None:
+    if session.in_nested_transaction():
+        return # a SAVEPOINT - db_writer restores the entries staged before the failed job
+    session.info.pop(ReputationIndex.SESSION_KEY, None)
@@ -0,0 +1,322 @@
+import os
+import shutil
+import time
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import current_app
+
+from app.extensions import db
+from app.models import Alert, Host, LogArchive, LogSource
+from app.services.data_manager import DataManager
+from app.services.db_writer import db_writer
+
+
+class RetentionService:
+    """
+    Ages data out by TTL, in bounded batches.
+
+    - alerts: an alert expires after the TTL of its host (Host.alert_retention),
+      else of its severity (ALERT_RETENTION_BY_SEVERITY), else ALERT_RETENTION.
+      Expired alerts are written to compressed Parquet partitions
+      (storage/alerts/host_id=<id>/date=<YYYY-MM-DD>/, ALERT_ARCHIVE) and then
+      deleted by id, BATCH_SIZE at a time,
+    - log files: LogArchive entries fetched more than LOG_RETENTION (or
+      Host.log_retention) ago are deleted with their Parquet files,
+    - alert archives: day partitions older than the same log TTL are removed.
+    A TTL of 0 keeps the data forever. Every delete is one job of db_writer,
+    so retention commits between the ingestion batches instead of holding
+    the write lock. Dashboard rollups (AlertStats) are not decremented -
+    history charts keep counting aged-out alerts. Must run inside an app
+    context; the class defaults are overridden by the config keys.
+    """
+
+    BATCH_SIZE = 5000 # rows per select / delete
+    ALERTS_DIR = "alerts" # under STORAGE_DIR; not a host_id= directory, so LogSearch skips it
+    ALERT_COLUMNS = ("id", "host_id", "timestamp", "alert_type", "severity", "source_ip", "message", "fingerprint")
+    ALERT_SCHEMA = pa.schema([
+        ('id', pa.int64()),
+        ('host_id', pa.int32()),
+        ('timestamp', pa.timestamp('us')), # as stored in the alerts table
+        ('alert_type', pa.dictionary(pa.int32(), pa.string())),
+        ('severity', pa.dictionary(pa.int32(), pa.string())),
+        ('source_ip', pa.dictionary(pa.int32(), pa.string())),
+        ('message', pa.string()),
+        ('fingerprint', pa.string()),
+    ])
+
+    @staticmethod
+    def run(now=None) -> dict:
+        """One retention pass ('now' in naive local time); returns the counts."""
+        started = time.perf_counter()
+        result = RetentionService.expire_alerts(now)
+        result.update(RetentionService.expire_logs(now))
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    # ------------------------------------------------------------------ policy
+
+    @staticmethod
+    def severity_ttls() -> dict:
+        """ALERT_RETENTION_BY_SEVERITY ("CRITICAL=31536000,INFO=604800") -> {severity: seconds}."""
+        ttls = {}
+        for item in (current_app.config.get("ALERT_RETENTION_BY_SEVERITY") or "").split(","):
+            if "=" not in item:
+                continue
+            severity, seconds = item.split("=", 1)
+            ttls[severity.strip().upper()] = int(seconds)
+        return ttls
+
+    @staticmethod
+    def alert_rules() -> list:
+        """[(condition, ttl seconds), ...] - disjoint sets of alerts with their TTL (0 = keep)."""
+        default = current_app.config.get("ALERT_RETENTION", 0)
+        by_severity = RetentionService.severity_ttls()
+        overrides = db.session.execute(
+            db.select(Host.id, Host.alert_retention).where(Host.alert_retention.is_not(None))
+        ).all()
+
+        rules = [(Alert.host_id == host_id, ttl) for host_id, ttl in overrides]
+        if overrides:
+            others = db.or_(Alert.host_id.is_(None), Alert.host_id.not_in([host_id for host_id, _ in overrides]))
+        else:
+            others = db.true()
+        rules += [(db.and_(others, Alert.severity == severity), ttl) for severity, ttl in by_severity.items()]
+        rest = Alert.severity.is_(None)
+        if by_severity:
+            rest = db.or_(rest, Alert.severity.not_in(list(by_severity)))
+        else:
+            rest = db.true()
+        rules.append((db.and_(others, rest), default))
+        return [(condition, ttl) for condition, ttl in rules if ttl]
+
+    @staticmethod
+    def log_ttls() -> dict:
+        """{host_id: log TTL in seconds} of every host."""
+        default = current_app.config.get("LOG_RETENTION", 0)
+        return {
+            host_id: ttl if ttl is not None else default
+            for host_id, ttl in db.session.execute(db.select(Host.id, Host.log_retention))
+        }
+
+    # ------------------------------------------------------------------ alerts
+
+    @staticmethod
+    def expire_alerts(now=None) -> dict:
+        """Archives and deletes the alerts past their TTL."""
+        # Alert timestamps are event times in naive local time
+        now = now or datetime.now()
+        archive = current_app.config.get("ALERT_ARCHIVE", True)
+        result = {"alerts_deleted": 0, "alert_files": 0}
+        for condition, ttl in RetentionService.alert_rules():
+            deleted, files = RetentionService.delete_alerts(
+                db.and_(condition, Alert.timestamp < now - timedelta(seconds=ttl)), archive=archive
+            )
+            result["alerts_deleted"] += deleted
+            result["alert_files"] += files
+        return result
+
+    @staticmethod
+    def delete_alerts(condition, archive=True) -> tuple:
+        """
+        Deletes the alerts matching 'condition', oldest first, in batches
+        (optionally written to the Parquet archive first). Returns
+        (alerts deleted, archive files written).
+        """
+        batch_size = current_app.config.get("RETENTION_BATCH_SIZE", RetentionService.BATCH_SIZE)
+        columns = [getattr(Alert, name) for name in RetentionService.ALERT_COLUMNS]
+        deleted = files = 0
+        last = None
+        while True:
+            query = db.select(*columns).where(condition)
+            if last is not None:
+                # Continue after the previous batch - rows left there (e.g. lost race) are not scanned again
+                query = query.where(
+                    Alert.timestamp >= last[0], db.or_(Alert.timestamp > last[0], Alert.id > last[1])
+                )
+            rows = db.session.execute(query.order_by(Alert.timestamp, Alert.id).limit(batch_size)).all()
+            db.session.rollback() # end the read transaction before waiting for the writer
+            if not rows:
+                break
+            last = (rows[-1].timestamp, rows[-1].id)
+
+            written = RetentionService._write_alerts(rows) if archive else []
+            try:
+                deleted += db_writer.run(RetentionService._delete_ids, Alert, [row.id for row in rows])
+            except Exception:
+                for filename in written:
+                    (DataManager.STORAGE_DIR / filename).unlink(missing_ok=True)
+                raise
+            files += len(written)
+            if len(rows) < batch_size:
+                break
+        return deleted, files
+
+    @staticmethod
+    def _write_alerts(rows) -> list:
+        """One file per host and day of the rows; returns the filenames (relative to STORAGE_DIR)."""
+        table = pa.Table.from_arrays(
+            [pa.array([getattr(row, field.name) for row in rows], field.type) for field in RetentionService.ALERT_SCHEMA],
+            schema=RetentionService.ALERT_SCHEMA
+        )
+
+        groups = defaultdict(list)
+        for index, row in enumerate(rows):
+            groups[(row.host_id or 0, row.timestamp.date())].append(index)
+
+        level = DataManager.COMPRESSION_LEVEL if DataManager.COMPRESSION in ("zstd", "gzip", "brotli") else None
+        written = []
+        try:
+            for (host_id, day), indices in sorted(groups.items()):
+                partition = f"{RetentionService.ALERTS_DIR}/{DataManager.partition_dir(host_id, day)}"
+                (DataManager.STORAGE_DIR / partition).mkdir(parents=True, exist_ok=True)
+                name = DataManager.new_part_name("alerts")
+                tmp_path = DataManager.STORAGE_DIR / partition / f"_{name}"
+                pq.write_table(
+                    table.take(pa.array(indices)), tmp_path,
+                    compression=DataManager.COMPRESSION, compression_level=level
+                )
+                os.replace(tmp_path, DataManager.STORAGE_DIR / partition / name)
+                written.append(f"{partition}/{name}")
+        except Exception:
+            for filename in written:
+                (DataManager.STORAGE_DIR / filename).unlink(missing_ok=True)
+            raise
+        return written
+
+    @staticmethod
+    def load_archived_alerts(host_id=None, start=None, end=None) -> pa.Table:
+        """Alerts moved to the archive, optionally of one host (0 - without a host) and days [start, end]."""
+        root = DataManager.STORAGE_DIR / RetentionService.ALERTS_DIR
+        pattern = f"host_id={host_id}/date=*" if host_id is not None else "host_id=*/date=*"
+        tables = []
+        for day_dir in sorted(root.glob(pattern)):
+            day = datetime.strptime(day_dir.name.split("=", 1)[1], "%Y-%m-%d").date()
+            if (start and day < start) or (end and day > end):
+                continue
+            tables += [pq.read_table(p) for p in sorted(day_dir.glob("*.parquet")) if not p.name.startswith("_")]
+        if not tables:
+            return RetentionService.ALERT_SCHEMA.empty_table()
+        table = pa.concat_tables(tables)
+        # A batch is archived again if the process died between writing it and the delete
+        ids = table["id"].to_pylist()
+        if len(set(ids)) != len(ids):
+            first = {}
+            for index, alert_id in enumerate(ids):
+                first.setdefault(alert_id, index)
+            table = table.take(pa.array(sorted(first.values())))
+        return table
+
+    # ------------------------------------------------------------------ log files
+
+    @staticmethod
+    def expire_logs(now=None) -> dict:
+        """Deletes log files and alert archive days older than the log TTL of their host."""
+        # LogArchive.timestamp is the fetch time in UTC; partition days are local days
+        now = now or datetime.now()
+        now_utc = now.astimezone(timezone.utc).replace(tzinfo=None)
+        today = now.date()
+        default = current_app.config.get("LOG_RETENTION", 0)
+        result = {"log_files_deleted": 0, "log_records_deleted": 0, "alert_days_deleted": 0}
+
+        ttls = RetentionService.log_ttls()
+        for host_id, ttl in ttls.items():
+            if ttl:
+                files, records = RetentionService.delete_archives(
+                    db.and_(LogArchive.host_id == host_id, LogArchive.timestamp < now_utc - timedelta(seconds=ttl))
+                )
+                result["log_files_deleted"] += files
+                result["log_records_deleted"] += records
+
+        root = DataManager.STORAGE_DIR / RetentionService.ALERTS_DIR
+        for day_dir in sorted(root.glob("host_id=*/date=*")):
+            try:
+                host_id = int(day_dir.parent.name.split("=", 1)[1])
+                day = datetime.strptime(day_dir.name.split("=", 1)[1], "%Y-%m-%d").date()
+            except ValueError:
+                continue
+            ttl = ttls.get(host_id, default)
+            if ttl and day < today - timedelta(seconds=ttl):
+                shutil.rmtree(day_dir, ignore_errors=True)
+                RetentionService._remove_empty(day_dir.parent)
+                result["alert_days_deleted"] += 1
+        return result
+
+    @staticmethod
+    def delete_archives(condition) -> tuple:
+        """
+        Deletes the LogArchive entries matching 'condition' in batches, then
+        their files (after the commit - a file is never missing from a
+        committed index). Returns (files, records).
+        """
+        batch_size = current_app.config.get("RETENTION_BATCH_SIZE", RetentionService.BATCH_SIZE)
+        files = records = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(LogArchive.id, LogArchive.filename, LogArchive.record_count)
+                .where(condition, LogArchive.id > last_id)
+                .order_by(LogArchive.id)
+                .limit(batch_size)
+            ).all()
+            db.session.rollback()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            db_writer.run(RetentionService._delete_ids, LogArchive, [row.id for row in rows])
+            for row in rows:
+                path = DataManager.STORAGE_DIR / row.filename
+                path.unlink(missing_ok=True)
+                RetentionService._remove_empty(path.parent)
+            files += len(rows)
+            records += sum(row.record_count or 0 for row in rows)
+            if len(rows) < batch_size:
+                break
+        return files, records
+
+    # ------------------------------------------------------------------ hosts
+
+    @staticmethod
+    def purge_host(host_id) -> dict:
+        """
+        Deletes a host with everything it owns: alerts in batches, then the
+        host row in one short transaction (its log sources and archive
+        index go by ON DELETE CASCADE, or explicitly where foreign keys are
+        not enforced), then its Parquet directories.
+        """
+        alerts, _ = RetentionService.delete_alerts(Alert.host_id == host_id, archive=False)
+        db_writer.run(RetentionService._delete_host, host_id)
+        for directory in (
+            DataManager.STORAGE_DIR / f"host_id={host_id}",
+            DataManager.STORAGE_DIR / RetentionService.ALERTS_DIR / f"host_id={host_id}",
+        ):
+            shutil.rmtree(directory, ignore_errors=True)
+        return {"alerts_deleted": alerts}
+
+    @staticmethod
+    def _delete_host(host_id) -> None:
+        # Alerts inserted since the batches above are few - one statement
+        for model in (Alert, LogArchive, LogSource):
+            db.session.execute(db.delete(model).where(model.host_id == host_id))
+        db.session.execute(db.delete(Host).where(Host.id == host_id))
+
+    # ------------------------------------------------------------------ helpers
+
+    @staticmethod
+    def _delete_ids(model, ids) -> int:
+        return db.session.execute(
+            db.delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        ).rowcount
+
+    @staticmethod
+    def _remove_empty(directory) -> None:
+        """Removes a partition directory (and its host directory) left empty."""
+        for path in (directory, directory.parent):
+            if path == DataManager.STORAGE_DIR or DataManager.STORAGE_DIR not in path.parents:
+                return
+            try:
+                path.rmdir()
+            except OSError:
+                return
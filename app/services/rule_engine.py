@@ -0,0 +1,276 @@
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import yaml
+except ImportError: # JSON rule files work without PyYAML
+    yaml = None
+
+
+SEVERITY_ORDER = ['INFO', 'WARNING', 'CRITICAL']
+
+
+class RuleError(ValueError):
+    pass
+
+
+class DetectionRule:
+    """One compiled rule: a list of predicate keys plus aggregation settings."""
+
+    def __init__(self, name, predicates, severity, alert_type=None, group_by=None,
+                 threshold=None, window=None, message=None, description="") -> None:
+        self.name = name
+        self.predicates = predicates
+        self.severity = severity
+        self.alert_type = alert_type
+        self.group_by = list(group_by or [])
+        self.threshold = threshold
+        self.window = window
+        self.message = message
+        self.description = description
+
+    @property
+    def is_threshold(self) -> bool:
+        return bool(self.group_by)
+
+
+class RuleSet:
+    """
+    Declarative detection rules (YAML or JSON, see rules/detection_rules.yaml).
+
+    Rules are compiled once into vectorized pandas predicates. evaluate()
+    computes every distinct predicate once per batch (rules sharing a
+    condition share the mask), combines them per rule and returns:
+    - 'events': rows matched by any event rule, with the severity of the
+      highest-severity matching rule (the first one on a tie) and its
+      alert_type, if it sets one (otherwise the type from the log),
+    - 'aggregates': one record per group of a threshold rule that reached
+      its threshold inside a window bucket.
+    Hits and evaluation time are counted per rule (stats()).
+    """
+
+    OPERATORS = ('eq', 'ne', 'in', 'not_in', 'contains', 'regex', 'gt', 'gte', 'lt', 'lte', 'is_null', 'not_null')
+    WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def __init__(self, rules=None) -> None:
+        self._lock = threading.Lock()
+        self.source = None
+        self._set_rules(rules or [])
+
+    # ------------------------------------------------------------------ loading
+
+    def load(self, path) -> None:
+        path = Path(path)
+        text = path.read_text(encoding="utf-8")
+        if path.suffix in ('.yaml', '.yml'):
+            if yaml is None:
+                raise RuleError("PyYAML is required for YAML rule files")
+            data = yaml.safe_load(text)
+        else:
+            data = json.loads(text)
+        self._set_rules(self.compile(data))
+        self.source = str(path)
+
+    def compile(self, data) -> list:
+        """Validates rule definitions and turns them into DetectionRule objects."""
+        definitions = data.get('rules', []) if isinstance(data, dict) else data
+        rules, names = [], set()
+        for definition in definitions or []:
+            if not definition.get('enabled', True):
+                continue
+            name = definition.get('name')
+            if not name or name in names:
+                raise RuleError(f"Rule name missing or duplicated: {name!r}")
+            names.add(name)
+
+            severity = str(definition.get('severity', 'WARNING')).upper()
+            if severity not in SEVERITY_ORDER:
+                raise RuleError(f"{name}: unknown severity {severity}")
+
+            predicates = []
+            for field, condition in (definition.get('where') or {}).items():
+                predicates.extend(self._compile_condition(name, field, condition))
+
+            group_by = definition.get('group_by')
+            threshold = window = None
+            if group_by:
+                if isinstance(group_by, str):
+                    group_by = [group_by]
+                threshold = int(definition.get('threshold', 1))
+                window = self._parse_window(name, definition.get('window'))
+                if not definition.get('alert_type'):
+                    raise RuleError(f"{name}: threshold rules need an alert_type")
+
+            rules.append(DetectionRule(
+                name=name, predicates=predicates, severity=severity,
+                alert_type=definition.get('alert_type'), group_by=group_by,
+                threshold=threshold, window=window, message=definition.get('message'),
+                description=definition.get('description', '')
+            ))
+        return rules
+
+    def _compile_condition(self, rule, field, condition) -> list:
+        if isinstance(condition, list):
+            condition = {'in': condition}
+        elif not isinstance(condition, dict):
+            condition = {'eq': condition}
+
+        keys = []
+        for op, value in condition.items():
+            if op not in self.OPERATORS:
+                raise RuleError(f"{rule}: unknown operator '{op}' for field '{field}'")
+            if op in ('in', 'not_in'):
+                value = tuple(value)
+            if op == 'regex':
+                try:
+                    re.compile(value) # fail at load time, not per batch
+                except re.error as e:
+                    raise RuleError(f"{rule}: invalid regex for field '{field}': {e}")
+            # The key identifies the predicate - identical conditions in different rules are computed once
+            keys.append((field, op, value))
+        return keys
+
+    def _parse_window(self, rule, window) -> int:
+        if window is None:
+            return None
+        if isinstance(window, (int, float)):
+            return int(window)
+        match = re.fullmatch(r"(\d+)\s*([smhd])", str(window).strip())
+        if not match:
+            raise RuleError(f"{rule}: invalid window '{window}'")
+        return int(match.group(1)) * self.WINDOW_UNITS[match.group(2)]
+
+    def _set_rules(self, rules) -> None:
+        with self._lock:
+            self.rules = rules
+            self._stats = {r.name: {"evaluations": 0, "hits": 0, "seconds": 0.0} for r in rules}
+
+    # ------------------------------------------------------------------ evaluation
+
+    @staticmethod
+    def _predicate(df, field, op, value) -> pd.Series:
+        if field not in df.columns:
+            column = pd.Series(None, index=df.index, dtype=object)
+        else:
+            column = df[field]
+
+        if op == 'eq':
+            return column == value
+        if op == 'ne':
+            return column != value
+        if op == 'in':
+            return column.isin(value)
+        if op == 'not_in':
+            return ~column.isin(value)
+        if op == 'contains':
+            return column.astype(str).str.contains(value, regex=False, na=False) & column.notna()
+        if op == 'regex':
+            return column.astype(str).str.contains(value, regex=True, na=False) & column.notna()
+        if op == 'is_null':
+            return column.isna() if value else column.notna()
+        if op == 'not_null':
+            return column.notna() if value else column.isna()
+        comparisons = {'gt': column.gt, 'gte': column.ge, 'lt': column.lt, 'lte': column.le}
+        return comparisons[op](value)
+
+    def evaluate(self, df) -> dict:
+        event_rows = pd.Series(False, index=df.index)
+        severity_rank = pd.Series(-1, index=df.index)
+        # alert_type of the winning event rule, None = keep the type from the log
+        alert_types = pd.Series(None, index=df.index, dtype=object)
+        aggregates = []
+        cache = {}
+        timings = {}
+
+        for rule in self.rules:
+            started = time.perf_counter()
+            mask = pd.Series(True, index=df.index)
+            for key in rule.predicates:
+                if key not in cache:
+                    cache[key] = self._predicate(df, *key).fillna(False).astype(bool)
+                mask &= cache[key]
+
+            if rule.is_threshold:
+                found = self._aggregate(df[mask], rule)
+                aggregates.extend(found)
+                hits = len(found)
+            else:
+                event_rows |= mask
+                rank = SEVERITY_ORDER.index(rule.severity)
+                wins = mask & (severity_rank < rank)
+                severity_rank = severity_rank.where(~wins, rank)
+                alert_types = alert_types.where(~wins, rule.alert_type)
+                hits = int(mask.sum())
+            timings[rule.name] = (time.perf_counter() - started, hits)
+
+        with self._lock:
+            for name, (seconds, hits) in timings.items():
+                stats = self._stats.get(name)
+                if stats is not None:
+                    stats["evaluations"] += 1
+                    stats["hits"] += hits
+                    stats["seconds"] += seconds
+
+        events = df[event_rows].assign(severity=severity_rank[event_rows].map(lambda r: SEVERITY_ORDER[r]))
+        overrides = alert_types[event_rows]
+        if overrides.notna().any():
+            events = events.assign(alert_type=overrides.where(overrides.notna(), events.get('alert_type')))
+        return {"events": events, "aggregates": aggregates}
+
+    @staticmethod
+    def _aggregate(matched, rule) -> list:
+        if matched.empty or any(f not in matched.columns for f in rule.group_by + ['timestamp']):
+            return []
+        keys = list(rule.group_by)
+        if rule.window:
+            # Tumbling windows on event time
+            matched = matched.assign(_window=pd.to_datetime(matched['timestamp']).dt.floor(f"{rule.window}s"))
+            keys.append('_window')
+        groups = matched.groupby(keys, dropna=True).agg(count=('timestamp', 'size'), timestamp=('timestamp', 'max'))
+        groups = groups[groups['count'] >= rule.threshold].reset_index()
+
+        if not rule.window:
+            window_label = "batch"
+        elif rule.window % 60 == 0:
+            window_label = f"{rule.window // 60} min"
+        else:
+            window_label = f"{rule.window}s"
+        results = []
+        for record in groups.to_dict('records'):
+            record.pop('_window', None)
+            template = rule.message or f"[{rule.alert_type}] {{count}} events for " + ", ".join(f"{{{f}}}" for f in rule.group_by)
+            results.append({
+                "rule": rule.name,
+                "alert_type": rule.alert_type,
+                "severity": rule.severity,
+                "timestamp": record['timestamp'],
+                "source_ip": record.get('source_ip'),
+                "count": int(record['count']),
+                "message": template.format(window=window_label, **record),
+            })
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "source": self.source,
+                "rules": [
+                    {
+                        "name": rule.name,
+                        "type": "threshold" if rule.is_threshold else "event",
+                        "severity": rule.severity,
+                        **self._stats[rule.name],
+                        "avg_ms": round(self._stats[rule.name]["seconds"] * 1000 / self._stats[rule.name]["evaluations"], 3)
+                        if self._stats[rule.name]["evaluations"] else None,
+                    }
+                    for rule in self.rules
+                ],
+            }
+
+
+ruleset = RuleSet()
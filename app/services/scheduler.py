@@ -0,0 +1,309 @@
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from app.extensions import db
+from app.models import Host, LogSource
+from app.services.collection import CollectionService
+from app.services.compactor import StorageCompactor
+from app.services.alert_stats import AlertStats
+from app.services.retention import RetentionService
+from app.services.correlation import correlation
+from app.services.ssh_pool import ssh_pool
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionScheduler:
+    """
+    Runs log collection for all hosts in a bounded thread pool.
+
+    Every host is collected on its LogSource.fetch_interval (or
+    COLLECTION_INTERVAL), with random jitter so hosts do not all fire at the
+    same moment, and exponential backoff for hosts that keep failing.
+    At most COLLECTION_PER_HOST_LIMIT jobs run per host at once; a trigger for
+    a host that is already busy returns the job that is already in flight.
+    """
+
+    MAX_JOB_HISTORY = 500
+
+    def __init__(self, app=None) -> None:
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()      # job_id -> job dict (most recent last)
+        self._hosts = {}                # host_id -> scheduling state
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.max_workers = app.config.get("COLLECTION_MAX_WORKERS", 8)
+        self.per_host_limit = app.config.get("COLLECTION_PER_HOST_LIMIT", 1)
+        self.default_interval = app.config.get("COLLECTION_INTERVAL", 300)
+        self.jitter = app.config.get("COLLECTION_JITTER", 30)
+        self.max_backoff = app.config.get("COLLECTION_MAX_BACKOFF", 3600)
+        self.tick = app.config.get("SCHEDULER_TICK", 5)
+        self.compaction_interval = app.config.get("COMPACTION_INTERVAL", 3600)
+        self._last_compaction = time.time()
+        self._compaction_thread = None
+        self.last_compaction = None
+        self.retention_interval = app.config.get("RETENTION_INTERVAL", 3600)
+        self._last_retention = time.time()
+        self._retention_thread = None
+        self.last_retention = None
+        self.checkpoint_path = app.config.get("CORRELATION_CHECKPOINT")
+        self.checkpoint_interval = app.config.get("CORRELATION_CHECKPOINT_INTERVAL", 60)
+        self._last_checkpoint = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="collector")
+        app.extensions["collection_scheduler"] = self
+
+        # With the debug reloader the app is created twice - start only in the serving process
+        reloader_parent = app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+        if app.config.get("SCHEDULER_ENABLED") and not reloader_parent:
+            self.start()
+            atexit.register(self.stop)
+
+    # ------------------------------------------------------------------ loop
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="collection-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.tick + 1)
+        self.save_checkpoint()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.schedule_due()
+                ssh_pool.prune()
+                self.compact_due()
+                self.retention_due()
+                if time.time() - self._last_checkpoint >= self.checkpoint_interval:
+                    self.save_checkpoint()
+            except Exception as e:
+                logger.exception("Scheduler error: %s", e)
+            self._stop.wait(self.tick)
+
+    def compact_due(self) -> None:
+        """
+        Starts storage compaction and rollup pruning every COMPACTION_INTERVAL
+        seconds, in its own thread like retention: merging large partitions
+        must not hold up scheduling. Compaction and retention both rewrite
+        partition files, so neither starts while the other is running.
+        """
+        if not self.compaction_interval or time.time() - self._last_compaction < self.compaction_interval:
+            return
+        if self._busy(self._compaction_thread) or self._busy(self._retention_thread):
+            return
+        self._last_compaction = time.time()
+        self._compaction_thread = threading.Thread(target=self._run_compaction, name="compaction", daemon=True)
+        self._compaction_thread.start()
+
+    def _run_compaction(self) -> None:
+        with self.app.app_context():
+            try:
+                result = StorageCompactor.run()
+                result["rollups_pruned"] = AlertStats.prune()
+            except Exception as e:
+                logger.exception("Compaction error: %s", e)
+                result = {"error": str(e)}
+        self.last_compaction = {"finished_at": self._now_iso(), **result}
+
+    def retention_due(self) -> None:
+        """
+        Starts a retention pass every RETENTION_INTERVAL seconds. It runs in
+        its own thread - a large backlog must not hold up scheduling - and
+        its deletes go through db_writer between the collections' writes.
+        """
+        if not self.retention_interval or time.time() - self._last_retention < self.retention_interval:
+            return
+        if self._busy(self._retention_thread) or self._busy(self._compaction_thread):
+            return
+        self._last_retention = time.time()
+        self._retention_thread = threading.Thread(target=self._run_retention, name="retention", daemon=True)
+        self._retention_thread.start()
+
+    def _run_retention(self) -> None:
+        with self.app.app_context():
+            try:
+                result = RetentionService.run()
+            except Exception as e:
+                logger.exception("Retention error: %s", e)
+                result = {"error": str(e)}
+        self.last_retention = {"finished_at": self._now_iso(), **result}
+
+    @staticmethod
+    def _busy(thread) -> bool:
+        return thread is not None and thread.is_alive()
+
+    def save_checkpoint(self) -> None:
+        """Persists the correlation windows so a restart does not lose them."""
+        self._last_checkpoint = time.time()
+        if self.checkpoint_path:
+            correlation.save(self.checkpoint_path)
+
+    def schedule_due(self) -> int:
+        """Submits a job for every host whose next run time has passed."""
+        now = time.time()
+        with self.app.app_context():
+            intervals = dict(db.session.query(LogSource.host_id, LogSource.fetch_interval).all())
+            host_ids = [row[0] for row in db.session.query(Host.id).all()]
+
+        submitted = 0
+        with self._lock:
+            for host_id in host_ids:
+                state = self._host_state(host_id)
+                state["interval"] = intervals.get(host_id) or self.default_interval
+                if state["next_run"] is None:
+                    # First sighting - spread hosts over the jitter window
+                    state["next_run"] = now + random.uniform(0, self.jitter)
+                if state["next_run"] <= now and state["active"] < self.per_host_limit:
+                    self._submit_locked(host_id, "schedule")
+                    submitted += 1
+            for host_id in set(self._hosts) - set(host_ids):
+                if not self._hosts[host_id]["active"]:
+                    del self._hosts[host_id]
+        return submitted
+
+    # ------------------------------------------------------------------ jobs
+
+    def submit(self, host_id, trigger="manual") -> dict:
+        with self._lock:
+            state = self._host_state(host_id)
+            if state["active"] >= self.per_host_limit:
+                return dict(self._jobs[state["last_job"]])
+            return dict(self._submit_locked(host_id, trigger))
+
+    def _submit_locked(self, host_id, trigger) -> dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "host_id": host_id,
+            "trigger": trigger,
+            "status": "queued",
+            "queued_at": self._now_iso(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > self.MAX_JOB_HISTORY:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest["status"] in ("queued", "running"):
+                break
+            del self._jobs[oldest_id]
+
+        state = self._hosts[host_id]
+        state["active"] += 1
+        state["last_job"] = job["id"]
+        # Do not reschedule until this job finishes
+        state["next_run"] = float("inf")
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job) -> None:
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = self._now_iso()
+
+        result, error = None, None
+        try:
+            with self.app.app_context():
+                result = CollectionService.collect_host(job["host_id"])
+        except Exception as e:
+            error = str(e)
+
+        with self._lock:
+            job["finished_at"] = self._now_iso()
+            state = self._host_state(job["host_id"])
+            state["active"] -= 1
+            state["last_run"] = job["finished_at"]
+            if error is None:
+                job["status"] = "done"
+                job["result"] = result
+                state["last_stats"] = result.get("stats")
+                state["failures"] = 0
+                delay = state["interval"]
+            else:
+                job["status"] = "failed"
+                job["error"] = error
+                state["failures"] += 1
+                state["last_error"] = error
+                delay = min(state["interval"] * 2 ** state["failures"], self.max_backoff)
+            state["next_run"] = time.time() + delay + random.uniform(0, self.jitter)
+
+    def _host_state(self, host_id) -> dict:
+        if host_id not in self._hosts:
+            self._hosts[host_id] = {
+                "interval": self.default_interval,
+                "next_run": None,
+                "active": 0,
+                "failures": 0,
+                "last_job": None,
+                "last_run": None,
+                "last_error": None,
+                "last_stats": None,
+            }
+        return self._hosts[host_id]
+
+    @staticmethod
+    def _now_iso() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    # ------------------------------------------------------------------ status
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def status(self) -> dict:
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j["status"] == "queued")
+            running = sum(1 for j in self._jobs.values() if j["status"] == "running")
+            hosts = {}
+            for host_id, state in self._hosts.items():
+                next_run = state["next_run"]
+                hosts[host_id] = {
+                    "interval": state["interval"],
+                    "active_jobs": state["active"],
+                    "failures": state["failures"],
+                    "last_job": state["last_job"],
+                    "last_run": state["last_run"],
+                    "last_error": state["last_error"],
+                    "last_stats": state["last_stats"],
+                    "next_run": (datetime.fromtimestamp(next_run, timezone.utc).isoformat()
+                                 if next_run not in (None, float("inf")) else None),
+                }
+            recent = [dict(j) for j in list(self._jobs.values())[-20:]]
+
+        return {
+            "enabled": bool(self._thread and self._thread.is_alive()),
+            "workers": self.max_workers,
+            "queue_depth": queued,
+            "running": running,
+            "hosts": hosts,
+            "recent_jobs": recent,
+            "last_compaction": self.last_compaction,
+            "last_retention": self.last_retention,
+        }
+
+
+scheduler = CollectionScheduler()
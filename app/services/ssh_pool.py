@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import OrderedDict
+
+import paramiko
+
+from app.services.metrics import SSH_CONNECT_SECONDS
+
+
+class SSHConnectionPool:
+    """
+    Keeps live paramiko connections keyed by (host, port, user).
+
+    A pooled SSHClient may be borrowed by several callers at once - paramiko
+    multiplexes exec channels over one transport. Connections are health
+    checked before reuse, kept alive with SSH keepalives, closed after
+    idle_timeout seconds without use and evicted LRU-first above max_size.
+    """
+
+    def __init__(self, max_size=32, idle_timeout=300, keepalive=30, connect_timeout=10, compress=False) -> None:
+        self.max_size = max_size
+        self.compress = compress
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self._entries = OrderedDict()   # key -> {"client", "in_use", "last_used"}
+        self._lock = threading.Lock()
+        self._connect_locks = {}
+        self._stats = {"hits": 0, "misses": 0, "reconnects": 0, "evictions": 0, "errors": 0}
+
+    def configure(self, max_size=None, idle_timeout=None, keepalive=None, connect_timeout=None, compress=None) -> None:
+        if max_size is not None: self.max_size = max_size
+        if idle_timeout is not None: self.idle_timeout = idle_timeout
+        if keepalive is not None: self.keepalive = keepalive
+        if connect_timeout is not None: self.connect_timeout = connect_timeout
+        if compress is not None: self.compress = compress
+
+    @staticmethod
+    def make_key(host, port, user) -> tuple:
+        return (host, int(port), user)
+
+    def acquire(self, host, port, user, password=None, key_file=None, label=None) -> paramiko.SSHClient:
+        """
+        Returns a connected client, reusing a pooled one when it is still
+        alive. 'label' is the host label of the connect time metric (the
+        address when not given).
+        """
+        key = self.make_key(host, port, user)
+
+        with self._lock:
+            connect_lock = self._connect_locks.setdefault(key, threading.Lock())
+
+        # One connect per key at a time - concurrent callers wait and then reuse it
+        with connect_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                reconnect = entry is not None
+                if entry and self._is_healthy(entry):
+                    self._entries.move_to_end(key)
+                    entry["in_use"] += 1
+                    entry["last_used"] = time.monotonic()
+                    self._stats["hits"] += 1
+                    return entry["client"]
+                if entry:
+                    self._drop(key)
+                self._stats["misses"] += 1
+                if reconnect:
+                    self._stats["reconnects"] += 1
+
+            try:
+                with SSH_CONNECT_SECONDS.time(host=label or host):
+                    client = self._connect(host, port, user, password, key_file)
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise
+
+            with self._lock:
+                self._entries[key] = {"client": client, "in_use": 1, "last_used": time.monotonic()}
+                self._evict()
+            return client
+
+    def release(self, client, broken=False) -> None:
+        """Returns a borrowed client. Broken connections are closed once no longer in use."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry["client"] is client:
+                    entry["in_use"] = max(0, entry["in_use"] - 1)
+                    entry["last_used"] = time.monotonic()
+                    if broken:
+                        entry["broken"] = True
+                        if not entry["in_use"]:
+                            self._drop(key)
+                    break
+            else:
+                # Evicted while borrowed - nobody else holds it
+                client.close()
+                return
+            self._evict()
+
+    def invalidate(self, client) -> None:
+        """Marks a client as dead so the next acquire reconnects."""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry["client"] is client:
+                    entry["broken"] = True
+                    break
+
+    def prune(self) -> None:
+        """Closes idle connections; called periodically by the scheduler loop."""
+        with self._lock:
+            self._evict()
+
+    def close_all(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": round(self._stats["hits"] / lookups, 3) if lookups else None,
+                "size": len(self._entries),
+                "in_use": sum(1 for e in self._entries.values() if e["in_use"]),
+                "max_size": self.max_size,
+            }
+
+    # ------------------------------------------------------------------ internals
+
+    def _connect(self, host, port, user, password, key_file) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            hostname=host,
+            port=port,
+            username=user,
+            password=password,
+            key_filename=key_file or None,
+            timeout=self.connect_timeout,
+            look_for_keys=False,
+            allow_agent=False,
+            compress=self.compress
+        )
+        transport = client.get_transport()
+        if transport and self.keepalive:
+            transport.set_keepalive(self.keepalive)
+        return client
+
+    def _is_healthy(self, entry) -> bool:
+        if entry.get("broken"):
+            return False
+        transport = entry["client"].get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        # Connections idle longer than the keepalive period get an active probe
+        if time.monotonic() - entry["last_used"] > self.keepalive:
+            try:
+                transport.send_ignore()
+            except Exception:
+                return False
+        return True
+
+    def _evict(self) -> None:
+        """Closes idle connections past idle_timeout and trims the pool to max_size (LRU first)."""
+        now = time.monotonic()
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if not entry["in_use"] and now - entry["last_used"] > self.idle_timeout:
+                self._drop(key)
+                self._stats["evictions"] += 1
+
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_size:
+                break
+            if not self._entries[key]["in_use"]:
+                self._drop(key)
+                self._stats["evictions"] += 1
+
+    def _drop(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            try:
+                entry["client"].close()
+            except Exception:
+                pass
+
+
+ssh_pool = SSHConnectionPool()
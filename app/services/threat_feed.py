@@ -0,0 +1,157 @@
+import csv
+import ipaddress
+import time
+from datetime import datetime, timezone
+from itertools import chain, islice
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import IPRegistry
+from app.services.reputation import reputation
+from app.services.db_writer import db_writer, dialect_insert, upsert
+
+
+class ThreatFeed:
+    """
+    Bulk import of address feeds (blocklists) into IPRegistry.
+
+    A feed is read line by line, so its size is not limited by memory:
+    - text: one address or CIDR range per line; '#' / ';' start a comment
+      and only the first word of a line is used (e.g. Spamhaus DROP,
+      FireHOL .netset),
+    - csv: the 'column' column (name or 0-based index; by default a header
+      named ip / ip_address / address / network, else the first column).
+    Values are normalised with ipaddress (2001:DB8::0001 -> 2001:db8::1,
+    10.1.2.3/8 -> 10.0.0.0/8, a /32 or /128 range -> the address) and
+    upserted CHUNK_SIZE at a time - one INSERT ... ON CONFLICT executemany per
+    chunk, committed by db_writer, so an interrupted import keeps the chunks already
+    written. Entries marked TRUSTED keep their status unless
+    keep_trusted=False.
+    """
+
+    CHUNK_SIZE = 5000 # addresses per upsert and commit
+    FORMATS = ("auto", "text", "csv")
+    STATUSES = ("BANNED", "UNKNOWN", "TRUSTED")
+    CSV_COLUMNS = ("ip", "ip_address", "address", "network", "cidr")
+
+    @staticmethod
+    def normalize(value):
+        """Canonical registry key of an address or CIDR range, or None if invalid."""
+        value = (value or "").strip().strip('"')
+        if not value:
+            return None
+        try:
+            if "/" not in value:
+                return str(ipaddress.ip_address(value))
+            network = ipaddress.ip_network(value, strict=False)
+        except ValueError:
+            return None
+        if network.prefixlen == network.max_prefixlen:
+            return str(network.network_address)
+        return str(network)
+
+    @staticmethod
+    def iter_values(lines, fmt="auto", column=None):
+        """Raw address values of a feed (an iterable of text lines)."""
+        lines = iter(lines)
+        if fmt == "auto":
+            first = next(lines, None)
+            if first is None:
+                return
+            # A comma outside a comment means CSV
+            fmt = "csv" if "," in first.split("#", 1)[0] else "text"
+            lines = chain([first], lines)
+
+        if fmt == "text":
+            for line in lines:
+                line = line.split("#", 1)[0].split(";", 1)[0].strip()
+                if line:
+                    yield line.split()[0]
+            return
+
+        reader = csv.reader(line for line in lines if line.strip() and not line.lstrip().startswith("#"))
+        header = next(reader, None)
+        if header is None:
+            return
+        names = [name.strip().lower() for name in header]
+        if column is not None and str(column).isdigit():
+            index = int(column)
+        elif column is not None:
+            if column.lower() not in names:
+                raise ValueError(f"Column '{column}' not found in the CSV header")
+            index = names.index(column.lower())
+        else:
+            index = next((names.index(name) for name in ThreatFeed.CSV_COLUMNS if name in names), None)
+        if index is None:
+            # No header - the first row is data
+            index = 0
+            if header:
+                yield header[0]
+        for row in reader:
+            if len(row) > index:
+                yield row[index]
+
+    @staticmethod
+    def import_feed(lines, status="BANNED", fmt="auto", column=None, chunk_size=None, keep_trusted=True) -> dict:
+        """
+        Upserts every valid address of the feed with the given status and
+        last_seen = now. Needs an app context. Returns the counts, elapsed
+        seconds and rows per second.
+        """
+        status = (status or "BANNED").upper()
+        if status not in ThreatFeed.STATUSES:
+            raise ValueError(f"Unknown status '{status}'")
+        if fmt not in ThreatFeed.FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'")
+        chunk_size = chunk_size or current_app.config.get("IP_IMPORT_CHUNK_SIZE", ThreatFeed.CHUNK_SIZE)
+
+        result = {"read": 0, "invalid": 0, "duplicates": 0, "upserted": 0, "chunks": 0}
+        started = time.perf_counter()
+        values = ThreatFeed.iter_values(lines, fmt, column)
+        seen = set()
+        try:
+            while True:
+                batch = list(islice(values, chunk_size))
+                if not batch:
+                    break
+                result["read"] += len(batch)
+                keys = []
+                for value in batch:
+                    key = ThreatFeed.normalize(value)
+                    if key is None:
+                        result["invalid"] += 1
+                    elif key in seen:
+                        result["duplicates"] += 1
+                    else:
+                        seen.add(key)
+                        keys.append(key)
+                if not keys:
+                    continue
+                # Committed by the single writer, between the ingestion batches
+                db_writer.run(ThreatFeed._upsert, keys, status, datetime.now(timezone.utc), keep_trusted)
+                result["upserted"] += len(keys)
+                result["chunks"] += 1
+        finally:
+            # Committed chunks are in the registry - rebuild the index once instead of per entry
+            if result["chunks"]:
+                reputation.invalidate()
+
+        seconds = time.perf_counter() - started
+        result["seconds"] = round(seconds, 3)
+        result["rows_per_second"] = round(result["read"] / seconds, 1) if seconds else None
+        return result
+
+    @staticmethod
+    def _upsert(keys, status, now, keep_trusted) -> None:
+        """INSERT ... ON CONFLICT (ip_address) DO UPDATE SET status, last_seen - one statement per chunk."""
+        table = IPRegistry.__table__
+        rows = [{"ip_address": key, "status": status, "last_seen": now} for key in keys]
+        stmt, new = dialect_insert(table)
+        new_status = new.status
+        if keep_trusted:
+            new_status = db.case((table.c.status == "TRUSTED", table.c.status), else_=new_status)
+        stmt = upsert(stmt, ["ip_address"], {"status": new_status, "last_seen": now})
+        # executemany of one cached statement - the driver sends the chunk in batches
+        # (sqlite3 executemany, multi-row VALUES on PostgreSQL / MySQL)
+        db.session.execute(stmt, rows)
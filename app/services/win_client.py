@@ -1,11 +1,287 @@
+import atexit
+import base64
+import collections
+import os
+import queue
 import subprocess
+import threading
+import time
+import uuid
+
+from app.services.metrics import REMOTE_COMMAND_SECONDS, REMOTE_BYTES_RECEIVED
+
+
+class PowerShellError(RuntimeError):
+    pass
+
+
+class PowerShellSession:
+    """
+    One long-lived PowerShell process reused for all commands, instead of
+    paying powershell.exe startup (and module loading) on every call.
+
+    Protocol over stdin/stdout, one line per message, payloads base64 (UTF-8):
+        -> @@CMD <id> <base64 script>      whole output in the closing frame
+        -> @@STREAM <id> <base64 script>   every pipeline object as it is produced:
+        <- @@DATA <id> <base64 object>         (stream only)
+        <- @@BEGIN <id> <status>      status 0 = ok, 1 = the script threw
+        <- <base64 output>
+        <- @@END <id>
+    Anything else the process prints (Write-Host, banners) is ignored.
+    Commands run one at a time; a command that exceeds its timeout (for a
+    stream: the time between objects) kills the process, and a dead process
+    is restarted on the next command. A stream is read through a bounded
+    queue, so a slow consumer makes PowerShell wait instead of buffering.
+    'command' is the argv used to start the host (e.g. pwsh, or a stand-in
+    speaking the same framing - see benchmarks/fake_powershell.py).
+    """
+
+    DEFAULT_COMMAND = ["powershell", "-NoLogo", "-NoProfile", "-NonInteractive"]
+    STREAM_QUEUE_SIZE = 10000 # objects read ahead of the consumer
+    HOST_SCRIPT = r"""
+$utf8 = New-Object System.Text.UTF8Encoding $false
+[Console]::OutputEncoding = $utf8
+$stdin = [Console]::In
+$stdout = [Console]::Out
+while ($true) {
+    $line = $stdin.ReadLine()
+    if ($line -eq $null -or $line -eq '@@EXIT') { break }
+    $parts = $line.Split(' ')
+    if ($parts.Length -lt 3 -or ($parts[0] -ne '@@CMD' -and $parts[0] -ne '@@STREAM')) { continue }
+    $id = $parts[1]
+    $status = 0
+    try {
+        $script = $utf8.GetString([Convert]::FromBase64String($parts[2]))
+        if ($parts[0] -eq '@@STREAM') {
+            Invoke-Expression $script | ForEach-Object {
+                $stdout.WriteLine("@@DATA $id " + [Convert]::ToBase64String($utf8.GetBytes([string]$_)))
+            }
+            $out = ''
+        } else {
+            $out = Invoke-Expression $script | Out-String -Width 65536
+        }
+    } catch {
+        $status = 1
+        $out = $_ | Out-String -Width 65536
+    }
+    $stdout.WriteLine("@@BEGIN $id $status")
+    $stdout.WriteLine([Convert]::ToBase64String($utf8.GetBytes([string]$out)))
+    $stdout.WriteLine("@@END $id")
+    $stdout.Flush()
+}
+"""
+
+    def __init__(self, command=None, timeout=120) -> None:
+        self.command = list(command or self.DEFAULT_COMMAND)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._process = None
+        self._responses = None
+        self._reader_stop = None
+        self._stderr = collections.deque(maxlen=20) # last lines, for error messages
+        self.commands_run = 0
+        self.restarts = 0
+        self._started = False
+        atexit.register(self.close)
+
+    def configure(self, command=None, timeout=None) -> None:
+        with self._lock:
+            if command:
+                self.command = list(command)
+            if timeout:
+                self.timeout = timeout
+            self._stop_locked()
+
+    # ------------------------------------------------------------------ process
+
+    def _start_locked(self) -> None:
+        encoded = base64.b64encode(self.HOST_SCRIPT.encode("utf-16-le")).decode("ascii")
+        if self._started:
+            self.restarts += 1
+        self._started = True
+        self._stderr.clear()
+        self._process = subprocess.Popen(
+            self.command + ["-EncodedCommand", encoded],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        # Every process gets its own queue, so a dead process cannot answer for a new one
+        self._responses = queue.Queue(maxsize=self.STREAM_QUEUE_SIZE)
+        self._reader_stop = threading.Event()
+        threading.Thread(
+            target=self._read_frames, args=(self._process.stdout, self._responses, self._reader_stop),
+            name="powershell-reader", daemon=True
+        ).start()
+        threading.Thread(
+            target=self._read_stderr, args=(self._process.stderr,), name="powershell-stderr", daemon=True
+        ).start()
+
+    def _stop_locked(self) -> None:
+        process, self._process = self._process, None
+        if process is None:
+            return
+        self._reader_stop.set()
+        try:
+            if process.poll() is None:
+                process.stdin.write(b"@@EXIT\n")
+                process.stdin.flush()
+                process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    @staticmethod
+    def _read_frames(stream, responses, stop) -> None:
+        """
+        Reader thread: puts ('data', id, text) for @@DATA lines and
+        ('end', id, status, output) for @@BEGIN/payload/@@END frames.
+        """
+        def put(item):
+            while not stop.is_set():
+                try:
+                    responses.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        frame = None
+        for raw in iter(stream.readline, b""):
+            line = raw.decode("ascii", errors="replace").strip()
+            if line.startswith("@@DATA "):
+                parts = line.split(" ", 2)
+                data = parts[2] if len(parts) > 2 else ""
+                put(("data", parts[1], base64.b64decode(data).decode("utf-8", errors="replace")))
+            elif line.startswith("@@BEGIN "):
+                parts = line.split()
+                frame = [parts[1], parts[2] if len(parts) > 2 else "1", None]
+            elif line.startswith("@@END ") and frame is not None:
+                output = base64.b64decode(frame[2] or b"").decode("utf-8", errors="replace")
+                put(("end", frame[0], frame[1], output))
+                frame = None
+            elif frame is not None and frame[2] is None:
+                frame[2] = line
+            if stop.is_set():
+                return
+        put(None) # end of stream - the process exited
+
+    def _read_stderr(self, stream) -> None:
+        for raw in iter(stream.readline, b""):
+            self._stderr.append(raw.decode("utf-8", errors="replace").rstrip())
+
+    # ------------------------------------------------------------------ commands
+
+    def _send_locked(self, kind, cmd) -> str:
+        """Writes a @@CMD / @@STREAM message (starting the process if needed); returns its id."""
+        for attempt in range(2):
+            if self._process is None or self._process.poll() is not None:
+                self._start_locked()
+            command_id = uuid.uuid4().hex[:12]
+            script = base64.b64encode(cmd.encode("utf-8")).decode("ascii")
+            try:
+                self._process.stdin.write(f"{kind} {command_id} {script}\n".encode("ascii"))
+                self._process.stdin.flush()
+                return command_id
+            except OSError:
+                # Died while idle - start a new process and send the command again (once)
+                self._stop_locked()
+                if attempt:
+                    raise PowerShellError("PS Error: cannot start PowerShell")
+
+    def _next_locked(self, command_id, timeout) -> tuple:
+        """Next data / end item of this command; raises on timeout or when the process exits."""
+        while True:
+            try:
+                response = self._responses.get(timeout=timeout)
+            except queue.Empty:
+                self._kill_locked()
+                raise TimeoutError(f"PowerShell command timed out after {timeout}s")
+            if response is None:
+                details = "; ".join(self._stderr) or f"exit code {self._process.wait()}"
+                self._process = None
+                raise PowerShellError(f"PS Error: PowerShell exited ({details})")
+            if response[1] == command_id:
+                return response
+
+    def run(self, cmd, timeout=None) -> str:
+        """Runs a script in the shared process and returns its output (stripped)."""
+        timeout = timeout or self.timeout
+        with self._lock:
+            command_id = self._send_locked("@@CMD", cmd)
+            while True:
+                response = self._next_locked(command_id, timeout)
+                if response[0] == "end":
+                    break
+
+            self.commands_run += 1
+            _, _, status, output = response
+            if status != "0":
+                raise PowerShellError(f"PS Error: {output.strip()}")
+            return output.strip()
+
+    def iter_lines(self, cmd, timeout=None):
+        """
+        Runs a script and yields every object of its output (as a string)
+        while it runs. The session is held until the generator is exhausted;
+        closing it early kills the process.
+        """
+        timeout = timeout or self.timeout
+        with self._lock:
+            command_id = self._send_locked("@@STREAM", cmd)
+            finished = False
+            try:
+                while True:
+                    response = self._next_locked(command_id, timeout)
+                    if response[0] == "data":
+                        yield response[2]
+                        continue
+                    finished = True
+                    self.commands_run += 1
+                    if response[2] != "0":
+                        raise PowerShellError(f"PS Error: {response[3].strip()}")
+                    return
+            finally:
+                if not finished and self._process is not None:
+                    self._kill_locked() # abandoned mid-stream, the rest of the output is not wanted
+
+    def _kill_locked(self) -> None:
+        process, self._process = self._process, None
+        if self._reader_stop is not None:
+            self._reader_stop.set()
+        if process is not None and process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = self._process is not None and self._process.poll() is None
+            return {
+                "running": running,
+                "pid": self._process.pid if running else None,
+                "commands_run": self.commands_run,
+                "restarts": self.restarts,
+            }
+
+
+ps_session = PowerShellSession()
+
 
 class WinClient:
     """
-    Wrapper for subprocess to run PowerShell locally.
+    Wrapper to run PowerShell locally.
+    Commands go to the shared PowerShellSession; pass session=None to start
+    a new powershell process for every command. Command times are
+    reported to metrics under host_label.
     """
-    def __init__(self):
-        pass
+    def __init__(self, session=ps_session, command=None, timeout=None, host_label="local"):
+        self.session = session
+        self.command = list(command or PowerShellSession.DEFAULT_COMMAND)
+        self.timeout = timeout
+        self.host_label = str(host_label)
 
     def __enter__(self):
         return self
@@ -15,24 +291,70 @@ class WinClient:
 
     def run_ps(self, cmd):
         """Executes a PowerShell command and returns the output."""
-        full_cmd = ["powershell", "-Command", cmd]
-        
+        started = time.perf_counter()
+        output = self._run_ps(cmd)
+        self._observe(started, len(output.encode()))
+        return output
+
+    def _run_ps(self, cmd):
+        if self.session is not None:
+            return self.session.run(cmd, timeout=self.timeout)
+
+        full_cmd = self.command + ["-Command", cmd]
+
         try:
             # encoding='oem' or 'cp852' for Polish Windows
             result = subprocess.run(
-                full_cmd, 
-                capture_output=True, 
-                text=True, 
-                encoding='oem' 
+                full_cmd,
+                capture_output=True,
+                text=True,
+                encoding='oem' if os.name == 'nt' else 'utf-8',
+                timeout=self.timeout
             )
             if result.returncode != 0:
-                raise Exception(f"PS Error: {result.stderr.strip()}")
-            
+                raise PowerShellError(f"PS Error: {result.stderr.strip()}")
+
             return result.stdout.strip()
         except Exception as e:
             raise e
 
+    def iter_ps_lines(self, cmd):
+        """Executes a PowerShell command and yields its output line by line as it is produced."""
+        started = time.perf_counter()
+        received = 0
+        for line in self._iter_ps_lines(cmd):
+            received += len(line) + 1
+            yield line
+        self._observe(started, received)
+
+    def _observe(self, started, size) -> None:
+        REMOTE_COMMAND_SECONDS.observe(time.perf_counter() - started, host=self.host_label, transport="powershell")
+        REMOTE_BYTES_RECEIVED.observe(size, host=self.host_label, transport="powershell")
+
+    def _iter_ps_lines(self, cmd):
+        if self.session is not None:
+            yield from self.session.iter_lines(cmd, timeout=self.timeout)
+            return
+
+        process = subprocess.Popen(
+            self.command + ["-Command", cmd],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding='oem' if os.name == 'nt' else 'utf-8'
+        )
+        try:
+            for line in process.stdout:
+                line = line.rstrip("\r\n")
+                if line:
+                    yield line
+            stderr = process.stderr.read()
+            if process.wait(timeout=self.timeout) != 0:
+                raise PowerShellError(f"PS Error: {stderr.strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
     def get_logs_json(self, log_name, limit=10):
         """Special method to get logs as JSON"""
         ps_cmd = f"Get-WinEvent -LogName '{log_name}' -MaxEvents {limit} | Select-Object TimeCreated, Id, Message | ConvertTo-Json"
-        return self.run_ps(ps_cmd)
\ No newline at end of file
+        return self.run_ps(ps_cmd)
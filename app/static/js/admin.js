@@ -121,12 +121,28 @@ async function handleSaveHost() {
 // TODO: ZADANIE 3 (Frontend) - Odkomentuj całą poniższą sekcję
 // Uwaga: Funkcje fetchIPs, createIP itd. muszą zostać zaimplementowane w api.js!
 
+const IPS_PAGE_SIZE = 100;
+
 async function refreshIPs() {
     clearContainer(ipContainer);
+    await loadIPs();
+}
+
+// Appends the next page of the registry; while pages are full, a button loads the one after it
+async function loadIPs(after = null) {
     try {
-        const ips = await fetchIPs(); // <-- To musi działać w api.js
-        if(ips.length === 0) createEl('div', ['p-2', 'text-muted', 'small'], 'Pusto.', ipContainer);
+        const ips = await fetchIPs(IPS_PAGE_SIZE, after); // <-- To musi działać w api.js
+        if(!after && ips.length === 0) createEl('div', ['p-2', 'text-muted', 'small'], 'Pusto.', ipContainer);
         ips.forEach(renderIPRow);
+        const last = ips[ips.length - 1];
+        if(ips.length === IPS_PAGE_SIZE && last.last_seen) {
+            const more = createEl('button', ['list-group-item', 'list-group-item-action', 'text-center', 'small'], 'Pokaż więcej', ipContainer);
+            more.type = 'button';
+            more.addEventListener('click', async () => {
+                more.remove();
+                await loadIPs(last);
+            });
+        }
     } catch(e) { console.error("Błąd IP:", e); }
 }
 
@@ -60,6 +60,13 @@ export async function checkHostStatus(id, osType) {
     return await res.json();
 }
 
+// status of all hosts in one request (cached on the server, ?refresh=1 probes again)
+export async function fetchHostsStatus(refresh = false) {
+    const res = await fetch(`/api/hosts/status${refresh ? '?refresh=1' : ''}`);
+    if (!res.ok) throw new Error(`Błąd HTTP ${res.status}`);
+    return await res.json();
+}
+
 export async function triggerLogFetch(hostId) {
     const res = await fetch(`/api/hosts/${hostId}/logs`, {
         method: 'POST',
@@ -72,6 +79,22 @@ export async function triggerLogFetch(hostId) {
     return await res.json();
 }
 
+// collection runs in the background - poll the job until it finishes
+export async function fetchJob(jobId) {
+    const res = await fetch(`/api/jobs/${jobId}`);
+    if (!res.ok) throw new Error('Błąd pobierania statusu zadania');
+    return await res.json();
+}
+
+export async function waitForJob(jobId, intervalMs = 1000) {
+    while (true) {
+        const job = await fetchJob(jobId);
+        if (job.status === 'done') return job.result;
+        if (job.status === 'failed') throw new Error(job.error || 'Błąd pobierania logów');
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 // ===============================================================
 // TODO: ZADANIE 4 - KOMUNIKACJA FRONTEND-BACKEND
 // ===============================================================
@@ -79,8 +102,14 @@ export async function triggerLogFetch(hostId) {
 // Panel Admina i Dashboard będą rzucać błędy, dopóki tego nie uzupełnisz.
 // Wzoruj się na funkcjach z sekcji HOSTS powyżej.
 
-export async function fetchIPs() {
-    const res = await fetch('/api/ips');
+// One page of the registry, most recently seen first; 'after' = last entry of the previous page (keyset)
+export async function fetchIPs(limit = 100, after = null) {
+    const params = new URLSearchParams({ limit });
+    if (after) {
+        params.set('before', after.last_seen);
+        params.set('before_id', after.id);
+    }
+    const res = await fetch(`/api/ips?${params}`);
     if(!res.ok) throw new Error('Błąd pobierania IP');
     return await res.json();
 }
@@ -116,12 +145,21 @@ export async function removeIP(id) {
     if(!res.ok) throw new Error('Błąd usuwania IP');
 }
 
-export async function fetchAlerts() {
-    const res = await fetch('/api/alerts');
+export async function fetchAlerts(limit = 20) {
+    const res = await fetch(`/api/alerts?limit=${limit}`);
     if(!res.ok) throw new Error('Błąd pobierania alertów');
     return await res.json();
 }
 
+// live feed (SSE) - new alerts are pushed by the server, EventSource reconnects by itself
+export function openAlertStream(sinceId, onAlert) {
+    const query = (sinceId !== null && sinceId !== undefined) ? `?since_id=${sinceId}` : '';
+    const source = new EventSource(`/api/alerts/stream${query}`);
+    source.addEventListener('alert', (e) => onAlert(JSON.parse(e.data)));
+    source.onerror = () => console.warn("Strumień alertów: ponowne łączenie...");
+    return source;
+}
+
 
 // fetch top 5 IPs chart
 export async function fetchTopIPStats() {
@@ -1,9 +1,13 @@
 import { createEl, clearContainer } from './dom.js';
-import { fetchHosts, checkHostStatus, triggerLogFetch } from './api.js'; 
-import { fetchAlerts, fetchTopIPStats } from './api.js';
+import { fetchHosts, fetchHostsStatus, checkHostStatus, triggerLogFetch, waitForJob } from './api.js'; 
+import { fetchAlerts, fetchTopIPStats, openAlertStream } from './api.js';
 
 const hostsContainer = document.getElementById('hostsContainer');
 const alertsBody = document.getElementById('alertsBody');
+const MAX_ALERT_ROWS = 50;
+const statusCells = new Map(); // host id -> status column
+let alertStream = null;
+let chartRefreshTimer = null;
 
 export async function initDashboard() {
     if (!hostsContainer) return;
@@ -12,12 +16,14 @@ export async function initDashboard() {
     await initStatsChart();
 
     if (alertsBody) {
-        await refreshAlertsTable();
+        const lastId = await refreshAlertsTable();
+        startAlertStream(lastId);
     }
 }
 
 async function refreshHostsList() {
     clearContainer(hostsContainer);
+    statusCells.clear();
     try {
         const hosts = await fetchHosts();
         if (hosts.length === 0) {
@@ -25,12 +31,34 @@ async function refreshHostsList() {
             return;
         }
         hosts.forEach(renderDashboardRow);
+        loadFleetStatus();
     } catch (err) {
         console.error(err);
         createEl('div', ['alert', 'alert-danger'], 'Błąd API Hostów', hostsContainer);
     }
 }
 
+// Statusy wszystkich hostów jednym zapytaniem (bez czekania na kliknięcie "Status")
+async function loadFleetStatus() {
+    try {
+        const statuses = await fetchHostsStatus();
+        // wolne hosty dokończą sondę w tle - ich wynik będzie już w cache serwera
+        if (statuses.some(status => status.status === 'pending')) setTimeout(loadFleetStatus, 5000);
+        statuses.forEach(status => {
+            const container = statusCells.get(status.host_id);
+            if (!container) return;
+            if (status.status === 'online') {
+                renderStatusBadges(container, status);
+            } else if (status.status === 'error') {
+                clearContainer(container);
+                createEl('div', ['text-danger', 'small', 'fw-bold', 'text-center'], 'Offline', container).title = status.error || '';
+            }
+        });
+    } catch (err) {
+        console.error(err);
+    }
+}
+
 function renderDashboardRow(host) {
     const item = createEl('div', ['list-group-item', 'py-3', 'border-bottom'], '', hostsContainer);
     const row = createEl('div', ['row', 'align-items-center', 'flex-nowrap', 'g-0'], '', item);
@@ -45,7 +73,8 @@ function renderDashboardRow(host) {
     
     // KOLUMNA 2: STATUS
     const colStatus = createEl('div', ['col-5', 'px-2'], '', row);
-    createEl('div', ['text-muted', 'small', 'text-center', 'fst-italic'], 'Kliknij Status...', colStatus);
+    createEl('div', ['text-muted', 'small', 'text-center', 'fst-italic'], 'Sprawdzanie...', colStatus);
+    statusCells.set(host.id, colStatus);
 
     // KOLUMNA 3: AKCJE
     const colActions = createEl('div', ['col-3', 'text-end'], '', row);
@@ -69,12 +98,7 @@ async function handleCheckStatusFancy(host, container, btn) {
 
     try {
         const data = await checkHostStatus(host.id, host.os_type);
-        clearContainer(container);
-        const badgesRow = createEl('div', ['d-flex', 'justify-content-between', 'align-items-center', 'w-100'], '', container);
-        addBadge(badgesRow, 'RAM', `${data.free_ram_mb} MB`, 'text-success');
-        addBadge(badgesRow, 'HDD', data.disk_info, 'text-warning');
-        addBadge(badgesRow, 'CPU', data.cpu_load, 'text-info');
-        addBadge(badgesRow, 'Uptime', data.uptime_hours, 'text-secondary');
+        renderStatusBadges(container, data);
         btn.innerHTML = '🔄'; 
     } catch (err) {
         clearContainer(container);
@@ -92,7 +116,8 @@ async function handleFetchLogs(host, btn) {
     btn.disabled = true;
 
     try {
-        const result = await triggerLogFetch(host.id);
+        const job = await triggerLogFetch(host.id);
+        const result = await waitForJob(job.job_id);
         if (result.alerts > 0) {
             btn.innerHTML = '⚠️ ' + result.alerts;
             btn.classList.remove('btn-outline-secondary');
@@ -108,8 +133,7 @@ async function handleFetchLogs(host, btn) {
             btn.classList.remove('btn-danger', 'btn-success');
             btn.classList.add('btn-outline-secondary');
         }, 3000);
-
-        await refreshAlertsTable();
+        // new alerts arrive through the live feed
 
     } catch (err) {
         alert("Błąd pobierania logów: " + err.message);
@@ -118,6 +142,15 @@ async function handleFetchLogs(host, btn) {
     }
 }
 
+function renderStatusBadges(container, data) {
+    clearContainer(container);
+    const badgesRow = createEl('div', ['d-flex', 'justify-content-between', 'align-items-center', 'w-100'], '', container);
+    addBadge(badgesRow, 'RAM', `${data.free_ram_mb} MB`, 'text-success');
+    addBadge(badgesRow, 'HDD', data.disk_info, 'text-warning');
+    addBadge(badgesRow, 'CPU', data.cpu_load, 'text-info');
+    addBadge(badgesRow, 'Uptime', data.uptime_hours, 'text-secondary');
+}
+
 function addBadge(parent, label, value, colorClass) {
     const box = createEl('div', ['text-center', 'border', 'rounded', 'bg-opacity-10', 'py-1'], '', parent);
     box.style.width = '24%'; 
@@ -128,10 +161,10 @@ function addBadge(parent, label, value, colorClass) {
 }
 
 /**
- * Renderowanie tabeli alertów
+ * Renderowanie tabeli alertów - zwraca id najnowszego alertu (punkt startowy strumienia)
  */
 async function refreshAlertsTable() {
-    if (!alertsBody) return;
+    if (!alertsBody) return null;
     clearContainer(alertsBody);
 
     try {
@@ -139,35 +172,56 @@ async function refreshAlertsTable() {
         const alerts = await fetchAlerts(); 
 
         if (alerts.length === 0) {
-            const row = createEl('tr', [], '', alertsBody);
+            const row = createEl('tr', ['empty-row'], '', alertsBody);
             const cell = createEl('td', ['text-center', 'text-muted', 'py-3'], 'Brak alertów (lub brak połączenia z API).', row);
             cell.colSpan = 6;
-            return;
+            return 0;
         }
 
-        alerts.forEach(alert => {
-            const row = createEl('tr', [], '', alertsBody);
-            if (alert.severity === 'CRITICAL') row.classList.add('table-danger');
-            else if (alert.severity === 'WARNING') row.classList.add('table-warning');
-            
-            const utcDate = new Date(alert.timestamp.replace(" ", "T") + "Z");
-            createEl('td', [], utcDate.toLocaleString(), row);
-            createEl('td', ['fw-bold'], alert.host_name, row);
-            createEl('td', [], alert.alert_type, row); 
-            createEl('td', ['font-monospace'], alert.source_ip || '-', row);
-            createEl('td', [], alert.message, row);
-            
-            const badgeCell = createEl('td', [], '', row);
-            const badgeClasses = ['badge'];
-            if (alert.severity === 'CRITICAL') badgeClasses.push('bg-danger');
-            else badgeClasses.push('bg-warning', 'text-secondary');
-            createEl('span', badgeClasses, alert.severity, badgeCell);
-        });
+        alerts.forEach(alert => renderAlertRow(alert, false));
+        return Math.max(...alerts.map(a => a.id));
     } catch (err) {
         console.error("Błąd tabeli alertów:", err);
+        return null;
     }
 }
 
+function renderAlertRow(alert, prepend) {
+    const row = createEl('tr');
+    if (alert.severity === 'CRITICAL') row.classList.add('table-danger');
+    else if (alert.severity === 'WARNING') row.classList.add('table-warning');
+    
+    const utcDate = new Date(alert.timestamp.replace(" ", "T") + "Z");
+    createEl('td', [], utcDate.toLocaleString(), row);
+    createEl('td', ['fw-bold'], alert.host_name, row);
+    createEl('td', [], alert.alert_type, row); 
+    createEl('td', ['font-monospace'], alert.source_ip || '-', row);
+    createEl('td', [], alert.message, row);
+    
+    const badgeCell = createEl('td', [], '', row);
+    const badgeClasses = ['badge'];
+    if (alert.severity === 'CRITICAL') badgeClasses.push('bg-danger');
+    else badgeClasses.push('bg-warning', 'text-secondary');
+    createEl('span', badgeClasses, alert.severity, badgeCell);
+
+    if (prepend) alertsBody.prepend(row);
+    else alertsBody.appendChild(row);
+}
+
+// push-based updates instead of polling /api/alerts
+function startAlertStream(lastId) {
+    if (alertStream) alertStream.close();
+    alertStream = openAlertStream(lastId, (alert) => {
+        alertsBody.querySelectorAll('.empty-row').forEach(r => r.remove());
+        renderAlertRow(alert, true);
+        while (alertsBody.rows.length > MAX_ALERT_ROWS) alertsBody.deleteRow(-1);
+
+        // alerts come in bursts - redraw the chart once per burst
+        clearTimeout(chartRefreshTimer);
+        chartRefreshTimer = setTimeout(initStatsChart, 2000);
+    });
+}
+
 // process top 5 IPs chart
 let IPsChart = null
 async function initStatsChart() {
@@ -0,0 +1,155 @@
+"""
+Query plans and latency of the alert queries with and without the Alert indexes.
+
+Builds a SQLite database with --rows synthetic alerts (schema taken from the
+Alert model), runs the queries the application issues - latest alerts,
+top IPs, cross-host correlation, alerts of one host, the fingerprint
+conflict check of the analyzer's insert-or-ignore and the old
+read-before-write dedup query - first on the bare table, then after
+creating the model's indexes. Prints EXPLAIN QUERY PLAN and the median
+latency of --repeat runs for both.
+
+    python benchmarks/bench_alert_indexes.py [--rows 1000000] [--repeat 5] [--db /tmp/alerts_bench.db]
+    python benchmarks/bench_alert_indexes.py --rows 10000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.schema import CreateIndex, CreateTable  # noqa: E402
+
+from app.models import Alert  # noqa: E402
+
+HOSTS = 50
+IPS = 100_000
+DAYS = 30
+ALERT_TYPES = ['FAILED_LOGIN', 'INVALID_USER', 'WIN_FAILED_LOGIN', 'SSH_WINDOWS_LOGIN']
+
+
+def ddl(statement) -> str:
+    return str(statement.compile(dialect=create_engine("sqlite://").dialect)).strip()
+
+
+def populate(conn, rows, seed) -> tuple:
+    """Skewed synthetic alerts: a few noisy IPs, a long tail of rare ones."""
+    rnd = random.Random(seed)
+    end = datetime(2026, 1, 31)
+    start = end - timedelta(days=DAYS)
+    span = int((end - start).total_seconds())
+    ips = [f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}" for _ in range(IPS)]
+
+    def batch(size):
+        for _ in range(size):
+            host_id = rnd.randint(1, HOSTS)
+            ip = ips[min(int(rnd.paretovariate(1.2)) - 1, IPS - 1)]
+            alert_type = rnd.choice(ALERT_TYPES)
+            ts = start + timedelta(seconds=rnd.randrange(span), microseconds=rnd.randrange(1_000_000))
+            yield (host_id, ts.isoformat(sep=' '), alert_type, "Failed password", 'WARNING', ip,
+                   Alert.make_fingerprint(host_id, ip, alert_type, ts))
+
+    sql = ("INSERT OR IGNORE INTO alerts (host_id, timestamp, alert_type, message, severity, source_ip, fingerprint) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)")
+    done = 0
+    while done < rows:
+        size = min(100_000, rows - done)
+        conn.executemany(sql, batch(size))
+        conn.commit()
+        done += size
+    return ips[0], ips[1:201], end
+
+
+def queries(top_ip, ips, end) -> list:
+    placeholders = ",".join("?" * len(ips))
+    fingerprint = Alert.make_fingerprint(7, top_ip, 'FAILED_LOGIN', end)
+    since = (end - timedelta(minutes=10)).isoformat(sep=' ')
+    day_ago = (end - timedelta(days=1)).isoformat(sep=' ')
+    return [
+        ("latest alerts (/api/alerts)",
+         "SELECT * FROM alerts ORDER BY timestamp DESC LIMIT 20", []),
+        ("top IPs (/api/stats/top-ips)",
+         "SELECT source_ip, count(id) FROM alerts GROUP BY source_ip ORDER BY count(id) DESC LIMIT 5", []),
+        ("cross-host correlation",
+         f"SELECT DISTINCT source_ip FROM alerts WHERE source_ip IN ({placeholders}) AND host_id != ? AND timestamp > ?",
+         ips + [7, since]),
+        ("alerts of one host, last day",
+         "SELECT * FROM alerts WHERE host_id = ? AND timestamp > ? ORDER BY timestamp DESC LIMIT 100", [7, day_ago]),
+        ("insert-or-ignore conflict check",
+         "SELECT id FROM alerts WHERE fingerprint = ?", [fingerprint]),
+        ("old read-before-write dedup",
+         f"SELECT source_ip, alert_type, timestamp FROM alerts WHERE host_id = ? AND source_ip IN ({placeholders}) "
+         f"AND alert_type IN (?, ?) AND timestamp >= ? AND timestamp <= ?",
+         [7] + ips + ['FAILED_LOGIN', 'INVALID_USER', day_ago, end.isoformat(sep=' ')]),
+    ]
+
+
+def run(conn, label, sql, params, repeat) -> float:
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times) * 1000
+    print(f"  {label:<34} {median:>10.2f} ms   plan: {' | '.join(plan)}")
+    return median
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default=None, help="database file (default: temporary, removed at exit)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "alerts_bench.db")
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    # Table without secondary indexes; fingerprint uniqueness is added with the indexes below
+    table = Alert.__table__
+    conn.execute(ddl(CreateTable(table)))
+    conn.execute("CREATE TABLE hosts (id INTEGER PRIMARY KEY)")
+
+    start = time.perf_counter()
+    top_ip, ips, end = populate(conn, args.rows, args.seed)
+    print(f"loaded {args.rows:,} alerts in {time.perf_counter() - start:.1f}s ({path})")
+
+    plan = queries(top_ip, ips, end)
+    print("\nwithout indexes:")
+    before = [run(conn, label, sql, params, args.repeat) for label, sql, params in plan]
+
+    start = time.perf_counter()
+    for index in sorted(table.indexes, key=lambda i: i.name):
+        conn.execute(ddl(CreateIndex(index)))
+    conn.execute("ANALYZE")
+    conn.commit()
+    print(f"\ncreated {len(table.indexes)} indexes in {time.perf_counter() - start:.1f}s")
+
+    print("\nwith indexes:")
+    after = [run(conn, label, sql, params, args.repeat) for label, sql, params in plan]
+
+    print("\nspeedup:")
+    for (label, _, _), b, a in zip(plan, before, after):
+        print(f"  {label:<34} {b / a if a else float('inf'):>10.1f}x")
+
+    conn.close()
+    if not args.db:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
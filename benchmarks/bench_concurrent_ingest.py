@@ -0,0 +1,171 @@
+"""
+Many collections writing to the database at once: every ingest job in its
+own transaction on a rollback-journal SQLite file (as before db_writer)
+vs the single writer with group commit on WAL.
+
+--jobs ingest jobs (--records synthetic sshd failures each, from a pool of
+--ips addresses, so the jobs insert and update the same registry rows) run
+on --workers threads, like the scheduler's pool. Each job goes through the
+same path as CollectionService.collect_host without the remote part:
+IngestPipeline (Parquet files + detection) and CollectionService.store.
+Every mode runs in a fresh process on a new database. Reports jobs/s,
+records/s, failed jobs (e.g. "database is locked"), job latency and, for
+the writer, jobs per commit.
+
+    python benchmarks/bench_concurrent_ingest.py [--jobs 64] [--workers 16] [--records 2000]
+    python benchmarks/bench_concurrent_ingest.py --database postgresql://siem@localhost/siem_bench
+"""
+import argparse
+import json
+import math
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MODES = {
+    # Before db_writer: each job commits its own transaction, default SQLite journal
+    "per-job commit": {"WRITER_ENABLED": False, "SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"},
+    "single writer, WAL": {"WRITER_ENABLED": True, "SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL"},
+}
+
+
+def generate(job, records, ips, seed):
+    rnd = random.Random(seed * 100_003 + job)
+    start = datetime(2026, 1, 1, 8) + timedelta(minutes=job)
+    for i in range(records):
+        ip = f"198.18.{(n := rnd.randrange(ips)) // 250}.{n % 250 + 1}"
+        user = rnd.choice(["root", "admin", "ubuntu", "oracle", "test"])
+        yield {
+            "timestamp": start + timedelta(milliseconds=i * 20),
+            "source_ip": ip,
+            "alert_type": "FAILED_LOGIN",
+            "user": user,
+            "message": f"Failed password for {user} from {ip} port {rnd.randint(1024, 65535)} ssh2",
+            "raw_log": None,
+        }
+
+
+def run_mode(args) -> dict:
+    """One mode, in this process: returns the measurements as a dict."""
+    from config import Config
+    from app import create_app
+    from app.extensions import db
+    from app.models import Host, LogSource
+    from app.services.collection import CollectionService
+    from app.services.data_manager import DataManager
+    from app.services.db_writer import db_writer
+    from app.services.ingest_pipeline import ingest_pipeline
+
+    workdir = Path(args.workdir)
+    settings = MODES[args.mode]
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or f"sqlite:///{workdir / 'bench.db'}"
+        CORRELATION_CHECKPOINT = ""
+        SCHEDULER_ENABLED = False
+        WRITER_ENABLED = settings["WRITER_ENABLED"]
+        SQLITE_JOURNAL_MODE = settings["SQLITE_JOURNAL_MODE"]
+        SQLITE_SYNCHRONOUS = settings["SQLITE_SYNCHRONOUS"]
+
+    app = create_app(BenchConfig)
+    DataManager.STORAGE_DIR = workdir / "storage"
+    with app.app_context():
+        hosts = []
+        for i in range(args.hosts):
+            host = Host(hostname=f"bench-{i}", ip_address=f"10.99.0.{i + 1}", os_type="linux")
+            db.session.add(host)
+            db.session.flush()
+            db.session.add(LogSource(host_id=host.id, log_type="security"))
+            hosts.append(host.id)
+        db.session.commit()
+
+    def job(index):
+        host_id = hosts[index % len(hosts)]
+        started = time.perf_counter()
+        with app.app_context():
+            try:
+                files, detections = ingest_pipeline.run(generate(index, args.records, args.ips, args.seed), host_id)
+                alerts = db_writer.run(CollectionService.store, host_id, files, detections, {"cursor": f"job-{index}"})
+                return time.perf_counter() - started, alerts, None
+            except Exception as e:
+                cause = getattr(e, "orig", None) or e # the driver's error, not SQLAlchemy's wrapper
+                return time.perf_counter() - started, 0, f"{type(cause).__name__}: {cause}"
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(job, range(args.jobs)))
+    elapsed = time.perf_counter() - started
+    db_writer.stop()
+
+    latencies = sorted(latency for latency, _, error in results if error is None)
+    errors = [error for _, _, error in results if error is not None]
+    writer = db_writer.stats()
+    return {
+        "mode": args.mode,
+        "seconds": elapsed,
+        "jobs_ok": len(latencies),
+        "jobs_failed": len(errors),
+        "first_error": errors[0] if errors else None,
+        "alerts": sum(alerts for _, alerts, _ in results),
+        "p50": statistics.median(latencies) if latencies else None,
+        "p95": latencies[math.ceil(len(latencies) * 0.95) - 1] if latencies else None,
+        "jobs_per_commit": writer["jobs_per_batch"] if settings["WRITER_ENABLED"] else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=16, help="Jobs running at once.")
+    parser.add_argument("--records", type=int, default=2000, help="Log records per job.")
+    parser.add_argument("--hosts", type=int, default=16)
+    parser.add_argument("--ips", type=int, default=5000, help="Distinct source addresses shared by all jobs.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database", default=None, help="SQLAlchemy URL of an empty database instead of a SQLite file.")
+    parser.add_argument("--mode", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode: # child process
+        print(json.dumps(run_mode(args)))
+        return
+
+    results = []
+    for mode in MODES:
+        workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+        try:
+            child = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--workdir", workdir] + sys.argv[1:],
+                capture_output=True, text=True, check=True
+            )
+            results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    total = args.jobs * args.records
+    print(f"jobs: {args.jobs} x {args.records} records, workers: {args.workers}, hosts: {args.hosts}, "
+          f"database: {args.database or 'SQLite file'}")
+    print(f"{'mode':<22}{'s':>8}{'jobs/s':>9}{'records/s':>11}{'failed':>8}{'p50 s':>8}{'p95 s':>8}{'jobs/commit':>13}")
+    for r in results:
+        p50 = f"{r['p50']:.2f}" if r["p50"] is not None else "-"
+        p95 = f"{r['p95']:.2f}" if r["p95"] is not None else "-"
+        print(f"{r['mode']:<22}{r['seconds']:>8.2f}{r['jobs_ok'] / r['seconds']:>9.1f}"
+              f"{r['jobs_ok'] * args.records / r['seconds']:>11.0f}{r['jobs_failed']:>8}{p50:>8}{p95:>8}"
+              f"{r['jobs_per_commit']:>13.1f}")
+    for r in results:
+        if r["first_error"]:
+            print(f"{r['mode']}: {r['first_error']}")
+    print(f"records offered per mode: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+End-to-end ingestion of a Linux host without a VM:
+
+    fake SSH host (fake_ssh_server.py, journal from fake_journald.py)
+      -> collect  LogCollector.get_linux_logs over a real paramiko connection
+      -> store    DataManager.save_logs_to_parquet
+      -> analyze  LogAnalyzer.analyze_parquet + commit (SQLite file database)
+
+Every size runs in a fresh process with a new database and storage
+folder. Per stage: seconds, items per second (journal entries for
+collect, records after it), peak RSS and its growth during the stage
+(sampled with psutil) and the number of SQL statements. The results are
+printed and, with --output, saved as JSON together with the parameters and
+the git commit; --baseline compares with an earlier file (and with
+--max-regression exits with status 1 when a stage got slower by more than
+that many percent).
+
+    python benchmarks/bench_ingest_e2e.py [--sizes 10000,100000,1000000] [--output results.json]
+    python benchmarks/bench_ingest_e2e.py --sizes 100000 --baseline results.json --max-regression 15
+    python benchmarks/bench_ingest_e2e.py --attack-ratio 0.6 --ips 200 --skew 0.9 --no-remote-filter
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_journald import add_arguments, from_arguments  # noqa: E402
+
+STAGES = ("collect", "store", "analyze")
+
+
+class StageMeter:
+    """Time, RSS (sampled every 'interval' seconds) and SQL statements per stage."""
+
+    def __init__(self, engine, interval=0.005) -> None:
+        import psutil
+        from sqlalchemy import event
+
+        self.process = psutil.Process()
+        self.interval = interval
+        self.queries = 0
+        self.results = {}
+        self._peak = 0
+        self._sampling = threading.Event()
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            self.queries += 1
+
+    def _sample(self) -> None:
+        while self._sampling.is_set():
+            self._peak = max(self._peak, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    @contextmanager
+    def stage(self, name):
+        start_rss = self.process.memory_info().rss
+        self._peak = start_rss
+        queries = self.queries
+        self._sampling.set()
+        sampler = threading.Thread(target=self._sample, daemon=True)
+        sampler.start()
+        result = {}
+        started = time.perf_counter()
+        try:
+            yield result
+        finally:
+            seconds = time.perf_counter() - started
+            self._sampling.clear()
+            sampler.join()
+            self._peak = max(self._peak, self.process.memory_info().rss)
+            items = result.get("items", 0)
+            result.update({
+                "seconds": round(seconds, 3),
+                "items_per_second": round(items / seconds, 1) if seconds else None,
+                "peak_rss_mb": round(self._peak / 2**20, 1),
+                "rss_growth_mb": round((self._peak - start_rss) / 2**20, 1),
+                "queries": self.queries - queries,
+            })
+            self.results[name] = result
+
+
+def run_size(args, events) -> dict:
+    """One size, in this process."""
+    from config import Config
+    from app import create_app
+    from app.extensions import db
+    from app.models import Host
+    from app.services.data_manager import DataManager
+    from app.services.log_analyzer import LogAnalyzer
+    from app.services.log_collector import LogCollector
+    from app.services.remote_client import RemoteClient
+    from fake_ssh_server import FakeSSHServer
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_e2e_"))
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{workdir / 'bench.db'}"
+        CORRELATION_CHECKPOINT = ""
+        SCHEDULER_ENABLED = False
+
+    server = FakeSSHServer(from_arguments(args, events))
+    host, port = server.start()
+    app = create_app(BenchConfig)
+    DataManager.STORAGE_DIR = workdir / "storage"
+
+    with app.app_context():
+        bench_host = Host(hostname="bench-host", ip_address=host, os_type="linux")
+        db.session.add(bench_host)
+        db.session.commit()
+        host_id = bench_host.id
+        meter = StageMeter(db.engine)
+
+        with meter.stage("collect") as result:
+            with RemoteClient(host, "bench", port, password="bench", pool=None, compress=args.compress) as client:
+                logs = LogCollector.get_linux_logs(
+                    client, checkpoint={}, output_fields=not args.all_fields, remote_filter=not args.no_remote_filter
+                )
+                result["items"] = events
+                result["records"] = len(logs)
+                result["bytes_received"] = client.bytes_received
+
+        with meter.stage("store") as result:
+            files = DataManager.save_logs_to_parquet(logs, host_id)
+            result["items"] = len(logs)
+            result["files"] = len(files)
+            result["parquet_bytes"] = sum((DataManager.STORAGE_DIR / f).stat().st_size for f, _ in files)
+        del logs
+
+        with meter.stage("analyze") as result:
+            alerts = sum(LogAnalyzer.analyze_parquet(filename, host_id) for filename, _ in files)
+            db.session.commit()
+            result["items"] = sum(count for _, count in files)
+            result["alerts"] = alerts
+
+    server.stop()
+    total = sum(stage["seconds"] for stage in meter.results.values())
+    return {
+        "events": events,
+        "seconds": round(total, 3),
+        "events_per_second": round(events / total, 1) if total else None,
+        "stages": meter.results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(runs, baseline, max_regression) -> bool:
+    """Prints the change against the baseline runs; returns True if a stage regressed beyond max_regression %."""
+    previous = {run["events"]: run for run in baseline.get("runs", [])}
+    regressed = False
+    print(f"\nvs baseline {baseline.get('git') or '?'} ({baseline.get('created', '?')}):")
+    print(f"{'events':>10}  {'stage':<9}{'items/s':>12}{'change':>9}{'peak RSS':>10}{'change':>9}{'queries':>9}{'change':>8}")
+    for run in runs:
+        old_run = previous.get(run["events"])
+        if old_run is None:
+            continue
+        for name in STAGES:
+            new, old = run["stages"][name], old_run["stages"].get(name)
+            if not old or not old.get("items_per_second") or not new.get("items_per_second"):
+                continue
+            speed = (new["items_per_second"] / old["items_per_second"] - 1) * 100
+            rss = new["peak_rss_mb"] - old["peak_rss_mb"]
+            queries = new["queries"] - old["queries"]
+            flag = ""
+            if max_regression is not None and -speed > max_regression:
+                regressed = True
+                flag = "  REGRESSION"
+            print(f"{run['events']:>10}  {name:<9}{new['items_per_second']:>12.0f}{speed:>+8.1f}%"
+                  f"{new['peak_rss_mb']:>8.0f}MB{rss:>+7.0f}MB{new['queries']:>9}{queries:>+8}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Journal entries per run, comma-separated.")
+    add_arguments(parser)
+    parser.add_argument("--no-remote-filter", action="store_true", help="Send the whole journal (no awk on the host).")
+    parser.add_argument("--all-fields", action="store_true", help="Do not pass --output-fields to journalctl.")
+    parser.add_argument("--compress", action="store_true", help="zlib on the SSH transport.")
+    parser.add_argument("--output", default=None, help="Save the results as JSON.")
+    parser.add_argument("--baseline", default=None, help="JSON of an earlier run to compare with.")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="With --baseline: exit with 1 if a stage is slower by more than this many percent.")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child: # one size in a fresh process
+        Path(args.result_file).write_text(json.dumps(run_size(args, args.child)))
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    runs = []
+    for size in sizes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as result_file:
+            path = Path(result_file.name)
+        try:
+            subprocess.run(
+                [sys.executable, __file__, "--child", str(size), "--result-file", str(path)] + sys.argv[1:],
+                stdout=subprocess.DEVNULL, check=True
+            )
+            runs.append(json.loads(path.read_text()))
+        finally:
+            path.unlink(missing_ok=True)
+
+    document = {
+        "benchmark": "ingest_e2e",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ("child", "result_file", "output", "baseline", "max_regression")},
+        "runs": runs,
+    }
+
+    print(f"{'events':>10}  {'stage':<9}{'s':>9}{'items/s':>12}{'peak RSS':>10}{'growth':>9}{'queries':>9}")
+    for run in runs:
+        for name in STAGES:
+            stage = run["stages"][name]
+            print(f"{run['events']:>10}  {name:<9}{stage['seconds']:>9.2f}{stage['items_per_second']:>12.0f}"
+                  f"{stage['peak_rss_mb']:>8.0f}MB{stage['rss_growth_mb']:>7.0f}MB{stage['queries']:>9}")
+        collect, analyze = run["stages"]["collect"], run["stages"]["analyze"]
+        print(f"{run['events']:>10}  {'total':<9}{run['seconds']:>9.2f}{run['events_per_second']:>12.0f}"
+              f"   records: {collect['records']}, alerts: {analyze['alerts']}, "
+              f"{collect['bytes_received'] / 2**20:.1f} MB over SSH")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(document, indent=2))
+        print(f"\nSaved to {args.output}")
+    if args.baseline:
+        if compare(runs, json.loads(Path(args.baseline).read_text()), args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
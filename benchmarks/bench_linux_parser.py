@@ -0,0 +1,128 @@
+"""
+Micro-benchmark of the sshd message parser (LogCollector._parse_linux_message).
+
+Generates a synthetic journald/sshd corpus and measures lines/sec of the
+legacy parser (three separate re.search calls per line) against the
+single-pass LogMatcher, both with the legacy three patterns and with the
+full LINUX_PATTERNS set (where the per-pattern approach needs one full
+re.search per pattern). Best of --repeat runs is reported.
+
+    python benchmarks/bench_linux_parser.py [--lines 1000000] [--seed 1] [--repeat 3]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.log_matcher import LogMatcher, LINUX_PATTERNS  # noqa: E402
+
+# Parser before the single-pass matcher, kept verbatim for comparison
+LEGACY_PATTERNS = {
+    'failed_password': re.compile(r"Failed password for (?:invalid user )?([\w.-]+) from ([\d.]+)"),
+    'invalid_user': re.compile(r"Invalid user ([\w.-]+) from ([\d.]+)"),
+    'sudo': re.compile(r"sudo:\s+([a-zA-Z0-9._-]+)\s*:"),
+}
+
+
+def legacy_parse(message, timestamp):
+    match = LEGACY_PATTERNS['failed_password'].search(message)
+    if match:
+        return {'timestamp': timestamp, 'alert_type': 'FAILED_LOGIN', 'source_ip': match.group(2),
+                'user': match.group(1), 'message': message, 'raw_log': message}
+    match = LEGACY_PATTERNS['invalid_user'].search(message)
+    if match:
+        return {'timestamp': timestamp, 'alert_type': 'INVALID_USER', 'source_ip': match.group(2),
+                'user': match.group(1), 'message': message, 'raw_log': message}
+    match = LEGACY_PATTERNS['sudo'].search(message)
+    if match:
+        return {'timestamp': timestamp, 'alert_type': 'SUDO_USAGE', 'source_ip': 'LOCAL',
+                'user': match.group(1), 'message': message, 'raw_log': message}
+    return None
+
+
+def per_pattern_parser(patterns):
+    """The legacy approach generalised: one re.search per pattern, in order."""
+    compiled = [(p, re.compile(p.regex)) for p in patterns]
+
+    def parse(message, timestamp):
+        for pattern, regex in compiled:
+            match = regex.search(message)
+            if match:
+                groups = match.groupdict()
+                return {'timestamp': timestamp, 'alert_type': pattern.alert_type,
+                        'source_ip': groups.get('ip') or pattern.source_ip, 'user': groups.get('user'),
+                        'message': message, 'raw_log': message}
+        return None
+    return parse
+
+
+def make_corpus(lines, seed) -> list:
+    """Typical sshd mix: mostly session/connection noise, ~25% auth failures."""
+    rnd = random.Random(seed)
+    users = ["root", "admin", "oracle", "test", "ubuntu", "git", "postgres", "vagrant"]
+
+    def ip():
+        return f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}"
+
+    templates = [
+        (30, lambda: f"Connection from {ip()} port {rnd.randint(1024, 65535)} on 10.0.2.15 port 22 rdomain \"\""),
+        (20, lambda: f"pam_unix(sshd:session): session opened for user {rnd.choice(users)}(uid=1000) by (uid=0)"),
+        (10, lambda: f"Received disconnect from {ip()} port {rnd.randint(1024, 65535)}:11: disconnected by user"),
+        (10, lambda: f"Disconnected from user {rnd.choice(users)} {ip()} port {rnd.randint(1024, 65535)}"),
+        (5, lambda: f"Server listening on 0.0.0.0 port 22."),
+        (15, lambda: f"Failed password for {rnd.choice(['', 'invalid user '])}{rnd.choice(users)} from {ip()} port {rnd.randint(1024, 65535)} ssh2"),
+        (7, lambda: f"Invalid user {rnd.choice(users)} from {ip()} port {rnd.randint(1024, 65535)}"),
+        (3, lambda: f"Accepted publickey for {rnd.choice(users)} from {ip()} port {rnd.randint(1024, 65535)} ssh2: ED25519 SHA256:abc"),
+    ]
+    weights = [w for w, _ in templates]
+    makers = [m for _, m in templates]
+    return [rnd.choices(makers, weights)[0]() for _ in range(lines)]
+
+
+def measure(parse, corpus, timestamp, repeat=1) -> tuple:
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matched = 0
+        for message in corpus:
+            if parse(message, timestamp):
+                matched += 1
+        best = max(best, len(corpus) / (time.perf_counter() - start))
+    return best, matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.lines, args.seed)
+    timestamp = datetime.now()
+    legacy_set = LINUX_PATTERNS[:3]
+
+    runs = [
+        ("legacy parser (3x re.search)", legacy_parse),
+        ("LogMatcher, legacy 3 patterns", LogMatcher(legacy_set).parse),
+        (f"per-pattern search, {len(LINUX_PATTERNS)} patterns", per_pattern_parser(LINUX_PATTERNS)),
+        (f"LogMatcher, {len(LINUX_PATTERNS)} patterns", LogMatcher(LINUX_PATTERNS).parse),
+    ]
+
+    print(f"corpus: {args.lines} lines, best of {args.repeat}")
+    results = []
+    for label, parse in runs:
+        rate, matched = measure(parse, corpus, timestamp, args.repeat)
+        results.append(rate)
+        print(f"{label:<34} {rate:>12,.0f} lines/s  matched={matched}")
+    print(f"speedup, legacy pattern set: {results[1] / results[0]:.2f}x")
+    print(f"speedup, full pattern set:   {results[3] / results[2]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+File size and write/read speed of stored log files: the previous layout
+(plain string columns, naive timestamps, default snappy codec, one row
+group per 10k-record batch) against the typed DataManager.LOG_SCHEMA
+(UTC timestamps, dictionary-encoded columns, raw_log deduplicated against
+message, zstd, large row groups).
+
+Records imitate sshd failures from the Linux collector, where raw_log is
+the same text as message; --distinct-raw makes every raw_log differ.
+
+    python benchmarks/bench_log_storage.py [--rows 1000000] [--level 3] [--row-group 65536] [--codec zstd]
+"""
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.data_manager import DataManager  # noqa: E402
+
+# Writer before the typed schema, kept for comparison
+LEGACY_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('source_ip', pa.string()),
+    ('alert_type', pa.string()),
+    ('user', pa.string()),
+    ('message', pa.string()),
+    ('raw_log', pa.string()),
+])
+
+
+def legacy_write(records, path, batch_size=10_000):
+    with pq.ParquetWriter(path, LEGACY_SCHEMA) as writer:
+        records = iter(records)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=LEGACY_SCHEMA))
+
+
+def generate(rows, seed, distinct_raw):
+    rnd = random.Random(seed)
+    users = ["root", "admin", "ubuntu", "oracle", "test", "postgres", "git"] + [f"user{i}" for i in range(50)]
+    ips = [f"{rnd.randint(1, 223)}.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}" for _ in range(2000)]
+    start = datetime(2026, 1, 1, 0, 0)
+    for i in range(rows):
+        user = rnd.choice(users)
+        ip = rnd.choice(ips)
+        invalid = rnd.random() < 0.3
+        alert_type = "INVALID_USER" if invalid else "FAILED_LOGIN"
+        message = (f"Failed password for {'invalid user ' if invalid else ''}{user} from {ip} "
+                   f"port {rnd.randint(1024, 65535)} ssh2")
+        yield {
+            "timestamp": start + timedelta(milliseconds=i * 50), # all within one day
+            "source_ip": ip,
+            "alert_type": alert_type,
+            "user": user,
+            "message": message,
+            "raw_log": f"sshd[{rnd.randint(100, 99999)}]: {message}" if distinct_raw else message,
+        }
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--codec", default=DataManager.COMPRESSION)
+    parser.add_argument("--level", type=int, default=DataManager.COMPRESSION_LEVEL)
+    parser.add_argument("--row-group", type=int, default=DataManager.ROW_GROUP_SIZE)
+    parser.add_argument("--distinct-raw", action="store_true", help="raw_log differs from message in every record.")
+    args = parser.parse_args()
+
+    records = list(generate(args.rows, args.seed, args.distinct_raw))
+    workdir = Path(tempfile.mkdtemp(prefix="bench_log_storage_"))
+    DataManager.STORAGE_DIR = workdir / "typed"
+    DataManager.configure(compression=args.codec, compression_level=args.level, row_group_size=args.row_group)
+
+    try:
+        legacy_path = workdir / "legacy.parquet"
+        legacy_write_s, _ = timed(lambda: legacy_write(records, legacy_path))
+        typed_write_s, files = timed(lambda: DataManager.save_log_stream(iter(records), 1))
+        typed_path = DataManager.STORAGE_DIR / files[0][0]
+
+        results = []
+        for name, path, write_s, relative in (("legacy", legacy_path, legacy_write_s, legacy_path.name),
+                                              ("typed", typed_path, typed_write_s, files[0][0])):
+            if name == "legacy":
+                read_s, frame = timed(lambda: pq.read_table(path).to_pandas())
+            else: # decoded back to naive local time and plain strings, as the analyzer gets it
+                read_s, frame = timed(lambda: DataManager.load_logs(relative))
+            column_s, _ = timed(lambda: pq.read_table(path, columns=["source_ip"]))
+            assert len(frame) == args.rows
+            metadata = pq.ParquetFile(path).metadata
+            results.append((name, path.stat().st_size, metadata.num_row_groups, write_s, read_s, column_s))
+
+        print(f"rows: {args.rows}, typed: {args.codec} level {args.level}, row group {args.row_group}, "
+              f"raw_log {'distinct' if args.distinct_raw else 'same as message'}")
+        print(f"{'format':<8}{'size MB':>10}{'row groups':>12}{'write s':>10}{'read s':>10}{'source_ip s':>13}")
+        for name, size, groups, write_s, read_s, column_s in results:
+            print(f"{name:<8}{size / 1e6:>10.2f}{groups:>12}{write_s:>10.3f}{read_s:>10.3f}{column_s:>13.4f}")
+        print(f"size ratio typed/legacy: {results[1][1] / results[0][1]:.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+WinClient: a new PowerShell process per command vs the persistent
+PowerShellSession.
+
+Runs --fetches Windows log collections (two commands each, as
+LogCollector.get_windows_logs does) both ways and reports time per fetch.
+By default the shell is benchmarks/fake_powershell.py (Python startup
+stands in for PowerShell startup; add --startup to simulate more); pass
+--shell pwsh or --shell powershell to measure the real thing.
+
+    python benchmarks/bench_win_client.py [--fetches 20] [--events 100] [--startup 0.3] [--shell pwsh]
+"""
+import argparse
+import shlex
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.log_collector import LogCollector  # noqa: E402
+from app.services.win_client import WinClient, PowerShellSession  # noqa: E402
+
+
+def bench(client, fetches):
+    started = time.perf_counter()
+    count = 0
+    for _ in range(fetches):
+        count += len(LogCollector.get_windows_logs(client))
+    return time.perf_counter() - started, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetches", type=int, default=20)
+    parser.add_argument("--events", type=int, default=100, help="Events returned per command by the fake shell.")
+    parser.add_argument("--startup", type=float, default=0.0, help="Extra simulated startup of the fake shell (s).")
+    parser.add_argument("--shell", default=None, help="Real shell command instead of the fake, e.g. pwsh.")
+    args = parser.parse_args()
+
+    if args.shell:
+        command = shlex.split(args.shell) + ["-NoLogo", "-NoProfile", "-NonInteractive"]
+    else:
+        fake = Path(__file__).resolve().parent / "fake_powershell.py"
+        command = [sys.executable, str(fake), "--events", str(args.events), "--startup", str(args.startup)]
+
+    spawn_time, spawn_count = bench(WinClient(session=None, command=command), args.fetches)
+
+    session = PowerShellSession(command=command)
+    session_time, session_count = bench(WinClient(session=session), args.fetches)
+    stats = session.stats()
+    session.close()
+
+    print(f"shell: {' '.join(command)}")
+    print(f"{'mode':<22}{'total s':>10}{'ms/fetch':>12}{'events':>10}")
+    for mode, total, count in (("process per command", spawn_time, spawn_count),
+                               ("persistent session", session_time, session_count)):
+        print(f"{mode:<22}{total:>10.3f}{total * 1000 / args.fetches:>12.1f}{count:>10}")
+    print(f"speedup: {spawn_time / session_time:.1f}x, session commands: {stats['commands_run']}, restarts: {stats['restarts']}")
+
+
+if __name__ == "__main__":
+    main()
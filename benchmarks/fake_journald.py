@@ -0,0 +1,172 @@
+"""
+Synthetic sshd journal, as `journalctl -u ssh -o json` prints it.
+
+Events are spread evenly over --days days ending now. --attack-ratio of
+them are attacks drawn from MIX (failed passwords, invalid users, PAM
+failures, preauth disconnects, sudo), the rest is ordinary sshd noise.
+Attackers come from --ips addresses; --skew of the attacks come from the
+busiest 1% of them (brute force), the rest uniformly. Output is
+deterministic for a --seed, and every entry has a __CURSOR whose i= field
+is its sequence number, so --after-cursor resumes exactly.
+
+    python benchmarks/fake_journald.py --events 100000 [--attack-ratio 0.3] [--ips 5000] > journal.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+BOOT_ID = "5e1f0c3e9b214d1f8c27d4e61f03d4b9"
+# Fields journalctl always adds to --output-fields
+ALWAYS = ("__CURSOR", "__REALTIME_TIMESTAMP", "__MONOTONIC_TIMESTAMP", "_BOOT_ID")
+
+# Attack kinds and their weights
+MIX = {
+    "failed_password": 50,
+    "invalid_user": 20,
+    "pam_auth_failure": 10,
+    "preauth_disconnect": 15,
+    "sudo": 5,
+}
+USERS = ["root", "admin", "oracle", "test", "ubuntu", "git", "postgres", "vagrant", "guest", "backup",
+         "ftp", "www-data", "deploy", "jenkins", "user", "pi"]
+
+
+def parse_mix(text) -> dict:
+    """"failed_password=60,sudo=5" -> {kind: weight}; kinds missing from the text get 0."""
+    mix = {kind: 0 for kind in MIX}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        if kind.strip() not in MIX:
+            raise ValueError(f"Unknown attack kind '{kind.strip()}' (known: {', '.join(MIX)})")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+class JournalGenerator:
+    def __init__(self, events, attack_ratio=0.3, ips=5000, users=len(USERS), skew=0.5, days=1.0,
+                 mix=None, seed=1, end=None) -> None:
+        self.events = events
+        self.attack_ratio = attack_ratio
+        self.ips = max(ips, 1)
+        self.users = USERS[:max(min(users, len(USERS)), 1)] + [f"user{i}" for i in range(max(users - len(USERS), 0))]
+        self.skew = skew
+        self.mix = mix or MIX
+        self.seed = seed
+        self.end_us = int((end or time.time()) * 1_000_000)
+        self.span_us = int(days * 86400 * 1_000_000)
+
+    # ------------------------------------------------------------------ entries
+
+    def attacker(self, rnd) -> str:
+        hot = max(self.ips // 100, 1)
+        n = rnd.randrange(hot) if rnd.random() < self.skew else rnd.randrange(self.ips)
+        return f"198.{18 + n // 65025 % 2}.{n // 255 % 255}.{n % 255 + 1}"
+
+    def message(self, rnd) -> str:
+        port = rnd.randint(1024, 65535)
+        if rnd.random() < self.attack_ratio:
+            kind = rnd.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            user, ip = rnd.choice(self.users), self.attacker(rnd)
+            if kind == "failed_password":
+                invalid = "invalid user " if rnd.random() < 0.4 else ""
+                return f"Failed password for {invalid}{user} from {ip} port {port} ssh2"
+            if kind == "invalid_user":
+                return f"Invalid user {user} from {ip} port {port}"
+            if kind == "pam_auth_failure":
+                return (f"pam_unix(sshd:auth): authentication failure; logname= uid=0 euid=0 tty=ssh "
+                        f"ruser= rhost={ip}  user={user}")
+            if kind == "preauth_disconnect":
+                return f"Connection closed by authenticating user {user} {ip} port {port} [preauth]"
+            return f"sudo:    {user} : TTY=pts/0 ; PWD=/home/{user} ; USER=root ; COMMAND=/usr/bin/systemctl restart ssh"
+        ip = f"10.0.{rnd.randint(0, 3)}.{rnd.randint(1, 254)}"
+        noise = rnd.randrange(5)
+        if noise == 0:
+            return f"Connection from {ip} port {port} on 10.0.2.15 port 22 rdomain \"\""
+        if noise == 1:
+            return f"pam_unix(sshd:session): session opened for user {rnd.choice(self.users)}(uid=1000) by (uid=0)"
+        if noise == 2:
+            return f"Received disconnect from {ip} port {port}:11: disconnected by user"
+        if noise == 3:
+            return f"Accepted publickey for {rnd.choice(self.users)} from {ip} port {port} ssh2: ED25519 SHA256:abc"
+        return f"Disconnected from user {rnd.choice(self.users)} {ip} port {port}"
+
+    @staticmethod
+    def cursor(seq, realtime) -> str:
+        return f"s={BOOT_ID};i={seq:x};b={BOOT_ID};m={seq * 1000:x};t={realtime:x};x={seq * 7919:x}"
+
+    @staticmethod
+    def cursor_seq(cursor) -> int:
+        """Sequence number of a cursor from this generator (-1 if it is not one)."""
+        for part in (cursor or "").split(";"):
+            if part.startswith("i="):
+                try:
+                    return int(part[2:], 16)
+                except ValueError:
+                    return -1
+        return -1
+
+    def entries(self, after_seq=-1, fields=None):
+        """Journal entries as dicts; 'fields' - only these (plus ALWAYS), like --output-fields."""
+        rnd = random.Random(self.seed)
+        start = self.end_us - self.span_us
+        step = self.span_us // max(self.events, 1)
+        keep = set(fields) | set(ALWAYS) if fields else None
+        for seq in range(self.events):
+            message = self.message(rnd) # drawn for every entry, so a resumed stream is the same stream
+            if seq <= after_seq:
+                continue
+            realtime = start + seq * step
+            entry = {
+                "__CURSOR": self.cursor(seq, realtime),
+                "__REALTIME_TIMESTAMP": str(realtime),
+                "__MONOTONIC_TIMESTAMP": str(seq * 1000),
+                "_BOOT_ID": BOOT_ID,
+                "PRIORITY": "6",
+                "_SYSTEMD_UNIT": "ssh.service",
+                "SYSLOG_IDENTIFIER": "sshd",
+                "_PID": str(1000 + seq % 30000),
+                "_HOSTNAME": "bench-host",
+                "_TRANSPORT": "syslog",
+                "MESSAGE": message,
+            }
+            if keep is not None:
+                entry = {k: v for k, v in entry.items() if k in keep}
+            yield entry
+
+    def lines(self, after_seq=-1, fields=None):
+        for entry in self.entries(after_seq, fields):
+            yield json.dumps(entry, separators=(",", ":"))
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--attack-ratio", type=float, default=0.3, help="Share of attack events (0-1).")
+    parser.add_argument("--ips", type=int, default=5000, help="Distinct attacker addresses.")
+    parser.add_argument("--users", type=int, default=len(USERS), help="Distinct user names.")
+    parser.add_argument("--skew", type=float, default=0.5, help="Share of attacks from the busiest 1%% of addresses.")
+    parser.add_argument("--days", type=float, default=1.0, help="Time span of the journal, ending now.")
+    parser.add_argument("--mix", default=None, help="Attack weights, e.g. failed_password=60,invalid_user=30,sudo=10")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def from_arguments(args, events=None) -> JournalGenerator:
+    return JournalGenerator(
+        events if events is not None else args.events, attack_ratio=args.attack_ratio, ips=args.ips,
+        users=args.users, skew=args.skew, days=args.days, mix=parse_mix(args.mix) if args.mix else None,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    out = sys.stdout
+    for line in from_arguments(args).lines():
+        out.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Stand-in for powershell.exe for running WinClient on Linux.
+
+Speaks the PowerShellSession framing when started with -EncodedCommand
+(the host script itself is ignored; @@STREAM output goes out line by line)
+and runs a single command with -Command, like the per-command subprocess
+path. Only a few commands are understood:
+
+    Get-WinEvent ...          -> --events synthetic failed logons, one JSON object per line
+                                 (OpenSSH entries if the script mentions OpenSSH)
+    Start-Sleep [-Seconds] N  -> sleeps N seconds, no output
+    throw '...'               -> error (status 1)
+    exit [N]                  -> the process exits (a crash, for the session)
+    anything else             -> echoed back
+
+    WIN_PS_COMMAND="python benchmarks/fake_powershell.py --events 50"
+"""
+import argparse
+import base64
+import json
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+
+def fake_events(count, ssh, seed=1):
+    rnd = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    events = []
+    for i in range(count):
+        event = {
+            "Timestamp": (start + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "IpAddress": f"203.0.113.{rnd.randint(1, 254)}",
+            "User": rnd.choice(["administrator", "admin", "guest", "backup"]),
+            "RecordId": 1000 + i,
+        }
+        if ssh:
+            event["Type"] = "SSH_WINDOWS_LOGIN"
+        else:
+            event["EventId"] = 4625
+        events.append(event)
+    return events
+
+
+def execute(script, events):
+    """Returns (status, output)."""
+    text = script.strip()
+    match = re.match(r"^exit(?:\s+(\d+))?$", text)
+    if match:
+        sys.exit(int(match.group(1) or 0))
+    match = re.match(r"^Start-Sleep\s+(?:-Seconds\s+)?([\d.]+)$", text)
+    if match:
+        time.sleep(float(match.group(1)))
+        return 0, ""
+    match = re.match(r"^throw\s+'(.*)'$", text)
+    if match:
+        return 1, match.group(1)
+    if "Get-WinEvent" in text:
+        return 0, "\n".join(json.dumps(e, separators=(",", ":")) for e in fake_events(events, "OpenSSH" in text))
+    return 0, text
+
+
+def serve(events):
+    out = sys.stdout.buffer
+    for raw in sys.stdin.buffer:
+        line = raw.decode("ascii").strip()
+        if line == "@@EXIT":
+            break
+        parts = line.split(" ")
+        if len(parts) < 3 or parts[0] not in ("@@CMD", "@@STREAM"):
+            continue
+        status, output = execute(base64.b64decode(parts[2]).decode("utf-8"), events)
+        if parts[0] == "@@STREAM" and status == 0:
+            for item in output.splitlines():
+                data = base64.b64encode(item.encode("utf-8")).decode("ascii")
+                out.write(f"@@DATA {parts[1]} {data}\n".encode("ascii"))
+            output = ""
+        payload = base64.b64encode(output.encode("utf-8")).decode("ascii")
+        out.write(f"@@BEGIN {parts[1]} {status}\n{payload}\n@@END {parts[1]}\n".encode("ascii"))
+        out.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--startup", type=float, default=0.0, help="Simulated startup time in seconds.")
+    parser.add_argument("-EncodedCommand", dest="encoded")
+    parser.add_argument("-Command", dest="command")
+    args, _ = parser.parse_known_args()
+
+    time.sleep(args.startup)
+    if args.command is not None:
+        status, output = execute(args.command, args.events)
+        (sys.stderr if status else sys.stdout).write(output + "\n")
+        sys.exit(status)
+    serve(args.events)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Local SSH server standing in for a Linux host, for collecting logs
+without a VM.
+
+Accepts any user / password / key and answers exec requests:
+
+    [sudo] journalctl ... -o json ...   -> the fake_journald.py journal; honours
+                                           --output-fields and --after-cursor
+                                           (--since is ignored - the whole journal
+                                           is recent), one JSON entry per line
+    journalctl ... | <command>          -> the journal piped through <command>, run
+                                           locally (e.g. the collector's awk filter)
+    anything else                       -> no output, exit status 0
+
+Started on its own it serves until interrupted, e.g. for the app with
+SSH_DEFAULT_PORT=2222 and a host 127.0.0.1:
+
+    python benchmarks/fake_ssh_server.py --port 2222 --events 100000 [--attack-ratio 0.3 ...]
+"""
+import argparse
+import logging
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import paramiko
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_journald import JournalGenerator, add_arguments, from_arguments  # noqa: E402
+
+SEND_CHUNK = 256 * 1024 # bytes per channel.sendall
+logging.getLogger("fake_ssh_server").setLevel(logging.CRITICAL)
+
+
+class FakeSSHServer:
+    def __init__(self, generator, host="127.0.0.1", port=0) -> None:
+        self.generator = generator
+        self.host = host
+        self.port = port
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.commands = []
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._socket = None
+        self._stop = threading.Event()
+        self._transports = []
+
+    def start(self) -> tuple:
+        """Listens in a background thread; returns (host, port)."""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen(16)
+        self._socket.settimeout(0.5)
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name="fake-sshd", daemon=True).start()
+        return self.host, self.port
+
+    def stop(self) -> None:
+        self._stop.set()
+        for transport in self._transports:
+            transport.close()
+        if self._socket:
+            self._socket.close()
+
+    def _accept_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            transport.set_log_channel("fake_ssh_server") # client disconnects are not errors here
+            transport.add_server_key(self.host_key)
+            transport.use_compression(True) # used only if the client asks for it
+            transport.start_server(server=_Session(self))
+            self._transports.append(transport)
+
+    # ------------------------------------------------------------------ commands
+
+    def execute(self, channel, command) -> None:
+        with self._lock:
+            self.commands.append(command)
+        try:
+            status = self._execute(channel, command)
+        except Exception as e:
+            channel.sendall_stderr(f"fake_ssh_server: {e}\n".encode())
+            status = 1
+        channel.send_exit_status(status)
+        channel.close()
+
+    def _execute(self, channel, command) -> int:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars="|")
+        lexer.whitespace_split = True
+        tokens = list(lexer)
+        pipe = tokens.index("|") if "|" in tokens else len(tokens)
+        args, rest = tokens[:pipe], tokens[pipe + 1:]
+        if "journalctl" not in args:
+            return 0
+
+        fields, after = None, -1
+        for i, arg in enumerate(args):
+            if arg.startswith("--output-fields="):
+                fields = arg.split("=", 1)[1].split(",")
+            elif arg.startswith("--after-cursor="):
+                after = JournalGenerator.cursor_seq(arg.split("=", 1)[1])
+            elif arg == "--after-cursor" and i + 1 < len(args):
+                after = JournalGenerator.cursor_seq(args[i + 1])
+        lines = self.generator.lines(after, fields)
+
+        if not rest:
+            self._send(channel, (line.encode() + b"\n" for line in lines))
+            return 0
+
+        process = subprocess.Popen(rest, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        def feed():
+            try:
+                for line in lines:
+                    process.stdin.write(line.encode() + b"\n")
+            except BrokenPipeError:
+                pass
+            finally:
+                process.stdin.close()
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        self._send(channel, iter(lambda: process.stdout.read1(SEND_CHUNK), b""))
+        feeder.join()
+        return process.wait()
+
+    def _send(self, channel, chunks) -> None:
+        buffer = []
+        size = 0
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= SEND_CHUNK:
+                channel.sendall(b"".join(buffer))
+                self._count(size)
+                buffer, size = [], 0
+        if buffer:
+            channel.sendall(b"".join(buffer))
+            self._count(size)
+
+    def _count(self, size) -> None:
+        with self._lock:
+            self.bytes_sent += size
+
+
+class _Session(paramiko.ServerInterface):
+    def __init__(self, server) -> None:
+        self.server = server
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_REASON
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode(errors="replace")
+        threading.Thread(target=self.server.execute, args=(channel, command), daemon=True).start()
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2222)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeSSHServer(from_arguments(args), args.host, args.port)
+    host, port = server.start()
+    print(f"Fake SSH host on {host}:{port}, {args.events} journal entries. Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
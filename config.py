@@ -14,5 +14,112 @@ class Config:
     SSH_DEFAULT_PORT = int(os.getenv('SSH_DEFAULT_PORT', 2222))
     SSH_KEY_FILE = os.getenv('SSH_KEY_FILE', '')
 
+    # persistent SSH connection pool
+    SSH_POOL_MAX_SIZE = int(os.getenv('SSH_POOL_MAX_SIZE', 32))
+    SSH_POOL_IDLE_TIMEOUT = int(os.getenv('SSH_POOL_IDLE_TIMEOUT', 300))
+    SSH_KEEPALIVE = int(os.getenv('SSH_KEEPALIVE', 30))
+    SSH_CONNECT_TIMEOUT = int(os.getenv('SSH_CONNECT_TIMEOUT', 10))
+    SSH_COMPRESSION = os.getenv('SSH_COMPRESSION', '1') == '1'
+
+    # dashboard host status: cache lifetime, max wait per request (seconds), parallel probes
+    HOST_STATUS_TTL = int(os.getenv('HOST_STATUS_TTL', 30))
+    HOST_STATUS_DEADLINE = float(os.getenv('HOST_STATUS_DEADLINE', 5))
+    HOST_STATUS_MAX_WORKERS = int(os.getenv('HOST_STATUS_MAX_WORKERS', 16))
+
+    # Windows: persistent PowerShell host (argv, empty = powershell) and per-command timeout in seconds
+    WIN_PS_COMMAND = os.getenv('WIN_PS_COMMAND', '')
+    WIN_PS_TIMEOUT = int(os.getenv('WIN_PS_TIMEOUT', 120))
+
+    # journald: request only used fields (opt-in, needs systemd >= 236), pre-filter lines on the host
+    JOURNAL_OUTPUT_FIELDS = os.getenv('JOURNAL_OUTPUT_FIELDS', '0') == '1'
+    JOURNAL_REMOTE_FILTER = os.getenv('JOURNAL_REMOTE_FILTER', '1') == '1'
+
     #default log storage folder
-    STORAGE_FOLDER = Path.cwd() / 'storage'
\ No newline at end of file
+    STORAGE_FOLDER = Path.cwd() / 'storage'
+    # Parquet log files: codec and level, rows per row group, store raw_log only when it differs from message
+    LOG_COMPRESSION = os.getenv('LOG_COMPRESSION', 'zstd')
+    LOG_COMPRESSION_LEVEL = int(os.getenv('LOG_COMPRESSION_LEVEL', 3))
+    LOG_ROW_GROUP_SIZE = int(os.getenv('LOG_ROW_GROUP_SIZE', 65536))
+    LOG_DEDUP_RAW = os.getenv('LOG_DEDUP_RAW', '1') == '1'
+    LOG_SEARCH_MAX_LIMIT = int(os.getenv('LOG_SEARCH_MAX_LIMIT', 10000))
+    # Ingestion pipeline: batches waiting before each stage, rows of one day analysed at once
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))
+    PIPELINE_ANALYZE_BATCH = int(os.getenv('PIPELINE_ANALYZE_BATCH', 100000))
+
+    # in-memory IP reputation index - full reload after this many seconds (0 = never)
+    REPUTATION_TTL = int(os.getenv('REPUTATION_TTL', 300))
+
+    # declarative detection rules (YAML or JSON)
+    RULES_FILE = os.getenv('RULES_FILE', str(Path(__file__).resolve().parent / 'rules' / 'detection_rules.yaml'))
+
+    # sliding-window correlation (event time) and its checkpoint
+    CORRELATION_WINDOW = int(os.getenv('CORRELATION_WINDOW', 600))
+    CORRELATION_BUCKET = int(os.getenv('CORRELATION_BUCKET', 60))
+    CORRELATION_MAX_KEYS = int(os.getenv('CORRELATION_MAX_KEYS', 100000))
+    CROSS_HOST_MIN_HOSTS = int(os.getenv('CROSS_HOST_MIN_HOSTS', 2))
+    CROSS_HOST_MIN_FAILURES = int(os.getenv('CROSS_HOST_MIN_FAILURES', 2))
+    SPRAY_MIN_USERS = int(os.getenv('SPRAY_MIN_USERS', 5))
+    BRUTE_FORCE_MIN_FAILURES = int(os.getenv('BRUTE_FORCE_MIN_FAILURES', 20))
+    CORRELATION_CHECKPOINT = os.getenv('CORRELATION_CHECKPOINT', str(Path.cwd() / 'storage' / 'correlation_state.json'))
+    CORRELATION_CHECKPOINT_INTERVAL = int(os.getenv('CORRELATION_CHECKPOINT_INTERVAL', 60))
+
+    # live alert feed (SSE): tail interval when no commit woke it up, keep-alive comment interval
+    ALERT_FEED_POLL = float(os.getenv('ALERT_FEED_POLL', 2))
+    ALERT_FEED_HEARTBEAT = int(os.getenv('ALERT_FEED_HEARTBEAT', 15))
+    ALERTS_PAGE_MAX = int(os.getenv('ALERTS_PAGE_MAX', 500))
+
+    # SQLite connection settings (ignored for other databases); busy timeout in ms
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+    SQLITE_FOREIGN_KEYS = os.getenv('SQLITE_FOREIGN_KEYS', '1') == '1'
+    # Single writer thread for ingestion writes: jobs per commit, seconds to wait for more jobs
+    WRITER_ENABLED = os.getenv('WRITER_ENABLED', '1') == '1'
+    WRITER_BATCH_MAX = int(os.getenv('WRITER_BATCH_MAX', 64))
+    WRITER_BATCH_WAIT = float(os.getenv('WRITER_BATCH_WAIT', 0))
+
+    # IP registry: largest page of /api/ips, addresses per statement / commit of a feed import
+    IPS_PAGE_MAX = int(os.getenv('IPS_PAGE_MAX', 1000))
+    IP_IMPORT_CHUNK_SIZE = int(os.getenv('IP_IMPORT_CHUNK_SIZE', 5000))
+
+    # dashboard statistics: size of the top IPs / users summary, retention of minute and hour rollups (seconds)
+    TOPK_CAPACITY = int(os.getenv('TOPK_CAPACITY', 200))
+    ROLLUP_MINUTE_RETENTION = int(os.getenv('ROLLUP_MINUTE_RETENTION', 2 * 86400))
+    ROLLUP_HOUR_RETENTION = int(os.getenv('ROLLUP_HOUR_RETENTION', 90 * 86400))
+
+    # background log collection
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', '0') == '1'
+    SCHEDULER_TICK = int(os.getenv('SCHEDULER_TICK', 5))
+    COLLECTION_INTERVAL = int(os.getenv('COLLECTION_INTERVAL', 300))
+    COLLECTION_MAX_WORKERS = int(os.getenv('COLLECTION_MAX_WORKERS', 8))
+    COLLECTION_PER_HOST_LIMIT = int(os.getenv('COLLECTION_PER_HOST_LIMIT', 1))
+    COLLECTION_JITTER = int(os.getenv('COLLECTION_JITTER', 30))
+    COLLECTION_MAX_BACKOFF = int(os.getenv('COLLECTION_MAX_BACKOFF', 3600))
+
+    # Parquet storage maintenance: merge small files of a host/day partition (0 = disabled)
+    COMPACTION_INTERVAL = int(os.getenv('COMPACTION_INTERVAL', 3600))
+    COMPACTION_MIN_AGE = int(os.getenv('COMPACTION_MIN_AGE', 3600))
+    COMPACTION_SMALL_FILE_BYTES = int(os.getenv('COMPACTION_SMALL_FILE_BYTES', 64 * 1024 * 1024))
+    COMPACTION_ROW_GROUP_SIZE = int(os.getenv('COMPACTION_ROW_GROUP_SIZE', 131072))
+
+    # Retention (seconds, 0 = keep forever - the default, nothing is deleted until configured):
+    # alerts older than their TTL are moved to Parquet (storage/alerts/), log files and alert
+    # archives older than LOG_RETENTION are deleted.
+    # Per severity, e.g. "CRITICAL=31536000,INFO=604800"; Host.alert_retention / log_retention override.
+    RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', 3600))
+    ALERT_RETENTION = int(os.getenv('ALERT_RETENTION', 0))
+    ALERT_RETENTION_BY_SEVERITY = os.getenv('ALERT_RETENTION_BY_SEVERITY', '')
+    ALERT_ARCHIVE = os.getenv('ALERT_ARCHIVE', '1') == '1'
+    LOG_RETENTION = int(os.getenv('LOG_RETENTION', 0))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 5000))
+
+    # Service log level (app.services.* loggers, via the app logger)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # /metrics (Prometheus text format): Bearer token for scrapers; empty = logged-in users only
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    # Sampling profiler for requests: ?profile=1 returns folded stacks, PROFILE_ENDPOINTS
+    # (comma-separated endpoint names) are always profiled and saved to PROFILE_DIR
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+    PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+    PROFILE_ENDPOINTS = os.getenv('PROFILE_ENDPOINTS', '')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', str(Path.cwd() / 'storage' / 'profiles'))
@@ -0,0 +1,102 @@
+"""initial schema
+
+Revision ID: 5a1f0c3e9b21
+Revises: 
+Create Date: 2026-10-18 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1f0c3e9b21'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# Tables may already exist - create_app() runs db.create_all() before any upgrade.
+def _missing(table):
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade():
+    if _missing('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=64), nullable=False),
+            sa.Column('password_hash', sa.String(length=256), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    if _missing('hosts'):
+        op.create_table(
+            'hosts',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('hostname', sa.String(length=100), nullable=False),
+            sa.Column('ip_address', sa.String(length=15), nullable=False),
+            sa.Column('os_type', sa.String(length=20), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('ip_address')
+        )
+
+    if _missing('ip_registry'):
+        op.create_table(
+            'ip_registry',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('ip_address', sa.String(length=50), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=True),
+            sa.Column('last_seen', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('ip_address')
+        )
+
+    if _missing('log_sources'):
+        op.create_table(
+            'log_sources',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('host_id', sa.Integer(), nullable=False),
+            sa.Column('log_type', sa.String(length=50), nullable=True),
+            sa.Column('last_fetch', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['host_id'], ['hosts.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if _missing('log_archives'):
+        op.create_table(
+            'log_archives',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('host_id', sa.Integer(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('filename', sa.String(length=200), nullable=False),
+            sa.Column('record_count', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['host_id'], ['hosts.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if _missing('alerts'):
+        op.create_table(
+            'alerts',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('host_id', sa.Integer(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('alert_type', sa.String(length=50), nullable=True),
+            sa.Column('message', sa.Text(), nullable=True),
+            sa.Column('severity', sa.String(length=20), nullable=True),
+            sa.Column('source_ip', sa.String(length=50), nullable=True),
+            sa.ForeignKeyConstraint(['host_id'], ['hosts.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('alerts')
+    op.drop_table('log_archives')
+    op.drop_table('log_sources')
+    op.drop_table('ip_registry')
+    op.drop_table('hosts')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_table('users')
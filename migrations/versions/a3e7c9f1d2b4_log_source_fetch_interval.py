@@ -0,0 +1,28 @@
+"""log source fetch interval
+
+Revision ID: a3e7c9f1d2b4
+Revises: 5a1f0c3e9b21
+Create Date: 2026-10-18 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e7c9f1d2b4'
+down_revision = '5a1f0c3e9b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('log_sources')}
+    if 'fetch_interval' not in existing:
+        with op.batch_alter_table('log_sources') as batch_op:
+            batch_op.add_column(sa.Column('fetch_interval', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('log_sources') as batch_op:
+        batch_op.drop_column('fetch_interval')
@@ -0,0 +1,57 @@
+"""ip registry indexes for keyset pagination
+
+Revision ID: b6e1f9a3c2d4
+Revises: f3a8c1d5e7b9
+Create Date: 2026-10-18 23:20:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1f9a3c2d4'
+down_revision = 'f3a8c1d5e7b9'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = {
+    'ix_ip_registry_last_seen_id': ['last_seen', 'id'],
+    'ix_ip_registry_status_last_seen_id': ['status', 'last_seen', 'id'],
+}
+
+ip_registry = sa.table(
+    'ip_registry',
+    sa.column('status', sa.String),
+    sa.column('last_seen', sa.DateTime),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    indexes = {i['name'] for i in sa.inspect(bind).get_indexes('ip_registry')}
+
+    # Statuses are compared upper-case (the analyzer and the UI use TRUSTED / BANNED / UNKNOWN)
+    bind.execute(
+        sa.update(ip_registry)
+        .where(ip_registry.c.status != sa.func.upper(ip_registry.c.status))
+        .values(status=sa.func.upper(ip_registry.c.status))
+    )
+    bind.execute(sa.update(ip_registry).where(ip_registry.c.status.is_(None)).values(status='UNKNOWN'))
+    # Keyset pages are ordered by last_seen - rows without it would never be reached
+    bind.execute(
+        sa.update(ip_registry).where(ip_registry.c.last_seen.is_(None))
+        .values(last_seen=datetime.now(timezone.utc).replace(tzinfo=None))
+    )
+
+    for name, columns in INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, 'ip_registry', columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='ip_registry')
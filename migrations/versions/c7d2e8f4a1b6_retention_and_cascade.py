@@ -0,0 +1,69 @@
+"""per-host retention and ON DELETE CASCADE to hosts
+
+Revision ID: c7d2e8f4a1b6
+Revises: b6e1f9a3c2d4
+Create Date: 2026-10-19 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e8f4a1b6'
+down_revision = 'b6e1f9a3c2d4'
+branch_labels = None
+depends_on = None
+
+
+CHILD_TABLES = ('log_sources', 'log_archives', 'alerts')
+# SQLite foreign keys have no name - batch mode needs one to drop them
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _host_fk(table):
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if fk['referred_table'] == 'hosts':
+            return fk
+    return None
+
+
+def _set_ondelete(table, ondelete):
+    """Recreates the host_id foreign key of 'table' with the given ON DELETE action."""
+    fk = _host_fk(table)
+    current = ((fk or {}).get('options') or {}).get('ondelete')
+    if fk is not None and (current or '').upper() == (ondelete or '').upper():
+        return
+    name = (fk or {}).get('name') or f'fk_{table}_host_id_hosts'
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+        if fk is not None:
+            batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(name, 'hosts', ['host_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('hosts')}
+    indexes = {i['name'] for i in inspector.get_indexes('log_archives')}
+
+    with op.batch_alter_table('hosts') as batch_op:
+        if 'alert_retention' not in columns:
+            batch_op.add_column(sa.Column('alert_retention', sa.Integer(), nullable=True))
+        if 'log_retention' not in columns:
+            batch_op.add_column(sa.Column('log_retention', sa.Integer(), nullable=True))
+
+    if 'ix_log_archives_host_id_timestamp' not in indexes:
+        op.create_index('ix_log_archives_host_id_timestamp', 'log_archives', ['host_id', 'timestamp'])
+
+    # Deleting a host removes its sources, archive index and alerts in the database
+    for table in CHILD_TABLES:
+        _set_ondelete(table, 'CASCADE')
+
+
+def downgrade():
+    for table in CHILD_TABLES:
+        _set_ondelete(table, None)
+    op.drop_index('ix_log_archives_host_id_timestamp', table_name='log_archives')
+    with op.batch_alter_table('hosts') as batch_op:
+        batch_op.drop_column('log_retention')
+        batch_op.drop_column('alert_retention')
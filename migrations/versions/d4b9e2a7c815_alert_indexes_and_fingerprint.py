@@ -0,0 +1,92 @@
+"""alert indexes and dedup fingerprint
+
+Revision ID: d4b9e2a7c815
+Revises: e5f2b8d6a9c3
+Create Date: 2026-10-18 20:42:00.000000
+
+"""
+import hashlib
+from datetime import timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b9e2a7c815'
+down_revision = 'e5f2b8d6a9c3'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = {
+    'ix_alerts_host_id_timestamp': ['host_id', 'timestamp'],
+    'ix_alerts_source_ip_timestamp': ['source_ip', 'timestamp', 'host_id'],
+    'ix_alerts_timestamp': ['timestamp'],
+}
+BATCH_SIZE = 10000
+
+alerts = sa.table(
+    'alerts',
+    sa.column('id', sa.Integer),
+    sa.column('host_id', sa.Integer),
+    sa.column('source_ip', sa.String),
+    sa.column('alert_type', sa.String),
+    sa.column('timestamp', sa.DateTime),
+    sa.column('fingerprint', sa.String),
+)
+
+
+# Frozen copy of Alert.make_fingerprint at this revision
+def _fingerprint(host_id, source_ip, alert_type, timestamp):
+    if timestamp is not None and timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    ts = timestamp.isoformat(sep=' ') if timestamp is not None else ''
+    return hashlib.sha1(f"{host_id}|{source_ip}|{alert_type}|{ts}".encode()).hexdigest()
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {c['name'] for c in inspector.get_columns('alerts')}
+    indexes = {i['name'] for i in inspector.get_indexes('alerts')}
+
+    if 'fingerprint' not in columns:
+        with op.batch_alter_table('alerts') as batch_op:
+            batch_op.add_column(sa.Column('fingerprint', sa.String(length=40), nullable=True))
+
+    # Backfill in id order, one batch at a time
+    last_id = 0
+    update = sa.update(alerts).where(alerts.c.id == sa.bindparam('_id')).values(fingerprint=sa.bindparam('_fp'))
+    while True:
+        rows = bind.execute(
+            sa.select(alerts.c.id, alerts.c.host_id, alerts.c.source_ip, alerts.c.alert_type, alerts.c.timestamp)
+            .where(alerts.c.id > last_id, alerts.c.fingerprint.is_(None))
+            .order_by(alerts.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(update, [
+            {'_id': row.id, '_fp': _fingerprint(row.host_id, row.source_ip, row.alert_type, row.timestamp)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+    # Keep the oldest alert of every duplicate group
+    keep = sa.select(sa.func.min(alerts.c.id)).group_by(alerts.c.fingerprint).scalar_subquery()
+    bind.execute(sa.delete(alerts).where(alerts.c.fingerprint.is_not(None), alerts.c.id.not_in(keep)))
+
+    if 'ix_alerts_fingerprint' not in indexes:
+        op.create_index('ix_alerts_fingerprint', 'alerts', ['fingerprint'], unique=True)
+    for name, index_columns in INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, 'alerts', index_columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='alerts')
+    op.drop_index('ix_alerts_fingerprint', table_name='alerts')
+    with op.batch_alter_table('alerts') as batch_op:
+        batch_op.drop_column('fingerprint')
@@ -0,0 +1,37 @@
+"""log source collection cursors
+
+Revision ID: e5f2b8d6a9c3
+Revises: a3e7c9f1d2b4
+Create Date: 2026-10-18 20:40:30.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f2b8d6a9c3'
+down_revision = 'a3e7c9f1d2b4'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = [
+    sa.Column('last_cursor', sa.String(length=255), nullable=True),
+    sa.Column('last_record_id', sa.BigInteger(), nullable=True),
+    sa.Column('last_ssh_record_id', sa.BigInteger(), nullable=True),
+]
+
+
+def upgrade():
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('log_sources')}
+    with op.batch_alter_table('log_sources') as batch_op:
+        for column in COLUMNS:
+            if column.name not in existing:
+                batch_op.add_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table('log_sources') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
@@ -0,0 +1,54 @@
+"""alert rollups and top talkers summary
+
+Revision ID: f3a8c1d5e7b9
+Revises: d4b9e2a7c815
+Create Date: 2026-10-18 22:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d5e7b9'
+down_revision = 'd4b9e2a7c815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled from existing alerts with 'flask rebuild-stats'
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'alert_rollups' not in tables:
+        op.create_table(
+            'alert_rollups',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('granularity', sa.String(length=10), nullable=False),
+            sa.Column('bucket', sa.DateTime(), nullable=False),
+            sa.Column('host_id', sa.Integer(), nullable=False),
+            sa.Column('severity', sa.String(length=20), nullable=False),
+            sa.Column('alert_type', sa.String(length=50), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('granularity', 'bucket', 'host_id', 'severity', 'alert_type', name='uq_alert_rollups_key')
+        )
+
+    if 'top_talkers' not in tables:
+        op.create_table(
+            'top_talkers',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=10), nullable=False),
+            sa.Column('value', sa.String(length=255), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.Column('error', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('kind', 'value', name='uq_top_talkers_kind_value')
+        )
+        op.create_index('ix_top_talkers_kind_count', 'top_talkers', ['kind', 'count'])
+
+
+def downgrade():
+    op.drop_index('ix_top_talkers_kind_count', table_name='top_talkers')
+    op.drop_table('top_talkers')
+    op.drop_table('alert_rollups')
@@ -0,0 +1,29 @@
+import pytest
+
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.services.data_manager import DataManager
+from app.services.db_writer import db_writer
+from app.services.reputation import reputation
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Application on a temporary SQLite file, with storage/ under tmp_path."""
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'siem.db'}"
+        CORRELATION_CHECKPOINT = ""
+        SCHEDULER_ENABLED = False
+        LOGIN_DISABLED = True
+        WTF_CSRF_ENABLED = False
+
+    monkeypatch.setattr(DataManager, "STORAGE_DIR", tmp_path / "storage")
+    app = create_app(TestConfig)
+    reputation.invalidate()
+    yield app
+    db_writer.stop() # the writer thread is bound to this app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+from app.extensions import db
+from app.models import Alert, Host
+from app.services.alert_feed import broker
+
+
+@pytest.fixture
+def feed(app):
+    app.config["ALERT_FEED_HEARTBEAT"] = 1
+    broker.poll_interval = 0.05
+    with app.app_context():
+        db.session.add(Host(id=1, hostname="h1", ip_address="10.0.0.1", os_type="linux"))
+        db.session.commit()
+    yield app
+    thread = broker._thread
+    if thread is not None: # exits on its next wake-up once nobody is subscribed
+        broker.notify()
+        thread.join(timeout=5)
+
+
+def add_alerts(app, count):
+    with app.app_context():
+        alerts = [Alert(host_id=1, alert_type="FAILED_LOGIN", source_ip=f"10.1.0.{i}", timestamp=datetime(2026, 1, 1))
+                  for i in range(count)]
+        db.session.add_all(alerts)
+        db.session.info["alerts_inserted"] = True
+        db.session.commit()
+        return [alert.id for alert in alerts]
+
+
+def event_ids(response, count):
+    """Ids of the next 'count' alert events of an SSE response."""
+    ids = []
+    for chunk in response.response:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith("id: "):
+            ids.append(int(chunk.split("\n", 1)[0][4:]))
+            if len(ids) == count:
+                return ids
+    return ids
+
+
+def test_resume_with_since_id(feed):
+    ids = add_alerts(feed, 3)
+    response = feed.test_client().get(f"/api/alerts/stream?since_id={ids[0]}", buffered=False)
+    try:
+        assert event_ids(response, 2) == ids[1:]
+        new = add_alerts(feed, 1)
+        assert event_ids(response, 1) == new
+    finally:
+        response.close()
+
+
+def test_last_event_id_wins_over_since_id(feed):
+    ids = add_alerts(feed, 3)
+    response = feed.test_client().get("/api/alerts/stream?since_id=0", headers={"Last-Event-ID": str(ids[1])},
+                                      buffered=False)
+    try:
+        assert event_ids(response, 1) == ids[2:]
+    finally:
+        response.close()
+
+
+def test_new_subscriber_gets_only_new_alerts(feed):
+    add_alerts(feed, 3) # committed while nobody was listening
+    broker.last_id = 0 # position left by an earlier tail thread
+    response = feed.test_client().get("/api/alerts/stream", buffered=False)
+    try:
+        new = add_alerts(feed, 1)
+        assert event_ids(response, 1) == new
+    finally:
+        response.close()
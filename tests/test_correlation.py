@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from app.services.correlation import CorrelationEngine
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+def at(minutes):
+    return T0 + timedelta(minutes=minutes)
+
+
+def test_late_event_expires_with_its_bucket():
+    engine = CorrelationEngine(window_seconds=600, bucket_seconds=60)
+    engine.observe("x", 2, "root", at(9))
+    engine.observe("x", 3, "root", at(0)) # late, behind a newer bucket
+    engine.observe("x", 2, "root", at(12))
+
+    assert engine.counters("x") == {"failures": 2, "hosts": 1, "users": 1}
+
+
+def test_late_value_does_not_outlive_its_bucket():
+    engine = CorrelationEngine(window_seconds=600, bucket_seconds=60)
+    engine.observe("x", 1, "alice", at(9))
+    engine.observe("x", 1, "bob", at(1))
+    engine.observe("x", 1, "alice", at(2)) # older than alice's last bucket
+    engine.observe("x", 1, "carol", at(11))
+
+    assert engine.counters("x") == {"failures": 3, "hosts": 1, "users": 2}
+
+
+def test_out_of_order_events_do_not_fire_cross_host():
+    engine = CorrelationEngine(window_seconds=600, bucket_seconds=60, cross_host_hosts=2, cross_host_failures=3)
+    engine.observe("x", 2, "root", at(9))
+    engine.observe("x", 3, "root", at(0))
+
+    # two hosts in the window, but only two failures - the one at minute 0 has expired
+    assert engine.observe("x", 3, "root", at(12)) == []
+
+
+def test_checkpoint_keeps_expiry_order():
+    engine = CorrelationEngine(window_seconds=600, bucket_seconds=60)
+    engine.observe("x", 2, "root", at(9))
+    engine.observe("x", 3, "root", at(0))
+    restored = CorrelationEngine(window_seconds=600, bucket_seconds=60)
+    restored.from_dict(engine.to_dict())
+    restored.observe("x", 2, "root", at(12))
+
+    assert restored.counters("x") == {"failures": 2, "hosts": 1, "users": 1}
+
+
+def test_event_observed_again_is_not_counted():
+    engine = CorrelationEngine(window_seconds=600, bucket_seconds=60, cross_host_hosts=2, cross_host_failures=3)
+    for _ in range(2): # the same batch analysed twice
+        engine.observe("x", 1, "root", at(1))
+        engine.observe("x", 2, "root", at(2))
+
+    assert engine.counters("x") == {"failures": 2, "hosts": 2, "users": 1}
+    restored = CorrelationEngine(window_seconds=600, bucket_seconds=60, cross_host_hosts=2, cross_host_failures=3)
+    restored.from_dict(engine.to_dict())
+    assert restored.observe("x", 2, "root", at(2)) == []
+    assert restored.counters("x")["failures"] == 2
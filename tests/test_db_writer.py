@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.extensions import db
+from app.models import Host
+from app.services.db_writer import db_writer
+from app.services.metrics import ALERTS_CREATED, MetricsRegistry
+from app.services.reputation import reputation
+
+
+def add_host(host_id, fail=False):
+    db.session.add(Host(id=host_id, hostname=f"h{host_id}", ip_address=f"10.0.0.{host_id}", os_type="linux"))
+    db.session.flush()
+    if fail:
+        raise RuntimeError(f"job {host_id} failed")
+    return host_id
+
+
+def stage(host_id, ip, fail=False):
+    reputation.stage(ip, "BANNED")
+    MetricsRegistry.stage_alerts(db.session, [{"host_id": host_id, "severity": "HIGH"}])
+    return add_host(host_id, fail)
+
+
+def run_batch(app, jobs):
+    """
+    Queues the jobs, in order, while the writer is held by a blocking job,
+    so they are written as one batch; returns their futures.
+    """
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(timeout=5)
+
+    executor = ThreadPoolExecutor(max_workers=len(jobs) + 1)
+    with app.app_context():
+        blocker = executor.submit(db_writer.run, block)
+        assert started.wait(timeout=5)
+        futures = []
+        for fn, args, kwargs in jobs:
+            futures.append(executor.submit(db_writer.run, fn, *args, **kwargs))
+            deadline = time.monotonic() + 5
+            while db_writer.stats()["queue_depth"] < len(futures) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        release.set()
+        blocker.result(timeout=5)
+        for future in futures:
+            future.exception(timeout=5)
+    executor.shutdown()
+    return futures
+
+
+def host_ids(app):
+    with app.app_context():
+        return set(db.session.scalars(db.select(Host.id)))
+
+
+def test_group_commit_writes_queued_jobs_in_one_batch(app):
+    before = db_writer.stats()
+    futures = run_batch(app, [(add_host, (host_id,), {}) for host_id in (1, 2, 3)])
+    after = db_writer.stats()
+
+    assert [future.result() for future in futures] == [1, 2, 3]
+    assert host_ids(app) == {1, 2, 3}
+    assert after["batches"] - before["batches"] == 2 # the blocking job, then the three together
+    assert after["largest_batch"] >= 3
+
+
+def test_failed_job_rolls_back_to_its_savepoint(app):
+    futures = run_batch(app, [
+        (add_host, (1,), {}),
+        (add_host, (2,), {"fail": True}),
+        (add_host, (3,), {}),
+    ])
+
+    assert futures[0].result() == 1
+    with pytest.raises(RuntimeError, match="job 2 failed"):
+        futures[1].result()
+    assert futures[2].result() == 3
+    assert host_ids(app) == {1, 3}
+
+
+def test_staged_session_info_waits_for_the_batch_commit(app):
+    with app.app_context():
+        reputation.invalidate()
+        assert reputation.lookup("10.9.0.1") is None # loaded, so staged entries are applied on commit
+    created = {host_id: ALERTS_CREATED.value(host=host_id, severity="HIGH") for host_id in (1, 2, 3)}
+
+    futures = run_batch(app, [
+        (stage, (1, "10.9.0.1"), {}),
+        (stage, (2, "10.9.0.2"), {"fail": True}),
+        (stage, (3, "10.9.0.3"), {}),
+        (reputation.lookup, ("10.9.0.1",), {}),
+    ])
+
+    assert futures[1].exception() is not None
+    assert futures[3].result() is None # not applied before the batch commits
+    with app.app_context():
+        assert reputation.lookup("10.9.0.1") == ("10.9.0.1", "BANNED")
+        assert reputation.lookup("10.9.0.2") is None
+        assert reputation.lookup("10.9.0.3") == ("10.9.0.3", "BANNED")
+    assert ALERTS_CREATED.value(host=1, severity="HIGH") == created[1] + 1
+    assert ALERTS_CREATED.value(host=2, severity="HIGH") == created[2]
+    assert ALERTS_CREATED.value(host=3, severity="HIGH") == created[3] + 1
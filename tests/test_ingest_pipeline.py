@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import Host, LogArchive
+from app.services.collection import CollectionService
+from app.services.data_manager import DataManager, PartitionWriter
+from app.services.ingest_pipeline import ingest_pipeline
+from app.services.log_analyzer import LogAnalyzer
+from app.services.log_collector import LogCollector
+
+
+def records(count, days=2):
+    start = datetime(2026, 1, 1, 12)
+    for i in range(count):
+        yield {"timestamp": start + timedelta(days=i % days), "alert_type": "FAILED_LOGIN",
+               "source_ip": f"10.1.0.{i % 200}", "user": "root",
+               "message": "FAILED_LOGIN for user: root", "raw_log": f"line {i}"}
+
+
+def stored_files():
+    return sorted(path.name for path in DataManager.STORAGE_DIR.rglob("*.parquet"))
+
+
+def test_collect_error_removes_unfinished_files(app):
+    def failing():
+        yield from records(50)
+        raise RuntimeError("connection lost")
+
+    with app.app_context():
+        with pytest.raises(RuntimeError, match="connection lost"):
+            ingest_pipeline.run(failing(), 1)
+        assert stored_files() == []
+
+
+def test_analyze_error_after_close_removes_renamed_files(app, monkeypatch):
+    closed = threading.Event()
+    close = PartitionWriter.close
+
+    def close_and_signal(self):
+        try:
+            return close(self)
+        finally:
+            closed.set()
+
+    def detect(df, host_id):
+        # Fail only once persist has renamed its files
+        assert closed.wait(timeout=5)
+        raise RuntimeError("analysis failed")
+
+    monkeypatch.setattr(PartitionWriter, "close", close_and_signal)
+    monkeypatch.setattr(LogAnalyzer, "detect", staticmethod(detect))
+    with app.app_context():
+        with pytest.raises(RuntimeError, match="analysis failed"):
+            ingest_pipeline.run(records(50), 1)
+        assert stored_files() == []
+
+
+class FakeRemote:
+    bytes_received = lines_received = 0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_store_error_removes_written_files(app, monkeypatch):
+    def store(*args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr("app.services.collection.RemoteClient", FakeRemote)
+    monkeypatch.setattr(LogCollector, "iter_linux_logs", staticmethod(lambda remote, *args, **kwargs: records(50)))
+    monkeypatch.setattr(CollectionService, "store", staticmethod(store))
+    with app.app_context():
+        db.session.add(Host(id=1, hostname="h1", ip_address="10.0.0.1", os_type="linux"))
+        db.session.commit()
+        with pytest.raises(RuntimeError, match="database is locked"):
+            CollectionService.collect_host(1)
+        assert stored_files() == []
+        assert LogArchive.query.count() == 0
+
+
+def test_collect_host_keeps_files_of_stored_fetch(app, monkeypatch):
+    monkeypatch.setattr("app.services.collection.RemoteClient", FakeRemote)
+    monkeypatch.setattr(LogCollector, "iter_linux_logs", staticmethod(lambda remote, *args, **kwargs: records(50)))
+    with app.app_context():
+        db.session.add(Host(id=1, hostname="h1", ip_address="10.0.0.1", os_type="linux"))
+        db.session.commit()
+        result = CollectionService.collect_host(1)
+        assert result["count"] == 50
+        assert len(stored_files()) == 2
+        assert LogArchive.query.count() == 2
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.extensions import db
+from app.models import Alert, Host, LogArchive
+from app.services.data_manager import DataManager
+from app.services.retention import RetentionService
+
+DAY = 86400
+NOW = datetime(2026, 6, 1, 12)
+
+
+@pytest.fixture
+def hosts(app):
+    with app.app_context():
+        db.session.add_all([
+            Host(id=1, hostname="h1", ip_address="10.0.0.1", os_type="linux", alert_retention=DAY),
+            Host(id=2, hostname="h2", ip_address="10.0.0.2", os_type="linux"),
+            Host(id=3, hostname="h3", ip_address="10.0.0.3", os_type="linux", alert_retention=0, log_retention=0),
+        ])
+        db.session.commit()
+    return app
+
+
+def add_alert(host_id, severity, age_days, number=0):
+    alert = Alert(host_id=host_id, alert_type="FAILED_LOGIN", severity=severity,
+                  source_ip=f"10.1.0.{number}", timestamp=NOW - timedelta(days=age_days, seconds=number))
+    db.session.add(alert)
+    return alert
+
+
+def remaining_ids():
+    return set(db.session.scalars(db.select(Alert.id)))
+
+
+def test_defaults_keep_everything(hosts):
+    with hosts.app_context():
+        add_alert(2, "CRITICAL", 3650)
+        add_alert(2, "WARNING", 3650)
+        db.session.commit()
+        result = RetentionService.run(NOW)
+        assert result["alerts_deleted"] == 0
+        assert result["log_files_deleted"] == 0
+        assert Alert.query.count() == 2
+
+
+def test_alert_ttl_host_then_severity_then_default(hosts):
+    hosts.config["ALERT_RETENTION"] = 10 * DAY
+    hosts.config["ALERT_RETENTION_BY_SEVERITY"] = f"CRITICAL={30 * DAY}"
+    with hosts.app_context():
+        expired = [
+            add_alert(1, "CRITICAL", 5),  # host override (1 day) wins over the severity TTL
+            add_alert(1, "WARNING", 2),
+            add_alert(2, "CRITICAL", 40), # severity TTL
+            add_alert(2, "WARNING", 20),  # default TTL
+            add_alert(None, "WARNING", 20),
+        ]
+        kept = [
+            add_alert(1, "WARNING", 0.5),
+            add_alert(2, "CRITICAL", 20), # within the severity TTL, past the default
+            add_alert(2, "WARNING", 5),
+            add_alert(3, "WARNING", 3650), # host keeps forever
+        ]
+        db.session.commit()
+        expired_ids = {alert.id for alert in expired}
+        kept_ids = {alert.id for alert in kept}
+
+        result = RetentionService.expire_alerts(NOW)
+        assert result["alerts_deleted"] == len(expired_ids)
+        assert remaining_ids() == kept_ids
+        archived = set(RetentionService.load_archived_alerts()["id"].to_pylist())
+        assert archived == expired_ids
+
+
+def test_alerts_deleted_in_batches(hosts, monkeypatch):
+    hosts.config["ALERT_RETENTION"] = DAY
+    hosts.config["RETENTION_BATCH_SIZE"] = 3
+    batches = []
+    delete_ids = RetentionService._delete_ids
+
+    def record_batch(model, ids):
+        batches.append(len(ids))
+        return delete_ids(model, ids)
+
+    monkeypatch.setattr(RetentionService, "_delete_ids", staticmethod(record_batch))
+    with hosts.app_context():
+        for number in range(10):
+            add_alert(2, "WARNING", 2, number)
+        fresh = add_alert(2, "WARNING", 0)
+        db.session.commit()
+        fresh_id = fresh.id
+
+        assert RetentionService.expire_alerts(NOW)["alerts_deleted"] == 10
+        assert batches == [3, 3, 3, 1]
+        assert remaining_ids() == {fresh_id}
+        assert RetentionService.load_archived_alerts(host_id=2).num_rows == 10
+
+
+def test_log_files_deleted_in_batches(hosts):
+    hosts.config["LOG_RETENTION"] = 30 * DAY
+    hosts.config["RETENTION_BATCH_SIZE"] = 2
+    now_utc = NOW.astimezone(timezone.utc).replace(tzinfo=None)
+    with hosts.app_context():
+        entries = []
+        for host_id, age_days, number in [(2, 40, 0), (2, 40, 1), (2, 40, 2), (2, 10, 3), (3, 400, 4)]:
+            filename = f"host_id={host_id}/date=2026-01-01/part-{number}.parquet"
+            path = DataManager.STORAGE_DIR / filename
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"")
+            entries.append(LogArchive(host_id=host_id, filename=filename, record_count=5,
+                                      timestamp=now_utc - timedelta(days=age_days)))
+        db.session.add_all(entries)
+        db.session.commit()
+
+        result = RetentionService.expire_logs(NOW)
+        assert result["log_files_deleted"] == 3
+        assert result["log_records_deleted"] == 15
+        left = sorted(db.session.scalars(db.select(LogArchive.filename)))
+        assert left == [entries[3].filename, entries[4].filename]
+        assert sorted(path.name for path in DataManager.STORAGE_DIR.rglob("*.parquet")) == ["part-3.parquet", "part-4.parquet"]
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pandas as pd
+
+from app.services.rule_engine import RuleSet
+
+
+def batch():
+    return pd.DataFrame({
+        "timestamp": [datetime(2026, 1, 1, 12, i) for i in range(4)],
+        "source_ip": ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"],
+        "alert_type": ["FAILED_LOGIN", "FAILED_LOGIN", "INVALID_USER", "FAILED_LOGIN"],
+        "user": ["alice", "root", "admin", None],
+    })
+
+
+def evaluate(definitions):
+    ruleset = RuleSet()
+    ruleset._set_rules(ruleset.compile({"rules": definitions}))
+    return ruleset.evaluate(batch())["events"]
+
+
+def test_event_rule_alert_type_of_the_winning_rule():
+    events = evaluate([
+        {"name": "auth_failure", "where": {"alert_type": ["FAILED_LOGIN", "INVALID_USER"]}, "severity": "WARNING"},
+        {"name": "root", "where": {"user": "root"}, "severity": "CRITICAL", "alert_type": "ROOT_LOGIN_ATTEMPT"},
+        {"name": "admin", "where": {"user": "admin"}, "severity": "WARNING", "alert_type": "ADMIN_LOGIN_ATTEMPT"},
+    ])
+
+    assert events["alert_type"].tolist() == ["FAILED_LOGIN", "ROOT_LOGIN_ATTEMPT", "INVALID_USER", "FAILED_LOGIN"]
+    assert events["severity"].tolist() == ["WARNING", "CRITICAL", "WARNING", "WARNING"]
+
+
+def test_event_rule_alert_type_on_a_severity_tie_first_rule_wins():
+    events = evaluate([
+        {"name": "admin", "where": {"user": "admin"}, "severity": "WARNING", "alert_type": "ADMIN_LOGIN_ATTEMPT"},
+        {"name": "auth_failure", "where": {"alert_type": ["FAILED_LOGIN", "INVALID_USER"]}, "severity": "WARNING"},
+    ])
+
+    assert events["alert_type"].tolist() == ["FAILED_LOGIN", "FAILED_LOGIN", "ADMIN_LOGIN_ATTEMPT", "FAILED_LOGIN"]